@@ -0,0 +1,245 @@
+"""
+批量压缩Excel中的图片（无界面，也支持 Word/PowerPoint 文件）
+接受文件、通配符或目录，多个文件在进程池中并行处理，输出 JSON 格式的处理摘要
+
+用法：
+    python3 batch_compress.py 报表/ --recursive --mode size --output-dir 压缩后/ --summary summary.json
+    python3 batch_compress.py "reports/*.xlsx" --jobs 4 --display-scale 2
+    python3 batch_compress.py 大文件.xlsx --budget-mb 10
+    python3 batch_compress.py 报表/ --estimate
+    python3 batch_compress.py "slides/*.pptx" 合同.docx --display-scale 2
+"""
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from excel_compressor import ExcelImageCompressor, CompressionMode, ProcessEngine
+
+MODES = {
+    'quality': CompressionMode.QUALITY,
+    'balanced': CompressionMode.BALANCED,
+    'size': CompressionMode.SIZE,
+}
+
+ENGINES = {
+    'zip': ProcessEngine.ZIP,
+    'openpyxl': ProcessEngine.OPENPYXL,
+}
+
+# 可以处理的文件（Word 和 PowerPoint 只使用 zip 引擎）
+OFFICE_EXTENSIONS = ('.xlsx', '.xlsm', '.docx', '.docm', '.pptx', '.pptm')
+
+
+def is_candidate(path):
+    """是否为需要处理的文件（跳过 Office 锁文件和本工具的输出）"""
+    name = os.path.basename(path)
+    return (name.lower().endswith(OFFICE_EXTENSIONS)
+            and not name.startswith('~$')
+            and '_compressed_' not in name)
+
+
+def expand_paths(patterns, recursive=False):
+    """将文件、通配符和目录展开为文件列表（去重，保持输入顺序）"""
+    files = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            if recursive:
+                for root, _, names in os.walk(pattern):
+                    files.extend(os.path.join(root, name) for name in sorted(names))
+            else:
+                files.extend(os.path.join(pattern, name) for name in sorted(os.listdir(pattern)))
+        elif os.path.isfile(pattern):
+            files.append(pattern)
+        else:
+            files.extend(sorted(glob.glob(pattern, recursive=recursive)))
+
+    seen = set()
+    result = []
+    for path in files:
+        key = os.path.abspath(path)
+        if key in seen or not os.path.isfile(path) or not is_candidate(path):
+            continue
+        seen.add(key)
+        result.append(path)
+    return result
+
+
+def compress_one(file_path, options):
+    """在工作进程中压缩一个工作簿，返回处理摘要"""
+    compressor = ExcelImageCompressor(
+        max_workers=options.get('image_workers', 1),
+        display_scale=options.get('display_scale'),
+        use_cache=options.get('use_cache', True),
+        cache_path=options.get('cache_path'),
+        verbose=options.get('verbose', False),
+        full_validation=options.get('full_validation', False),
+    )
+    return compressor.process_excel(
+        file_path,
+        options.get('compression_mode', CompressionMode.BALANCED),
+        options.get('engine', ProcessEngine.ZIP),
+        budget_bytes=options.get('budget_bytes'),
+        output_dir=options.get('output_dir'),
+    )
+
+
+def estimate_files(paths, display_scale=None, on_result=None):
+    """预估各工作簿在每种压缩模式下的效果，返回与 paths 顺序一致的结果列表（不写文件）"""
+    compressor = ExcelImageCompressor(display_scale=display_scale, use_cache=False, verbose=False)
+    results = []
+    for path in paths:
+        try:
+            result = compressor.estimate(path)
+            result['ok'] = True
+        except Exception as e:
+            result = {'file': path, 'ok': False, 'error': str(e)}
+        results.append(result)
+        if on_result:
+            on_result(result)
+    return results
+
+
+def compress_files(paths, compression_mode=CompressionMode.BALANCED, engine=ProcessEngine.ZIP,
+                   output_dir=None, jobs=None, image_workers=1, display_scale=None,
+                   use_cache=True, cache_path=None, verbose=False, on_result=None, budget_bytes=None,
+                   full_validation=False):
+    """
+    批量压缩工作簿，返回与 paths 顺序一致的处理摘要列表
+    jobs 为同时处理的工作簿数（默认 CPU 核心数），image_workers 为每个工作簿内压缩图片的进程数，
+    budget_bytes 为每个工作簿的目标大小，on_result(summary) 在每个工作簿完成时调用
+    """
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    options = {
+        'compression_mode': compression_mode, 'engine': engine, 'output_dir': output_dir,
+        'image_workers': image_workers, 'display_scale': display_scale,
+        'use_cache': use_cache, 'cache_path': cache_path, 'verbose': verbose,
+        'budget_bytes': budget_bytes, 'full_validation': full_validation,
+    }
+    jobs = max(1, min(jobs or os.cpu_count() or 1, len(paths) or 1))
+
+    summaries = [None] * len(paths)
+    if jobs == 1:
+        for i, path in enumerate(paths):
+            summaries[i] = compress_one(path, options)
+            if on_result:
+                on_result(summaries[i])
+        return summaries
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = {executor.submit(compress_one, path, options): i for i, path in enumerate(paths)}
+        for future in as_completed(futures):
+            i = futures[future]
+            try:
+                summary = future.result()
+            except Exception as e:
+                # 工作进程异常退出等情况
+                summary = {'file': paths[i], 'output': None, 'ok': False, 'error': str(e)}
+            summaries[i] = summary
+            if on_result:
+                on_result(summary)
+    return summaries
+
+
+def summarize(summaries, seconds):
+    """汇总所有工作簿的处理结果"""
+    ok = [s for s in summaries if s.get('ok')]
+    return {
+        'files': len(summaries),
+        'ok': len(ok),
+        'failed': len(summaries) - len(ok),
+        'bytes_before': sum(s['bytes_before'] for s in ok),
+        'bytes_after': sum(s['bytes_after'] for s in ok),
+        'images_total': sum(s['images_total'] for s in ok),
+        'images_processed': sum(s['images_processed'] for s in ok),
+        'seconds': round(seconds, 3),
+    }
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description='批量压缩Excel（以及 Word、PowerPoint）文件中的图片')
+    parser.add_argument('paths', nargs='+', help='Excel/Word/PowerPoint 文件、通配符或目录')
+    parser.add_argument('--recursive', '-r', action='store_true', help='递归处理子目录')
+    parser.add_argument('--mode', choices=MODES, default='balanced', help='压缩模式')
+    parser.add_argument('--engine', choices=ENGINES, default='zip', help='处理引擎')
+    parser.add_argument('--display-scale', type=float, default=None,
+                        help='按显示尺寸缩小图片的清晰度倍率，如 2（默认不按显示尺寸缩小）')
+    parser.add_argument('--budget-mb', type=float, default=None,
+                        help='每个工作簿的目标大小（MB），按图片显示面积和复杂度分配字节数（只支持 zip 引擎）')
+    parser.add_argument('--output-dir', '-o', help='输出目录（默认与原文件相同）')
+    parser.add_argument('--jobs', '-j', type=int, default=None, help='同时处理的工作簿数（默认CPU核心数）')
+    parser.add_argument('--image-workers', type=int, default=1, help='每个工作簿内压缩图片的进程数')
+    parser.add_argument('--no-cache', action='store_true', help='不使用压缩结果缓存')
+    parser.add_argument('--cache-path', help='缓存文件路径')
+    parser.add_argument('--full-validation', action='store_true',
+                        help='结构校验后再用 openpyxl 完整载入输出文件（大文件很慢）')
+    parser.add_argument('--estimate', action='store_true', help='只预估各压缩模式的效果，不生成文件')
+    parser.add_argument('--summary', help='JSON 摘要输出文件（默认输出到标准输出）')
+    parser.add_argument('--verbose', '-v', action='store_true', help='输出每个工作簿的详细日志')
+    args = parser.parse_args()
+
+    paths = expand_paths(args.paths, args.recursive)
+    if not paths:
+        print("没有找到需要处理的文件", file=sys.stderr)
+        return 1
+
+    if args.estimate:
+        def on_estimate(result):
+            if not result['ok']:
+                print(f"{result['file']}: 失败 - {result['error']}", file=sys.stderr)
+                return
+            print(f"{result['file']}: {result['bytes_before']/1024/1024:.2f}MB", file=sys.stderr)
+            for mode, name in ((MODES[key], key) for key in MODES):
+                estimate = result['modes'][mode]
+                print(f"  {name}: {estimate['bytes_after']/1024/1024:.2f}MB "
+                      f"({estimate['images_processed']} 张图片, 约 {estimate['seconds']:.1f}s)", file=sys.stderr)
+
+        results = estimate_files(paths, args.display_scale, on_result=on_estimate)
+        return _write_report({'files': results}, args.summary, all(result['ok'] for result in results))
+
+    done = []
+
+    def on_result(summary):
+        done.append(summary)
+        if summary.get('ok'):
+            print(f"[{len(done)}/{len(paths)}] {summary['file']}: "
+                  f"{summary['bytes_before']/1024/1024:.2f}MB -> {summary['bytes_after']/1024/1024:.2f}MB "
+                  f"({summary['images_processed']}/{summary['images_total']} 张图片, {summary['seconds']:.1f}s)",
+                  file=sys.stderr)
+        else:
+            print(f"[{len(done)}/{len(paths)}] {summary['file']}: 失败 - {summary['error']}", file=sys.stderr)
+
+    start = time.perf_counter()
+    summaries = compress_files(
+        paths, MODES[args.mode], ENGINES[args.engine],
+        output_dir=args.output_dir, jobs=args.jobs, image_workers=args.image_workers,
+        display_scale=args.display_scale, use_cache=not args.no_cache, cache_path=args.cache_path,
+        verbose=args.verbose, on_result=on_result,
+        budget_bytes=int(args.budget_mb * 1024 * 1024) if args.budget_mb else None,
+        full_validation=args.full_validation,
+    )
+    report = {'totals': summarize(summaries, time.perf_counter() - start), 'files': summaries}
+    return _write_report(report, args.summary, report['totals']['failed'] == 0)
+
+
+def _write_report(report, summary_path, ok):
+    """输出 JSON 报告，返回退出码"""
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if summary_path:
+        with open(summary_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        print(text)
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    # 打包后的程序启动进程池时需要
+    multiprocessing.freeze_support()
+    sys.exit(main())
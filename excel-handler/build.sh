@@ -39,6 +39,10 @@ generate_icon() {
     fi
 }
 
+# 程序不使用的大型模块，不打包进去以减小单文件程序每次启动时的解压量
+# （PIL 的 Tk 支持会带入 tkinter；UPX 压缩的动态库每次启动都要解压，所以也不使用 UPX）
+EXCLUDES="'tkinter', 'numpy', 'matplotlib', 'IPython', 'pytest'"
+
 # 清理旧的构建文件
 clean_build() {
     info "清理旧的构建文件..."
@@ -58,11 +62,11 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[],
-    hiddenimports=['PIL', 'PIL._imagingtk', 'PIL._tkinter_finder', 'openpyxl'],
+    hiddenimports=['openpyxl'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    excludes=[$EXCLUDES],
     win_no_prefer_redirects=False,
     win_private_assemblies=False,
     cipher=block_cipher,
@@ -82,7 +86,7 @@ exe = EXE(
     debug=False,
     bootloader_ignore_signals=False,
     strip=False,
-    upx=True,
+    upx=False,
     upx_exclude=[],
     runtime_tmpdir=None,
     console=False,
@@ -107,11 +111,11 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[],
-    hiddenimports=['PIL', 'PIL._imagingtk', 'PIL._tkinter_finder', 'openpyxl'],
+    hiddenimports=['openpyxl'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    excludes=[$EXCLUDES],
     win_no_prefer_redirects=False,
     win_private_assemblies=False,
     cipher=block_cipher,
@@ -129,7 +133,7 @@ exe = EXE(
     debug=False,
     bootloader_ignore_signals=False,
     strip=False,
-    upx=True,
+    upx=False,
     console=False,
     disable_windowed_traceback=False,
     target_arch=None,
@@ -144,7 +148,7 @@ coll = COLLECT(
     a.zipfiles,
     a.datas,
     strip=False,
-    upx=True,
+    upx=False,
     upx_exclude=[],
     name='ExcelImageCompressor'
 )
@@ -163,6 +167,15 @@ app = BUNDLE(
 EOL
 }
 
+# 测量打包后程序的启动时间（首次绘制、载入完成）
+report_startup() {
+    info "测量启动时间..."
+    python3 startup_benchmark.py --exe "$1" --runs 3 --output release/startup.json
+    if [ $? -ne 0 ]; then
+        warn "启动时间测量失败或超出上限，详见 release/startup.json"
+    fi
+}
+
 # 打包Windows版本
 build_windows() {
     info "开始打包Windows版本..."
@@ -184,6 +197,7 @@ build_windows() {
     cd ..
     
     info "Windows版本打包完成"
+    report_startup "dist/ExcelImageCompressor.exe"
 }
 
 # 打包macOS版本
@@ -206,6 +220,7 @@ build_macos() {
     cd ..
     
     info "macOS版本打包完成"
+    report_startup "dist/ExcelImageCompressor.app/Contents/MacOS/ExcelImageCompressor"
 }
 
 # 主函数
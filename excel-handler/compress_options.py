@@ -0,0 +1,23 @@
+"""
+压缩选项常量（不依赖 openpyxl、PIL，界面启动时可以直接导入）
+"""
+
+class CompressionMode:
+    """压缩模式"""
+    QUALITY = "质量优先"  # 保持较高质量，文件可能较大
+    SIZE = "体积优先"     # 优先确保文件小于目标大小
+    BALANCED = "平衡模式"  # 在质量和大小之间取平衡
+
+class ProcessEngine:
+    """处理引擎"""
+    ZIP = "快速模式（直接重写图片）"        # 只替换 xl/media 中的图片，其余内容原样保留
+    OPENPYXL = "兼容模式（openpyxl 重建）"  # 载入整个工作簿后重建图片和锚点
+
+# 按显示尺寸缩小的选项：(名称, 清晰度倍率)
+DISPLAY_SCALES = [
+    ("不缩小", None),
+    ("显示尺寸 x1", 1.0),
+    ("显示尺寸 x1.5", 1.5),
+    ("显示尺寸 x2（高分屏）", 2.0),
+    ("显示尺寸 x3", 3.0),
+]
@@ -0,0 +1,582 @@
+"""
+Excel图片压缩核心（不依赖 wx，可在 GUI、命令行和其他程序中使用）
+快速模式和预估同样支持 Word（.docx）和 PowerPoint（.pptx），兼容模式只支持 Excel
+"""
+import io
+import os
+import sys
+import time
+import shutil
+import zipfile
+import hashlib
+import functools
+import threading
+from datetime import datetime
+import platform
+
+import image_codec
+import ooxml_media
+from image_cache import ImageCache, MediaCache, make_key
+import size_budget
+import savings_estimate
+# 选项常量放在不依赖 openpyxl/PIL 的模块中，界面启动时不必载入整个核心
+from compress_options import CompressionMode, ProcessEngine
+
+class CompressionProgress:
+    """
+    处理进度：图片数、输入/输出字节数、每张图片的编码耗时和吞吐量
+    同一张图片重复上报（如目标大小模式的修正）时以最后一次为准
+    """
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.done = 0
+        self.total = 0
+        self.images = {}
+        self.last_encode_ms = None
+
+    def update(self, done, total, image=None):
+        """记录一次进度，返回 snapshot()"""
+        self.done = done
+        self.total = total
+        if image is not None:
+            self.images[image['name']] = image
+            if not image.get('cached'):
+                self.last_encode_ms = image['seconds'] * 1000
+        return self.snapshot()
+
+    def snapshot(self):
+        """
+        返回当前进度：done/total/bytes_in/bytes_out/encode_ms（最近一张）/avg_encode_ms/
+        elapsed/mb_per_s（按输入字节计）/eta_seconds
+        """
+        elapsed = time.perf_counter() - self.start
+        bytes_in = sum(image['bytes_in'] for image in self.images.values())
+        encoded = [image['seconds'] for image in self.images.values() if not image.get('cached')]
+        eta = elapsed / self.done * (self.total - self.done) if self.done else None
+        return {
+            'done': self.done,
+            'total': self.total,
+            'bytes_in': bytes_in,
+            'bytes_out': sum(image['bytes_out'] for image in self.images.values()),
+            'encode_ms': self.last_encode_ms,
+            'avg_encode_ms': sum(encoded) / len(encoded) * 1000 if encoded else None,
+            'elapsed': elapsed,
+            'mb_per_s': bytes_in / 1024 / 1024 / elapsed if elapsed > 0 else 0,
+            'eta_seconds': eta,
+        }
+
+
+class ExcelImageCompressor:
+    """
+    Excel图片压缩工具
+    用于压缩Excel（以及 Word、PowerPoint）文件中的图片并生成新文件
+    """
+    def __init__(self, log_callback=None, max_workers=None, display_scale=None, use_cache=True, cache_path=None,
+                 verbose=True, full_validation=False, progress_callback=None):
+        # 检测操作系统
+        self.is_windows = platform.system().lower() == 'windows'
+        # 默认压缩设置
+        self.compression_settings = {
+            CompressionMode.QUALITY: {"min_quality": 60, "max_size_kb": 500},
+            CompressionMode.SIZE: {"min_quality": 5, "max_size_kb": 200},
+            CompressionMode.BALANCED: {"min_quality": 30, "max_size_kb": 300}
+        }
+        self.log_callback = log_callback
+        # 是否同时输出到控制台
+        self.verbose = verbose
+        # 并行压缩的进程数，默认使用全部CPU核心
+        self.max_workers = max_workers or os.cpu_count() or 1
+        # 按显示尺寸缩小图片时的清晰度倍率（如高分屏用 2），None 表示不按显示尺寸缩小
+        self.display_scale = display_scale
+        # 压缩结果缓存，重复处理同一批图片时直接复用
+        self.cache = ImageCache(cache_path) if use_cache else None
+        # 结构校验后是否再用 openpyxl 完整载入输出文件（大文件耗时和内存都很大）
+        self.full_validation = full_validation
+        # progress_callback(进度) 在每张图片完成后调用（处理线程中），进度见 CompressionProgress.snapshot
+        self.progress_callback = progress_callback
+        self.progress = CompressionProgress()
+        self._cancel_event = threading.Event()
+        
+    def log(self, message):
+        """输出日志（log_callback 在处理线程中调用，GUI 需要自行切换到界面线程）"""
+        if self.verbose:
+            print(message)  # 保持控制台输出
+        if self.log_callback:
+            self.log_callback(message + '\n')
+        
+    def normalize_path(self, path):
+        """标准化文件路径，处理不同操作系统的路径差异"""
+        return os.path.normpath(path)
+
+    def calculate_new_size(self, width, height, max_size_kb):
+        """计算保持宽高比的新尺寸"""
+        # 估算目标像素数（基于经验值）
+        target_pixels = max_size_kb * 1024 * 0.5  # 0.5是经验系数
+        current_pixels = width * height
+        
+        if current_pixels <= target_pixels:
+            return width, height
+            
+        scale = (target_pixels / current_pixels) ** 0.5
+        return int(width * scale), int(height * scale)
+
+    def compress_image(self, image_data, max_size_kb=200, compression_mode=CompressionMode.BALANCED,
+                       target_size=None):
+        """
+        压缩图片数据（优先使用缓存），返回 JPEG 或 PNG 数据
+        """
+        try:
+            if isinstance(image_data, io.BytesIO):
+                image_data = image_data.getvalue()
+            settings = self.compression_settings[compression_mode]
+            key = None
+            if self.cache is not None:
+                key = make_key(hashlib.sha256(image_data).digest(), compression_mode, settings, target_size)
+                cached = self.cache.get(key)
+                # 空数据是快速模式记录的“保留原图”，此处需要真正的压缩结果
+                if cached is not None and cached[1]:
+                    return cached[1]
+            compressed_data, ext = image_codec.compress_image(image_data, compression_mode, settings, target_size)
+            if key is not None:
+                self.cache.put(key, ext, compressed_data)
+            return compressed_data
+        except Exception as e:
+            raise Exception(f"压缩图片时出错: {str(e)}")
+
+    def anchor_display_size(self, info):
+        """图片在工作表上的显示尺寸（像素），只有 oneCellAnchor 的 ext 记录了尺寸，其余返回 None"""
+        ext = info.get('ext')
+        if ext is None or not getattr(ext, 'cx', None) or not getattr(ext, 'cy', None):
+            return None
+        return ext.cx / ooxml_media.EMU_PER_PIXEL, ext.cy / ooxml_media.EMU_PER_PIXEL
+
+    def log_progress(self, done, total):
+        """输出压缩进度（约每 5% 一条）"""
+        if done == total or done % max(1, total // 20) == 0:
+            self.log(f"已压缩 {done}/{total} 张图片")
+
+    def report_progress(self, done, total, image=None):
+        """记录进度、输出日志并调用 progress_callback"""
+        snapshot = self.progress.update(done, total, image)
+        self.log_progress(done, total)
+        if self.progress_callback:
+            self.progress_callback(snapshot)
+
+    def cancel(self):
+        """取消正在进行的处理（可在其他线程调用），process_excel 会尽快返回并删除未完成的输出文件"""
+        self._cancel_event.set()
+
+    @property
+    def cancelled(self):
+        """是否已请求取消"""
+        return self._cancel_event.is_set()
+
+    def validate_output(self, file_path):
+        """
+        校验写出的文件：流式检查 CRC、类型声明、引用关系和图片文件头（见 ooxml_media.validate_package），
+        full_validation 时再用 openpyxl 完整载入一次；校验失败时抛出异常
+        """
+        problems = ooxml_media.validate_package(file_path)
+        if problems:
+            for problem in problems[:20]:
+                self.log(f"校验问题：{problem}")
+            raise Exception(f"输出文件校验失败：{problems[0]}" +
+                            (f" 等 {len(problems)} 个问题" if len(problems) > 1 else ""))
+        if self.full_validation and self.document_format(file_path) == 'xlsx':
+            from openpyxl import load_workbook
+            load_workbook(file_path).close()
+
+    def document_format(self, file_path):
+        """文件类型：'xlsx'、'docx' 或 'pptx'（见 ooxml_media.FORMATS），无法识别时返回 None"""
+        try:
+            with zipfile.ZipFile(file_path) as zf:
+                return ooxml_media.package_format(zf)
+        except Exception:
+            return None
+
+    def has_vba(self, file_path):
+        """工作簿中是否有宏（openpyxl 对没有宏的文件使用 keep_vba 会写出指向不存在部件的引用）"""
+        try:
+            with zipfile.ZipFile(file_path) as zf:
+                return any(name.endswith('vbaProject.bin') for name in zf.namelist())
+        except zipfile.BadZipFile:
+            return False
+
+    def build_output_path(self, file_path, output_dir=None):
+        """
+        生成新文件路径，默认与原文件放在同一目录
+        以独占方式创建空文件占住文件名，多个进程同时处理同名文件时不会选到同一个路径
+        """
+        file_dir = output_dir or os.path.dirname(file_path)
+        file_name = os.path.basename(file_path)
+        name, ext = os.path.splitext(file_name)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        n = 0
+        while True:
+            suffix = f"_{n}" if n else ""
+            new_file_path = self.normalize_path(os.path.join(file_dir, f"{name}_compressed_{timestamp}{suffix}{ext}"))
+            if self._create_exclusive(new_file_path):
+                return new_file_path
+            # 同一秒内处理同名文件时换一个编号
+            n += 1
+
+    def estimate(self, file_path, compression_modes=None):
+        """
+        快速预估各压缩模式的效果（不载入 openpyxl，不写文件，通常不到一秒）
+        已经小于目标大小且不需要缩小的图片按原样计算
+        返回 savings_estimate.estimate_workbook 的结果，出错时抛出异常
+        """
+        modes = compression_modes or [CompressionMode.QUALITY, CompressionMode.BALANCED, CompressionMode.SIZE]
+        try:
+            result = savings_estimate.estimate_workbook(
+                self.normalize_path(file_path), {mode: self.compression_settings[mode] for mode in modes},
+                self.display_scale, self.max_workers)
+        except zipfile.BadZipFile as e:
+            raise Exception(f"无法打开文件（不是有效的 .xlsx/.docx/.pptx 文件）：{str(e)}")
+
+        self.log(f"原始文件大小: {result['bytes_before']/1024/1024:.2f}MB，"
+                 f"共 {result['images_total']} 张图片（重复 {result['duplicates']} 张），"
+                 f"试编码 {result['sampled']} 张")
+        for mode, estimate in result['modes'].items():
+            saved = 1 - estimate['bytes_after'] / result['bytes_before'] if result['bytes_before'] else 0
+            self.log(f"{mode}：预计 {estimate['bytes_after']/1024/1024:.2f}MB（节省 {saved:.0%}），"
+                     f"压缩 {estimate['images_processed']} 张，跳过 {estimate['images_skipped']} 张，"
+                     f"约 {estimate['seconds']:.1f} 秒")
+        return result
+
+    def process_excel(self, file_path, compression_mode=CompressionMode.BALANCED, engine=ProcessEngine.ZIP,
+                      output_path=None, budget_bytes=None, output_dir=None):
+        """
+        压缩一个工作簿中的图片
+        output_path 为空时在 output_dir（默认与原文件同一目录）中生成新文件名，见 build_output_path；
+        只有本次处理创建的输出文件才会在失败或取消时删除，已经存在的 output_path 不会被删除
+        budget_bytes 不为空时把整个工作簿压缩到该大小以内（只支持快速模式），
+        compression_mode 只决定最低质量和最高质量
+        返回处理摘要：file/output/ok/error/cancelled/mode/engine/budget_bytes/bytes_before/bytes_after/
+        images_total/images_processed/duplicates/cached/seconds/mb_per_s
+        """
+        start = time.perf_counter()
+        new_file_path = None
+        # 输出文件是否由本次处理创建（失败时只删除自己创建的文件）
+        created = False
+        self._cancel_event.clear()
+        self.progress = CompressionProgress()
+        summary = {
+            'file': file_path, 'output': None, 'ok': False, 'error': None, 'cancelled': False,
+            'mode': compression_mode, 'engine': engine, 'budget_bytes': budget_bytes,
+            'bytes_before': None, 'bytes_after': None,
+            'images_total': 0, 'images_processed': 0, 'duplicates': 0, 'cached': 0, 'seconds': None,
+            'mb_per_s': None,
+        }
+        try:
+            # 先确定并占住输出路径
+            file_path = self.normalize_path(file_path)
+            if output_path:
+                new_file_path = self.normalize_path(output_path)
+                created = self._create_exclusive(new_file_path)
+            else:
+                new_file_path = self.build_output_path(file_path, output_dir)
+                created = True
+
+            # 添加诊断信息
+            file_size = os.path.getsize(file_path)
+            free_space = shutil.disk_usage(os.path.dirname(os.path.abspath(file_path))).free
+            summary['bytes_before'] = file_size
+            self.log(f"原始文件大小: {file_size/1024/1024:.2f}MB")
+            self.log(f"磁盘剩余空间: {free_space/1024/1024:.2f}MB")
+            self.log(f"Python版本: {sys.version}")
+            self.log(f"操作系统: {platform.platform()}")
+            
+            self.log(f"正在处理文件：{file_path}")
+            self.log(f"处理引擎：{engine}")
+
+            if engine == ProcessEngine.OPENPYXL and self.document_format(file_path) not in ('xlsx', None):
+                self.log("兼容模式只支持 Excel 工作簿，已改用快速模式")
+                engine = summary['engine'] = ProcessEngine.ZIP
+
+            if budget_bytes and engine == ProcessEngine.OPENPYXL:
+                self.log("目标大小模式只支持快速模式，已改用快速模式")
+                engine = summary['engine'] = ProcessEngine.ZIP
+
+            if budget_bytes:
+                self.log(f"目标大小：{budget_bytes/1024/1024:.2f}MB")
+                stats = self._process_excel_budget(file_path, new_file_path, compression_mode, budget_bytes)
+            elif engine == ProcessEngine.OPENPYXL:
+                stats = self._process_excel_openpyxl(file_path, new_file_path, compression_mode)
+            else:
+                stats = self._process_excel_zip(file_path, new_file_path, compression_mode)
+
+            summary.update(
+                output=new_file_path, ok=True,
+                bytes_after=os.path.getsize(new_file_path),
+                images_total=stats['total'], images_processed=stats['processed'],
+                duplicates=stats.get('duplicates', 0), cached=stats.get('cached', 0),
+            )
+            message = (f"处理完成！\n"
+                      f"压缩模式：{compression_mode}\n"
+                      f"共处理 {stats['processed']}/{stats['total']} 张图片\n"
+                      f"新文件保存在：\n{new_file_path}")
+            self.log(message)
+            
+        except image_codec.CompressionCancelled:
+            summary.update(error="已取消", cancelled=True)
+            self.log("已取消处理")
+            if created:
+                self._remove_partial(new_file_path)
+        except Exception as e:
+            summary['error'] = str(e)
+            self.log(f"处理文件时出错：\n{str(e)}")
+            if created:
+                self._remove_partial(new_file_path)
+
+        elapsed = time.perf_counter() - start
+        summary['seconds'] = round(elapsed, 3)
+        if summary['bytes_before'] and elapsed > 0:
+            summary['mb_per_s'] = round(summary['bytes_before'] / 1024 / 1024 / elapsed, 2)
+        return summary
+
+    def _create_exclusive(self, path):
+        """以独占方式创建空文件，返回是否由本次创建（文件已存在时返回 False）"""
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o666)
+        except FileExistsError:
+            return False
+        os.close(fd)
+        return True
+
+    def _remove_partial(self, new_file_path):
+        """删除写了一半的输出文件"""
+        if new_file_path and os.path.exists(new_file_path):
+            try:
+                os.remove(new_file_path)
+            except OSError:
+                pass
+
+    def _process_excel_zip(self, file_path, new_file_path, compression_mode):
+        """
+        直接按 zip 重写：除媒体目录（xl/media、word/media、ppt/media）中的图片外，其余部件原样复制
+        返回 ooxml_media.rewrite_media 的统计信息
+        """
+        # 压缩后反而更大的图片保留原图
+        transform = functools.partial(image_codec.compress_media,
+                                      compression_mode=compression_mode,
+                                      settings=self.compression_settings[compression_mode],
+                                      display_scale=self.display_scale)
+        media_cache = None
+        if self.cache is not None:
+            media_cache = MediaCache(self.cache, compression_mode,
+                                     self.compression_settings[compression_mode], self.display_scale)
+        try:
+            stats = ooxml_media.rewrite_media(file_path, new_file_path, transform, log=self.log,
+                                              max_workers=self.max_workers, progress=self.report_progress,
+                                              cache=media_cache, cancel=self._cancel_event)
+        except zipfile.BadZipFile as e:
+            raise Exception(f"无法打开文件（不是有效的 .xlsx/.docx/.pptx 文件）：{str(e)}")
+
+        # 校验写出的压缩包
+        self.validate_output(new_file_path)
+
+        if stats['duplicates']:
+            self.log(f"合并了 {stats['duplicates']} 张重复图片")
+        if stats['cached']:
+            self.log(f"{stats['cached']} 张图片使用了缓存结果")
+        self.log(f"图片大小：{stats['bytes_before']/1024/1024:.2f}MB -> "
+                 f"{stats['bytes_after']/1024/1024:.2f}MB")
+        return stats
+
+    def _process_excel_budget(self, file_path, new_file_path, compression_mode, budget_bytes):
+        """
+        按目标大小重写：先测量所有图片再分配字节数，见 size_budget.rewrite_media_to_budget
+        压缩结果与分配额有关，不使用缓存
+        """
+        try:
+            stats = size_budget.rewrite_media_to_budget(file_path, new_file_path, budget_bytes, compression_mode,
+                                                        self.compression_settings[compression_mode],
+                                                        self.display_scale, log=self.log,
+                                                        max_workers=self.max_workers, progress=self.report_progress,
+                                                        cancel=self._cancel_event)
+        except zipfile.BadZipFile as e:
+            raise Exception(f"无法打开文件（不是有效的 .xlsx/.docx/.pptx 文件）：{str(e)}")
+
+        self.validate_output(new_file_path)
+
+        self.log(f"图片大小：{stats['bytes_before']/1024/1024:.2f}MB -> "
+                 f"{stats['bytes_after']/1024/1024:.2f}MB")
+        return stats
+
+    def _process_excel_openpyxl(self, file_path, new_file_path, compression_mode):
+        """
+        使用 openpyxl 载入工作簿、重建图片和锚点后保存（兼容模式）
+        返回统计信息：total/processed
+        """
+        # openpyxl 载入较慢，只在使用兼容模式时导入
+        from openpyxl import load_workbook
+        from openpyxl.drawing.image import Image
+
+        keep_vba = self.has_vba(file_path)
+        # 先尝试读取文件，��保文件可以正常打开
+        try:
+            wb = load_workbook(file_path, keep_vba=keep_vba, data_only=False, keep_links=True)
+        except Exception as e:
+            raise Exception(f"无法打开Excel文件：{str(e)}")
+
+        processed_images = 0
+        total_images = 0
+        
+        # 保存原始工作簿的一些重要属性
+        excel_properties = {
+            'encoding': 'utf-8',
+            'has_properties': hasattr(wb, 'properties'),
+            'has_vba': wb.vba_archive if hasattr(wb, 'vba_archive') else None,
+        }
+        
+        # 先收集所有工作表的图片和锚点信息
+        image_info = []
+        for sheet in wb.worksheets:
+            images = sheet._images.copy()
+            total_images += len(images)
+            
+            for img in images:
+                try:
+                    # 获取详细的锚点信息
+                    anchor_info = {}
+                    if hasattr(img.anchor, '_from'):
+                        anchor_from = img.anchor._from
+                        anchor_info['from'] = {
+                            'col': anchor_from.col,
+                            'row': anchor_from.row,
+                            'colOff': anchor_from.colOff,
+                            'rowOff': anchor_from.rowOff
+                        }
+                    if hasattr(img.anchor, 'to'):
+                        anchor_to = img.anchor.to
+                        anchor_info['to'] = {
+                            'col': anchor_to.col,
+                            'row': anchor_to.row,
+                            'colOff': anchor_to.colOff,
+                            'rowOff': anchor_to.rowOff
+                        }
+                    
+                    image_info.append({
+                        'sheet': sheet,
+                        'image': img,
+                        'anchor_type': img.anchor.__class__.__name__,
+                        'anchor_info': anchor_info,
+                        'width': img.width,
+                        'height': img.height,
+                        'ext': img.anchor.ext if hasattr(img.anchor, 'ext') else None,
+                        'data': img._data() if hasattr(img, '_data') else img.ref
+                    })
+                except Exception as e:
+                    self.log(f"警告：获取图片信息时出错，将保持原图：{str(e)}")
+                    image_info.append({'sheet': sheet, 'image': img, 'use_original': True})
+            
+            # 清除图片，压缩完成后按原顺序重新添加
+            sheet._images.clear()
+
+        # 内容和目标尺寸都相同的图片只压缩一次
+        settings = self.compression_settings[compression_mode]
+        unique_jobs = {}
+        for info in image_info:
+            if info.get('use_original'):
+                continue
+            data = info.pop('data')
+            if isinstance(data, io.BytesIO):
+                data = data.getvalue()
+            target_size = image_codec.display_target(self.anchor_display_size(info), self.display_scale)
+            info['job_key'] = make_key(hashlib.sha256(data).digest(), compression_mode, settings, target_size)
+            unique_jobs.setdefault(info['job_key'], (data, compression_mode, settings, target_size))
+        if len(unique_jobs) < sum(1 for info in image_info if 'job_key' in info):
+            self.log(f"发现重复图片，只需压缩 {len(unique_jobs)} 张")
+
+        # 先查缓存，其余图片并行压缩，结果按提交顺序返回
+        compressed = {}
+        if self.cache is not None:
+            for key in unique_jobs:
+                cached = self.cache.get(key)
+                if cached is not None and cached[1]:
+                    compressed[key] = (cached[1], None)
+                    self.report_progress(len(compressed), len(unique_jobs), ooxml_media.image_progress(
+                        key, len(unique_jobs[key][0]), (cached[1], cached[0]), 0, cached=True))
+            if compressed:
+                self.log(f"{len(compressed)} 张图片使用了缓存结果")
+        pending = [key for key in unique_jobs if key not in compressed]
+        results = image_codec.run_ordered(functools.partial(image_codec.timed_call, image_codec.compress_image),
+                                          (unique_jobs[key] for key in pending),
+                                          min(self.max_workers, len(pending)), cancel=self._cancel_event)
+        for key, (timed, error) in zip(pending, results):
+            result, seconds = timed if error is None else (None, 0)
+            if error is None:
+                compressed_data, ext = result
+                compressed[key] = (compressed_data, None)
+                if self.cache is not None:
+                    self.cache.put(key, ext, compressed_data)
+            else:
+                compressed[key] = (None, error)
+            self.report_progress(len(compressed), len(unique_jobs),
+                                 ooxml_media.image_progress(key, len(unique_jobs[key][0]), result, seconds))
+        for info in image_info:
+            if 'job_key' in info:
+                info['compressed'], info['error'] = compressed[info['job_key']]
+
+        for i, info in enumerate(image_info, 1):
+            sheet = info['sheet']
+            try:
+                if info.get('use_original'):
+                    sheet.add_image(info['image'])
+                    continue
+                if info['error'] is not None:
+                    raise Exception(f"压缩图片时出错: {str(info['error'])}")
+
+                new_img = Image(io.BytesIO(info['compressed']))
+                
+                # 设置锚点
+                if info['anchor_type'] == 'OneCellAnchor':
+                    from openpyxl.drawing.spreadsheet_drawing import OneCellAnchor, AnchorMarker
+                    marker = AnchorMarker(**info['anchor_info']['from'])
+                    new_img.anchor = OneCellAnchor(_from=marker, ext=info['ext'])
+                elif info['anchor_type'] == 'TwoCellAnchor':
+                    from openpyxl.drawing.spreadsheet_drawing import TwoCellAnchor, AnchorMarker
+                    marker1 = AnchorMarker(**info['anchor_info']['from'])
+                    marker2 = AnchorMarker(**info['anchor_info']['to'])
+                    new_img.anchor = TwoCellAnchor(_from=marker1, to=marker2)
+                
+                new_img.width = info['width']
+                new_img.height = info['height']
+                
+                sheet.add_image(new_img)
+                processed_images += 1
+                
+            except Exception as e:
+                self.log(f"处理第 {i} 张图片时出错：{str(e)}")
+                sheet.add_image(info['image'])
+
+        image_codec.check_cancel(self._cancel_event)
+
+        # 修改保存文件的逻辑
+        try:
+            # 先尝试常规保存
+            wb.save(new_file_path)
+            
+            # 验证新文件的结构
+            self.validate_output(new_file_path)
+            
+        except Exception as save_error:
+            self.log(f"常规保存失败，尝试使用备选方案：{str(save_error)}")
+            
+            # 备选保存方案 1：使用 force_zip64
+            try:
+                wb.save(new_file_path, force_zip64=True)
+            except Exception as e1:
+                self.log(f"备选方案1失败：{str(e1)}")
+                
+                # 备选保存方案 2：重新加载并保存
+                try:
+                    wb = load_workbook(file_path, keep_vba=keep_vba, data_only=False, keep_links=True)
+                    wb.save(new_file_path, force_zip64=True)
+                except Exception as e2:
+                    raise Exception(f"所有保存方案都失败：\n1. {str(save_error)}\n2. {str(e1)}\n3. {str(e2)}")
+
+        return {'total': total_images, 'processed': processed_images}
@@ -0,0 +1,159 @@
+"""
+压缩结果的持久化缓存
+以 (原图 SHA-256, 压缩模式及参数, 目标尺寸, 算法版本) 为键保存压缩后的图片，
+重复处理修改过的同一工作簿时，没变的图片直接复用上次的结果。
+缓存总大小超过上限时按最近使用时间淘汰
+"""
+import os
+import sys
+import time
+import json
+import sqlite3
+import hashlib
+import threading
+
+from image_codec import display_target
+
+# 压缩算法改变时递增，使旧的缓存结果失效
+CACHE_VERSION = 4
+
+# 默认缓存上限 512MB
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+def default_cache_path():
+    """各系统的用户缓存目录"""
+    if sys.platform.startswith('win'):
+        base = os.environ.get('LOCALAPPDATA') or os.path.join(os.path.expanduser('~'), 'AppData', 'Local')
+    elif sys.platform == 'darwin':
+        base = os.path.join(os.path.expanduser('~'), 'Library', 'Caches')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'ExcelImageCompressor', 'image_cache.sqlite3')
+
+
+def make_key(digest, compression_mode, settings, target_size):
+    """生成缓存键，digest 为原图数据的 SHA-256"""
+    params = json.dumps([CACHE_VERSION, compression_mode, settings,
+                         list(target_size) if target_size else None], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(digest + params.encode('utf-8')).hexdigest()
+
+
+class ImageCache:
+    """
+    基于 SQLite 的压缩结果缓存（线程安全，多个进程可同时使用同一个缓存文件）
+    """
+    def __init__(self, db_path=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.db_path = db_path or default_cache_path()
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._conn = None
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        """第一次使用时才打开数据库（允许在创建对象的线程之外使用）"""
+        if self._conn is None:
+            db_dir = os.path.dirname(self.db_path)
+            if db_dir:
+                os.makedirs(db_dir, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS images (
+                    key TEXT PRIMARY KEY,
+                    ext TEXT NOT NULL,
+                    data BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_images_last_used ON images (last_used)')
+            conn.commit()
+            self._total_bytes = conn.execute('SELECT COALESCE(SUM(size), 0) FROM images').fetchone()[0]
+            self._conn = conn
+        return self._conn
+
+    def get(self, key):
+        """读取缓存，返回 (扩展名, 数据)，未命中返回 None"""
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute('SELECT ext, data FROM images WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            conn.execute('UPDATE images SET last_used = ? WHERE key = ?', (time.time(), key))
+            conn.commit()
+            self.hits += 1
+            return row[0], bytes(row[1])
+
+    def put(self, key, ext, data):
+        """写入缓存，超过上限时淘汰最久未使用的结果"""
+        with self._lock:
+            conn = self._connect()
+            old = conn.execute('SELECT size FROM images WHERE key = ?', (key,)).fetchone()
+            conn.execute('INSERT OR REPLACE INTO images (key, ext, data, size, last_used) VALUES (?, ?, ?, ?, ?)',
+                         (key, ext, data, len(data), time.time()))
+            self._total_bytes += len(data) - (old[0] if old else 0)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+            conn.commit()
+
+    def _evict(self):
+        """按最近使用时间淘汰，直到总大小降到上限的 90% 以下"""
+        conn = self._conn
+        target = self.max_bytes * 0.9
+        # 其他进程可能也写入了缓存，以数据库中的实际大小为准
+        self._total_bytes = conn.execute('SELECT COALESCE(SUM(size), 0) FROM images').fetchone()[0]
+        rows = conn.execute('SELECT key, size FROM images ORDER BY last_used').fetchall()
+        removed = []
+        for key, size in rows:
+            if self._total_bytes <= target:
+                break
+            removed.append((key,))
+            self._total_bytes -= size
+        conn.executemany('DELETE FROM images WHERE key = ?', removed)
+
+    def close(self):
+        """关闭缓存"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class MediaCache:
+    """
+    绑定了压缩参数的缓存，供 ooxml_media.rewrite_media 使用
+    空数据表示“压缩后没有变小，保留原图”
+    """
+    def __init__(self, cache, compression_mode, settings, display_scale=None):
+        self.cache = cache
+        self.compression_mode = compression_mode
+        self.settings = settings
+        self.display_scale = display_scale
+
+    def key(self, data, display_size):
+        """计算图片的缓存键"""
+        target_size = display_target(display_size, self.display_scale)
+        return make_key(hashlib.sha256(data).digest(), self.compression_mode, self.settings, target_size)
+
+    def lookup(self, key, source_size):
+        """返回 (是否命中, transform 的结果)，缓存结果不比原图小时保留原图"""
+        cached = self.cache.get(key)
+        if cached is None:
+            return False, None
+        ext, data = cached
+        if not data or len(data) >= source_size:
+            return True, None
+        return True, (data, ext)
+
+    def store(self, key, result):
+        """保存 transform 的结果"""
+        if result is None:
+            self.cache.put(key, '', b'')
+        else:
+            data, ext = result
+            self.cache.put(key, ext, data)
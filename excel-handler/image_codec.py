@@ -0,0 +1,408 @@
+"""
+图片压缩核心
+不依赖 wx，可以在子进程中执行；run_ordered 用进程池并行压缩并按提交顺序返回结果
+"""
+import io
+import math
+import time
+import warnings
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait
+
+from PIL import Image as PILImage
+from PIL import ImageFile
+from PIL import ImageChops
+
+from compress_options import CompressionMode
+
+# 忽略 Pillow 的警告
+warnings.filterwarnings('ignore', category=UserWarning)
+# 允许截断的图片文件
+ImageFile.LOAD_TRUNCATED_IMAGES = True
+
+# 压缩模式对应的初始质量
+START_QUALITY = {CompressionMode.QUALITY: 95, CompressionMode.BALANCED: 85, CompressionMode.SIZE: 70}
+
+# 输出图片的最大尺寸
+MAX_SIZE = (4000, 3000)
+MAX_PIXELS = MAX_SIZE[0] * MAX_SIZE[1]
+
+# 判断图片类型时使用的缩略图边长
+CLASSIFY_SIZE = 256
+# 缩略图颜色数超过该值时视为颜色很多
+CLASSIFY_MAX_COLORS = 4096
+# 相邻像素灰度差小于该值视为渐变，否则视为边缘
+EDGE_THRESHOLD = 24
+# 颜色不超过 256 种的图片中渐变像素超过该比例时视为照片（灰度照片、扫描件）
+GRAYSCALE_MAX_GRADUAL = 0.5
+
+# 超过该像素数两倍的图片先在缩小图上试编码估算质量
+TRIAL_PIXELS = 1000000
+# 取样拼图的块大小（16 的倍数）
+TRIAL_TILE = 256
+# 估算编码大小时使用的缩略图边长
+TRIAL_THUMB_SIZE = 256
+
+
+def display_target(display_size, display_scale):
+    """显示尺寸乘以清晰度倍率，得到图片需要保留的像素尺寸；任一未知时返回 None"""
+    if not display_size or not display_scale:
+        return None
+    width, height = display_size
+    if width <= 0 or height <= 0:
+        return None
+    return math.ceil(width * display_scale), math.ceil(height * display_scale)
+
+
+def fit_output_size(size, target_size=None):
+    """
+    计算输出尺寸：先按 target_size 等比缩小到刚好覆盖该尺寸，
+    再限制在 4000x3000 像素以内；不会放大
+    """
+    width, height = size
+    if target_size:
+        scale = max(target_size[0] / width, target_size[1] / height)
+        if scale < 1:
+            width, height = max(1, round(width * scale)), max(1, round(height * scale))
+    if width * height > MAX_PIXELS:
+        ratio = min(MAX_SIZE[0] / width, MAX_SIZE[1] / height)
+        width, height = int(width * ratio), int(height * ratio)
+    return width, height
+
+
+def compress_image(image_data, compression_mode, settings, target_size=None):
+    """
+    压缩图片数据，返回 (数据, 扩展名)
+    照片编码为 JPEG；截图、图表等色彩较少的图形和带透明通道的图片编码为调色板 PNG
+    settings 为 {"min_quality": ..., "max_size_kb": ...}
+    target_size 为需要保留的像素尺寸，图片更大时等比缩小到刚好覆盖该尺寸
+    """
+    min_quality = settings["min_quality"]
+    max_bytes = settings["max_size_kb"] * 1024
+
+    if isinstance(image_data, io.BytesIO):
+        image_data = image_data.getvalue()
+
+    # 使用 PIL 打开图片并完全重新创建一个新图片，移除所有元数据
+    with PILImage.open(io.BytesIO(image_data)) as img:
+        # 解码前根据文件头中的尺寸确定输出尺寸
+        output_size = fit_output_size(img.size, target_size)
+        source_jpeg = img.format == 'JPEG'
+        if source_jpeg and output_size != img.size:
+            # DCT 域缩小：解码器直接输出 1/2、1/4 或 1/8 尺寸（不小于输出尺寸），
+            # 大幅减少解码时间和内存，后续的粘贴和缩放也只处理缩小后的像素
+            img.draft('RGB', output_size)
+
+        if has_transparency(img):
+            new_img = PILImage.new('RGBA', img.size)
+            new_img.paste(img.convert('RGBA'))
+        else:
+            # 直接转换为RGB
+            new_img = PILImage.new('RGB', img.size, (255, 255, 255))
+            new_img.paste(img)
+
+    # 在缩小前判断类型（缩小会把图形边缘插值成渐变）；
+    # JPEG 原图带有压缩噪点，量化为 PNG 通常反而更大，保持 JPEG
+    graphic = not source_jpeg and is_graphic(new_img)
+
+    # 调整大小（如果需要）
+    if new_img.size != output_size:
+        new_img = new_img.resize(output_size, PILImage.LANCZOS)
+    if graphic or new_img.mode == 'RGBA':
+        # 图形不抖动以保持边缘干净，带透明通道的照片抖动以减少色带
+        png = encode_png(new_img, dither=not graphic)
+        # 带透明通道的图形即使超过大小限制也保留透明
+        if len(png) <= max_bytes or (graphic and new_img.mode == 'RGBA'):
+            return png, 'png'
+    elif new_img.getcolors(256) is not None:
+        # 颜色不超过 256 种的照片（灰度照片、扫描件、渐变）调色板 PNG 无损，与 JPEG 比较后取较小的
+        png = encode_png(new_img)
+    else:
+        png = None
+
+    # 照片（或超过大小限制的 PNG）改用 JPEG，透明部分以白色填充
+    if new_img.mode == 'RGBA':
+        background = PILImage.new('RGB', new_img.size, (255, 255, 255))
+        background.paste(new_img, mask=new_img.split()[3])
+        new_img = background
+
+    # 二分查找满足大小限制的最高质量，最后只做一次渐进式编码
+    quality, data = search_quality(new_img, max_bytes, min_quality,
+                                   START_QUALITY[compression_mode])
+    final = encode_jpeg(new_img, quality, progressive=True)
+    # 渐进式编码偶尔比查找时的编码更大，取较小的一个
+    if data is None or len(final) <= len(data):
+        data = final
+    if png is not None and len(png) <= len(data):
+        return png, 'png'
+    return data, 'jpeg'
+
+
+def has_transparency(img):
+    """图片是否有实际用到的透明通道（全不透明的 alpha 通道不算）"""
+    if img.mode in ('RGBA', 'LA', 'PA'):
+        return img.getchannel('A').getextrema()[0] < 255
+    if img.mode == 'P' and 'transparency' in img.info:
+        return img.convert('RGBA').getchannel('A').getextrema()[0] < 255
+    return False
+
+
+def is_graphic(img):
+    """
+    判断图片是截图、图表等平面图形（适合调色板 PNG）还是照片（适合 JPEG）
+    在最近邻缩略图上统计颜色数和相邻像素差：图形颜色少、大片区域完全相同、
+    边缘处变化剧烈；照片颜色多，相邻像素普遍有小幅变化。
+    灰度照片和扫描件的颜色也不超过 256 种，但相邻像素大多是小幅变化，仍按照片处理
+    """
+    thumb = img.convert('RGB')
+    if max(thumb.size) > CLASSIFY_SIZE:
+        ratio = CLASSIFY_SIZE / max(thumb.size)
+        thumb = thumb.resize((max(1, round(thumb.width * ratio)), max(1, round(thumb.height * ratio))),
+                             PILImage.NEAREST)
+    if thumb.width < 2:
+        return True
+
+    # 水平相邻像素差的直方图
+    gray = thumb.convert('L')
+    shifted = gray.crop((1, 0, gray.width, gray.height))
+    diff = ImageChops.difference(gray.crop((0, 0, gray.width - 1, gray.height)), shifted)
+    histogram = diff.histogram()
+    total = sum(histogram)
+    flat = histogram[0] / total
+    gradual = sum(histogram[1:EDGE_THRESHOLD]) / total
+
+    colors = thumb.getcolors(CLASSIFY_MAX_COLORS)
+    if colors is not None and len(colors) <= 256 and gradual <= GRAYSCALE_MAX_GRADUAL:
+        return True
+    if colors is None:
+        # 颜色很多时只有大面积纯色、几乎没有渐变的图片才算图形（如带抗锯齿文字的截图）
+        return flat >= 0.7 and gradual <= 0.1
+    return flat >= 0.5 and gradual <= 0.25
+
+
+def encode_png(img, dither=False):
+    """
+    量化为 256 色调色板后编码为 PNG（保留透明通道）
+    FASTOCTREE 支持 RGBA，速度是 MEDIANCUT 的数倍；颜色不超过 256 种时量化无损
+    抖动后的图片很难再压缩，不做耗时的 optimize
+    """
+    palette = img.quantize(colors=256, method=PILImage.Quantize.FASTOCTREE,
+                           dither=PILImage.Dither.FLOYDSTEINBERG if dither else PILImage.Dither.NONE)
+    output = io.BytesIO()
+    palette.save(output, format='PNG', optimize=not dither)
+    return output.getvalue()
+
+
+def encode_jpeg(img, quality, progressive=False):
+    """
+    编码为 JPEG 字节（优化霍夫曼表）
+    查找质量时使用非渐进式编码，速度约为渐进式的两倍，大小基本一致
+    """
+    output = io.BytesIO()
+    img.save(output, format='JPEG', quality=quality, optimize=True, progressive=progressive)
+    return output.getvalue()
+
+
+def sample_tiles(img, trial_pixels=TRIAL_PIXELS, tile=TRIAL_TILE):
+    """
+    从原图均匀取若干块原分辨率的区域拼成试编码图
+    与整体缩小不同，拼图保留了原图的纹理密度，编码大小与面积近似成正比
+    """
+    width, height = img.size
+    grid = max(1, int((trial_pixels / (tile * tile)) ** 0.5))
+    cols = min(grid, width // tile)
+    rows = min(grid, height // tile)
+    sample = PILImage.new(img.mode, (cols * tile, rows * tile))
+    for row in range(rows):
+        top = (height - tile) * row // max(1, rows - 1) if rows > 1 else (height - tile) // 2
+        top -= top % 16  # 对齐 JPEG 宏块
+        for col in range(cols):
+            left = (width - tile) * col // max(1, cols - 1) if cols > 1 else (width - tile) // 2
+            left -= left % 16
+            sample.paste(img.crop((left, top, left + tile, top + tile)), (col * tile, row * tile))
+    return sample
+
+
+def search_quality(img, max_bytes, min_quality, max_quality, trial_pixels=TRIAL_PIXELS):
+    """
+    二分查找编码后不超过 max_bytes 的最高质量
+    返回 (质量, 该质量下的编码结果)；没有满足条件的质量时返回 (min_quality, None)
+    大图先在取样拼图上估算质量（按同一质量下的大小比例换算目标），
+    再从估算值出发在原图上倍增步长确定区间后二分；估算准确时只需两次原图编码
+    """
+    data = encode_jpeg(img, max_quality)
+    if len(data) <= max_bytes:
+        return max_quality, data
+
+    low, high = min_quality, max_quality - 1
+    width, height = img.size
+    if trial_pixels and width * height > trial_pixels * 2 and high - low > 8:
+        trial = sample_tiles(img, trial_pixels)
+        # 用最高质量下两者的大小比例校准目标
+        target = max_bytes * len(encode_jpeg(trial, max_quality)) / len(data)
+        estimate, _ = _bisect_quality(trial, target, low, high)
+        return _gallop_quality(img, max_bytes, estimate, low, high)
+
+    return _bisect_quality(img, max_bytes, low, high)
+
+
+def _gallop_quality(img, max_bytes, estimate, low, high):
+    """
+    从估算质量出发，按 1、2、4... 的步长向上或向下寻找区间，再在区间内二分
+    返回值与 _bisect_quality 相同
+    """
+    data = encode_jpeg(img, estimate)
+    step = 1
+    if len(data) <= max_bytes:
+        best = (estimate, data)
+        while best[0] + step <= high:
+            probe = best[0] + step
+            data = encode_jpeg(img, probe)
+            if len(data) > max_bytes:
+                return _bisect_quality(img, max_bytes, best[0] + 1, probe - 1, best=best)
+            best = (probe, data)
+            step *= 2
+        return _bisect_quality(img, max_bytes, best[0] + 1, high, best=best)
+
+    upper = estimate - 1
+    while upper - step + 1 >= low:
+        probe = upper - step + 1
+        data = encode_jpeg(img, probe)
+        if len(data) <= max_bytes:
+            return _bisect_quality(img, max_bytes, probe + 1, upper, best=(probe, data))
+        upper = probe - 1
+        step *= 2
+    return _bisect_quality(img, max_bytes, low, upper)
+
+
+def _bisect_quality(img, max_bytes, low, high, best=None):
+    """
+    在 [low, high] 中二分查找不超过 max_bytes 的最高质量
+    返回 (质量, 编码结果)，找不到时返回 best，默认为 (low, None)
+    """
+    best = best or (low, None)
+    while low <= high:
+        mid = (low + high) // 2
+        data = encode_jpeg(img, mid)
+        if len(data) <= max_bytes:
+            best = (mid, data)
+            low = mid + 1
+        else:
+            high = mid - 1
+    return best
+
+
+def trial_encode(data, target_size, qualities, thumb_size=TRIAL_THUMB_SIZE):
+    """
+    在缩略图上按若干质量试编码，估算图片输出后的编码大小
+    JPEG 原图用 draft 按 1/8 等比例解码，不做完整解码
+    返回 {'source_size': 原图尺寸, 'size': 输出尺寸, 'graphic': 是否为图形,
+          'bytes': {质量: 估算大小}, 'decode_seconds', 'decoded_pixels', 'encode_seconds', 'encoded_pixels'}
+    图形按调色板 PNG 估算，没有质量参数，各质量的估算值相同
+    """
+    start = time.perf_counter()
+    with PILImage.open(io.BytesIO(data)) as img:
+        source_size = img.size
+        output_size = fit_output_size(img.size, target_size)
+        source_jpeg = img.format == 'JPEG'
+        if source_jpeg:
+            img.draft('RGB', (thumb_size, thumb_size))
+        thumb = PILImage.new('RGB', img.size, (255, 255, 255))
+        if has_transparency(img):
+            rgba = img.convert('RGBA')
+            thumb.paste(rgba, mask=rgba.getchannel('A'))
+        else:
+            thumb.paste(img)
+    decode_seconds = time.perf_counter() - start
+    decoded_pixels = thumb.width * thumb.height
+
+    graphic = not source_jpeg and is_graphic(thumb)
+    # 图形用最近邻缩小，避免边缘被插值成渐变
+    thumb.thumbnail((thumb_size, thumb_size), PILImage.NEAREST if graphic else PILImage.LANCZOS)
+    scale = output_size[0] * output_size[1] / (thumb.width * thumb.height)
+
+    start = time.perf_counter()
+    if graphic:
+        estimate = len(encode_png(thumb)) * scale
+        estimates = {quality: estimate for quality in qualities}
+        encodes = 1
+    else:
+        estimates = {quality: len(encode_jpeg(thumb, quality)) * scale for quality in qualities}
+        encodes = len(estimates)
+    return {
+        'source_size': source_size, 'size': output_size, 'graphic': graphic, 'bytes': estimates,
+        'decode_seconds': decode_seconds, 'decoded_pixels': decoded_pixels,
+        'encode_seconds': time.perf_counter() - start, 'encoded_pixels': thumb.width * thumb.height * encodes,
+    }
+
+
+def compress_media(name, data, display_size=None, compression_mode=None, settings=None, display_scale=None):
+    """
+    压缩压缩包中的一张媒体图片
+    display_scale 不为空时按 显示尺寸 x display_scale 缩小图片
+    返回 (新数据, 新扩展名)，压缩后反而更大时返回 None 保留原图
+    """
+    compressed_data, ext = compress_image(data, compression_mode, settings,
+                                          target_size=display_target(display_size, display_scale))
+    if len(compressed_data) >= len(data):
+        return None
+    return compressed_data, ext
+
+
+class CompressionCancelled(Exception):
+    """处理被用户取消"""
+
+
+def timed_call(fn, *args):
+    """执行 fn(*args)，返回 (结果, 耗时秒数)；在子进程中计时，不包含排队时间"""
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def check_cancel(cancel):
+    """cancel（threading.Event）已设置时抛出 CompressionCancelled"""
+    if cancel is not None and cancel.is_set():
+        raise CompressionCancelled("已取消")
+
+
+def run_ordered(fn, jobs, max_workers=1, window=None, cancel=None):
+    """
+    对每个参数元组执行 fn，按 jobs 的顺序逐个产出 (结果, 异常)
+    max_workers > 1 时使用进程池；同时在途的任务数不超过 window，避免一次把所有图片读入内存。
+    cancel（threading.Event）被设置后抛出 CompressionCancelled，进程池不再等待排队中的任务
+    """
+    if max_workers <= 1:
+        for args in jobs:
+            check_cancel(cancel)
+            try:
+                yield fn(*args), None
+            except Exception as e:
+                yield None, e
+        return
+
+    window = window or max_workers * 2
+    pending = deque()
+    executor = ProcessPoolExecutor(max_workers=max_workers)
+    try:
+        for args in jobs:
+            check_cancel(cancel)
+            pending.append(executor.submit(fn, *args))
+            if len(pending) >= window:
+                yield _future_result(pending.popleft(), cancel)
+        while pending:
+            yield _future_result(pending.popleft(), cancel)
+    finally:
+        # 正常结束时任务都已完成；取消或调用方提前退出时取消排队的任务，不等待正在执行的任务
+        executor.shutdown(wait=not pending, cancel_futures=True)
+
+
+def _future_result(future, cancel=None):
+    """取出任务结果，异常不向外抛出；等待期间定期检查是否取消"""
+    while not future.done():
+        check_cancel(cancel)
+        wait([future], timeout=0.1 if cancel is not None else None)
+    try:
+        return future.result(), None
+    except Exception as e:
+        return None, e
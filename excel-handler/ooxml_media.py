@@ -0,0 +1,603 @@
+"""
+OOXML 媒体重写引擎
+直接以 zip 方式打开 .xlsx/.docx/.pptx，除 xl/media、word/media、ppt/media 中的图片以外的所有成员原样流式复制，
+只对图片重新压缩；图片扩展名变化时同步更新 [Content_Types].xml 和 .rels 引用
+"""
+import io
+import re
+import zlib
+import shutil
+import hashlib
+import functools
+import posixpath
+import zipfile
+import xml.etree.ElementTree as ET
+
+from PIL import Image as PILImage
+
+from image_codec import run_ordered, timed_call, check_cancel
+
+# 可以用 Pillow 重新编码的位图格式（emf/wmf/svg 等矢量图保持原样）
+RASTER_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'tif', 'tiff', 'webp'}
+
+CONTENT_TYPES = {
+    'jpeg': 'image/jpeg',
+    'jpg': 'image/jpeg',
+    'png': 'image/png',
+    'gif': 'image/gif',
+    'bmp': 'image/bmp',
+    'tif': 'image/tiff',
+    'tiff': 'image/tiff',
+    'webp': 'image/webp',
+}
+
+CONTENT_TYPES_NAME = '[Content_Types].xml'
+TARGET_PATTERN = re.compile(r'(Target=")([^"]+)(")')
+PART_NAME_PATTERN = re.compile(r'(PartName=")([^"]+)(")')
+
+# DrawingML 命名空间
+NS_XDR = '{http://schemas.openxmlformats.org/drawingml/2006/spreadsheetDrawing}'
+NS_WP = '{http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing}'
+NS_W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+NS_P = '{http://schemas.openxmlformats.org/presentationml/2006/main}'
+NS_A = '{http://schemas.openxmlformats.org/drawingml/2006/main}'
+NS_R = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+NS_PKG_REL = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+NS_CONTENT_TYPES = '{http://schemas.openxmlformats.org/package/2006/content-types}'
+
+# 解析图片尺寸时读取的文件开头字节数（JPEG 的 EXIF 更大时再读取整个文件）
+HEADER_BYTES = 64 * 1024
+
+# 1 英寸 = 914400 EMU = 96 像素
+EMU_PER_PIXEL = 9525
+
+
+def is_media(name, prefix):
+    """是否为可重新压缩的媒体文件（prefix 为媒体目录，如 xl/media/）"""
+    if not name.startswith(prefix):
+        return False
+    ext = name.rsplit('.', 1)[-1].lower() if '.' in name else ''
+    return ext in RASTER_EXTENSIONS
+
+
+def list_media(zin, prefix=None):
+    """列出压缩包中的媒体成员，prefix 为空时按文件类型选择媒体目录"""
+    prefix = _media_prefix(zin, prefix)
+    return [info for info in zin.infolist() if is_media(info.filename, prefix)]
+
+
+def _unique_name(name, taken):
+    """避免改扩展名后与已有成员重名"""
+    if name not in taken:
+        return name
+    stem, ext = posixpath.splitext(name)
+    n = 1
+    while f"{stem}_{n}{ext}" in taken:
+        n += 1
+    return f"{stem}_{n}{ext}"
+
+
+def _rels_base_dir(rels_name):
+    """.rels 文件对应部件所在目录，如 xl/drawings/_rels/drawing1.xml.rels -> xl/drawings"""
+    return posixpath.dirname(posixpath.dirname(rels_name))
+
+
+def _resolve_target(base_dir, target):
+    """将 .rels 中的 Target 转为压缩包内的绝对路径，外部链接返回 None"""
+    if '://' in target:
+        return None
+    if target.startswith('/'):
+        return target.lstrip('/')
+    return posixpath.normpath(posixpath.join(base_dir, target))
+
+
+def read_rels(zin, rels_name):
+    """读取 .rels，返回 Id -> 压缩包内绝对路径"""
+    base_dir = _rels_base_dir(rels_name)
+    root = ET.fromstring(zin.read(rels_name))
+    targets = {}
+    for rel in root.iter(f'{NS_PKG_REL}Relationship'):
+        absolute = _resolve_target(base_dir, rel.get('Target', ''))
+        if absolute:
+            targets[rel.get('Id')] = absolute
+    return targets
+
+
+def patch_rels(xml, rels_name, renames):
+    """更新 .rels 中指向被重命名媒体的 Target"""
+    base_dir = _rels_base_dir(rels_name)
+
+    def replace(match):
+        target = match.group(2)
+        absolute = _resolve_target(base_dir, target)
+        new_name = renames.get(absolute) if absolute else None
+        if new_name is None:
+            return match.group(0)
+        if target.startswith('/'):
+            new_target = '/' + new_name
+        else:
+            new_target = posixpath.relpath(new_name, base_dir or '.')
+        return match.group(1) + new_target + match.group(3)
+
+    return TARGET_PATTERN.sub(replace, xml)
+
+
+def patch_content_types(xml, renames, removed=()):
+    """为新扩展名补充 Default 类型，更新 Override 中的部件名并删除已移除部件的 Override"""
+    if removed:
+        xml = re.sub(r'<Override\b[^>]*PartName="/?([^"]+)"[^>]*/>',
+                     lambda m: '' if m.group(1) in removed else m.group(0), xml)
+
+    def replace(match):
+        new_name = renames.get(match.group(2).lstrip('/'))
+        if new_name is None:
+            return match.group(0)
+        return match.group(1) + '/' + new_name + match.group(3)
+
+    xml = PART_NAME_PATTERN.sub(replace, xml)
+
+    existing = {ext.lower() for ext in re.findall(r'<Default\s+Extension="([^"]+)"', xml)}
+    additions = ''
+    for new_name in sorted(set(renames.values())):
+        ext = new_name.rsplit('.', 1)[-1].lower()
+        if ext not in existing and ext in CONTENT_TYPES:
+            additions += f'<Default Extension="{ext}" ContentType="{CONTENT_TYPES[ext]}"/>'
+            existing.add(ext)
+    if additions:
+        xml = re.sub(r'(<Types\b[^>]*>)', lambda m: m.group(1) + additions, xml, count=1)
+    return xml
+
+
+def find_duplicates(zin, media):
+    """
+    查找内容完全相同的媒体文件
+    先按中央目录中的 CRC 和大小分组（不需要读取数据），再用 SHA-256 确认
+    返回 重复部件 -> 首次出现的部件
+    """
+    groups = {}
+    for info in media:
+        groups.setdefault((info.CRC, info.file_size), []).append(info)
+
+    duplicates = {}
+    for candidates in groups.values():
+        if len(candidates) < 2:
+            continue
+        first_by_digest = {}
+        for info in candidates:
+            digest = hashlib.sha256(zin.read(info)).digest()
+            canonical = first_by_digest.setdefault(digest, info.filename)
+            if canonical != info.filename:
+                duplicates[info.filename] = canonical
+    return duplicates
+
+
+def _max_size(a, b):
+    """两个显示尺寸逐维取最大值，任一未知（None）时结果也未知"""
+    if not a or not b:
+        return None
+    return max(a[0], b[0]), max(a[1], b[1])
+
+
+def _display_size(ext, scale=(1.0, 1.0)):
+    """a:ext 或 wp:extent 的 cx/cy（EMU）乘以 scale 后转为像素，无法得知时返回 None"""
+    if ext is None or scale is None:
+        return None
+    try:
+        return (int(ext.get('cx')) / EMU_PER_PIXEL * scale[0], int(ext.get('cy')) / EMU_PER_PIXEL * scale[1])
+    except (TypeError, ValueError):
+        return None
+
+
+def _crop_scale(blip_fill, scale=(1.0, 1.0)):
+    """
+    图片被裁剪（a:srcRect）时只显示一部分，整张图片的显示尺寸要按可见比例放大
+    返回在 scale 基础上的放大倍数，裁剪参数无法解析时返回 None
+    """
+    rect = blip_fill.find(f'{NS_A}srcRect')
+    if rect is None or scale is None:
+        return scale
+    try:
+        # 以 1/100000 为单位，负数表示向外扩展
+        visible_x = 1 - (int(rect.get('l', 0)) + int(rect.get('r', 0))) / 100000
+        visible_y = 1 - (int(rect.get('t', 0)) + int(rect.get('b', 0))) / 100000
+    except ValueError:
+        return None
+    if visible_x <= 0 or visible_y <= 0:
+        return None
+    return scale[0] / visible_x, scale[1] / visible_y
+
+
+def _blips(element):
+    """元素中嵌入的图片，依次返回 (r:embed, blipFill 元素)"""
+    for node in element.iter():
+        if node.tag.endswith('}blipFill'):
+            blip = node.find(f'{NS_A}blip')
+            if blip is not None and blip.get(f'{NS_R}embed'):
+                yield blip.get(f'{NS_R}embed'), node
+
+
+def _group_scale(xfrm, scale):
+    """组合形状中子形状的坐标（chExt）到实际大小（ext）的比例"""
+    try:
+        ext = xfrm.find(f'{NS_A}ext')
+        child_ext = xfrm.find(f'{NS_A}chExt')
+        return (scale[0] * int(ext.get('cx')) / int(child_ext.get('cx')),
+                scale[1] * int(ext.get('cy')) / int(child_ext.get('cy')))
+    except (AttributeError, TypeError, ValueError, ZeroDivisionError):
+        return None
+
+
+def _shape_extents(shapes, ns, scale=(1.0, 1.0), fallback_ext=None):
+    """
+    遍历 DrawingML 形状树（ns 为 xdr 或 p 命名空间），返回 (r:embed, 显示尺寸)
+    图片（pic）和以图片填充的形状（sp）使用自身的 xfrm，组合形状（grpSp）按 ext/chExt 换算子形状；
+    fallback_ext 为形状没有 xfrm 时使用的尺寸（如 oneCellAnchor 的 ext）
+    """
+    for shape in shapes:
+        if shape.tag == f'{ns}grpSp':
+            xfrm = shape.find(f'{ns}grpSpPr/{NS_A}xfrm')
+            yield from _shape_extents(shape, ns, _group_scale(xfrm, scale) if scale else None)
+        elif shape.tag in (f'{ns}pic', f'{ns}sp'):
+            ext = shape.find(f'{ns}spPr/{NS_A}xfrm/{NS_A}ext')
+            if ext is None:
+                ext = fallback_ext
+            for r_id, blip_fill in _blips(shape):
+                yield r_id, _display_size(ext, _crop_scale(blip_fill, scale))
+
+
+def _spreadsheet_extents(zin, name):
+    """Excel drawing 部件：twoCellAnchor 没有 xfrm 时无法得知尺寸"""
+    root = ET.fromstring(zin.read(name))
+    for anchor in root:
+        yield from _shape_extents(anchor, NS_XDR, fallback_ext=anchor.find(f'{NS_XDR}ext'))
+
+
+def _word_extents(zin, name):
+    """
+    Word 文档、页眉、页脚等部件：wp:inline / wp:anchor 的 wp:extent
+    document.xml 可能很大，流式解析，处理完的段落随即释放
+    """
+    with zin.open(name) as f:
+        for _, element in ET.iterparse(f):
+            if element.tag in (f'{NS_WP}inline', f'{NS_WP}anchor'):
+                # 组合图形中的各图片都按整个组合的大小计算（只会偏大，不会缩得过小）
+                extent = element.find(f'{NS_WP}extent')
+                for r_id, blip_fill in _blips(element):
+                    yield r_id, _display_size(extent, _crop_scale(blip_fill))
+                element.clear()
+            elif element.tag == f'{NS_W}p':
+                element.clear()
+
+
+def _presentation_extents(zin, name):
+    """PowerPoint 幻灯片、版式、母版和备注页：p:spTree 中形状的 xfrm（背景图片尺寸未知）"""
+    root = ET.fromstring(zin.read(name))
+    tree = root.find(f'{NS_P}cSld/{NS_P}spTree')
+    if tree is not None:
+        yield from _shape_extents(tree, NS_P)
+
+
+# 支持的 Office 格式：根目录、媒体目录、含图片显示尺寸的部件目录及其解析函数
+FORMATS = {
+    'xlsx': {'name': 'Excel', 'root': 'xl/', 'media_prefix': 'xl/media/',
+             'layout_prefixes': ('xl/drawings/',), 'extents': _spreadsheet_extents},
+    'docx': {'name': 'Word', 'root': 'word/', 'media_prefix': 'word/media/',
+             'layout_prefixes': ('word/',), 'extents': _word_extents},
+    'pptx': {'name': 'PowerPoint', 'root': 'ppt/', 'media_prefix': 'ppt/media/',
+             'layout_prefixes': ('ppt/slides/', 'ppt/slideLayouts/', 'ppt/slideMasters/', 'ppt/notesSlides/'),
+             'extents': _presentation_extents},
+}
+
+
+def package_format(zin):
+    """按根目录判断压缩包是哪种 Office 文件，返回 FORMATS 中的键；无法识别时抛出异常"""
+    names = zin.namelist()
+    for key, fmt in FORMATS.items():
+        if any(name.startswith(fmt['root']) for name in names):
+            return key
+    raise Exception("不是 Excel、Word 或 PowerPoint 文件")
+
+
+def _media_prefix(zin, prefix):
+    """prefix 为空时按文件类型选择媒体目录"""
+    return prefix or FORMATS[package_format(zin)]['media_prefix']
+
+
+def media_display_sizes(zin, prefix=None):
+    """
+    从引用媒体图片的部件（Excel drawing、Word 文档、PowerPoint 幻灯片等）读取每张图片的显示尺寸
+    返回 媒体路径 -> (宽, 高)，单位为 96 DPI 下的像素，尺寸未知时为 None；
+    同一图片被多处引用时取最大值，任一引用无法得知尺寸（图表、VML、背景等）时为 None
+    """
+    fmt = FORMATS[package_format(zin)]
+    prefix = prefix or fmt['media_prefix']
+    names = set(zin.namelist())
+    sizes = {}
+    for rels_name in sorted(names):
+        if not rels_name.endswith('.rels'):
+            continue
+        try:
+            targets = read_rels(zin, rels_name)
+        except ET.ParseError:
+            continue
+        media_targets = {r_id: target for r_id, target in targets.items() if is_media(target, prefix)}
+        if not media_targets:
+            continue
+
+        part = posixpath.join(_rels_base_dir(rels_name), posixpath.basename(rels_name)[:-len('.rels')])
+        found = {}
+        if part in names and part.endswith('.xml') and part.startswith(fmt['layout_prefixes']):
+            try:
+                for r_id, size in fmt['extents'](zin, part):
+                    if r_id in media_targets:
+                        found[r_id] = _max_size(found[r_id], size) if r_id in found else size
+            except ET.ParseError:
+                found = {}
+
+        for r_id, media_name in media_targets.items():
+            size = found.get(r_id)
+            sizes[media_name] = _max_size(sizes[media_name], size) if media_name in sizes else size
+    return sizes
+
+
+def read_image_header(zin, info):
+    """只解析图片文件头，返回 (格式, (宽, 高))，无法识别时返回 (None, None)"""
+    with zin.open(info) as f:
+        head = f.read(HEADER_BYTES)
+    candidates = [head] if len(head) >= info.file_size else [head, None]
+    for data in candidates:
+        try:
+            with PILImage.open(io.BytesIO(data if data is not None else zin.read(info))) as img:
+                return img.format, img.size
+        except Exception:
+            continue
+    return None, None
+
+
+def _check_crc(zin, info):
+    """流式读取一个成员以校验 CRC，返回错误信息，通过时返回 None"""
+    try:
+        with zin.open(info) as f:
+            while f.read(1024 * 1024):
+                pass
+    except (zipfile.BadZipFile, zlib.error, EOFError, OSError) as e:
+        return str(e)
+    return None
+
+
+def validate_package(path, prefix=None):
+    """
+    流式校验 OOXML 压缩包的结构，不载入整个工作簿
+    - 每个成员的 CRC，没有重名成员
+    - [Content_Types].xml 为每个部件声明了类型，Override 不指向不存在的部件
+    - 每个 .rels 中的内部引用都指向存在的部件（包括所有媒体引用）
+    - 媒体图片的文件头可以识别
+    返回问题列表，为空表示通过
+    """
+    problems = []
+    with zipfile.ZipFile(path) as zin:
+        infos = zin.infolist()
+        names = [info.filename for info in infos]
+        parts = set(names)
+        if len(parts) != len(names):
+            problems.append("压缩包中有重名成员")
+
+        for info in infos:
+            error = _check_crc(zin, info)
+            if error:
+                problems.append(f"{info.filename}：{error}")
+        if problems:
+            return problems
+
+        if CONTENT_TYPES_NAME not in parts:
+            return problems + [f"缺少 {CONTENT_TYPES_NAME}"]
+        if '_rels/.rels' not in parts:
+            problems.append("缺少 _rels/.rels")
+        try:
+            types = ET.fromstring(zin.read(CONTENT_TYPES_NAME))
+        except ET.ParseError as e:
+            return problems + [f"{CONTENT_TYPES_NAME} 无法解析：{str(e)}"]
+        defaults = {node.get('Extension', '').lower() for node in types.iter(f'{NS_CONTENT_TYPES}Default')}
+        overrides = {node.get('PartName', '').lstrip('/') for node in types.iter(f'{NS_CONTENT_TYPES}Override')}
+        for part in sorted(overrides - parts):
+            problems.append(f"{CONTENT_TYPES_NAME} 声明了不存在的部件：{part}")
+        for name in names:
+            if name == CONTENT_TYPES_NAME or name.endswith('/'):
+                continue
+            ext = name.rsplit('.', 1)[-1].lower() if '.' in posixpath.basename(name) else ''
+            if name not in overrides and ext not in defaults:
+                problems.append(f"部件没有声明类型：{name}")
+
+        for name in names:
+            if not name.endswith('.rels'):
+                continue
+            try:
+                root = ET.fromstring(zin.read(name))
+            except ET.ParseError as e:
+                problems.append(f"{name} 无法解析：{str(e)}")
+                continue
+            base_dir = _rels_base_dir(name)
+            for rel in root.iter(f'{NS_PKG_REL}Relationship'):
+                if rel.get('TargetMode') == 'External':
+                    continue
+                target = _resolve_target(base_dir, rel.get('Target', ''))
+                if target and target not in parts:
+                    problems.append(f"{name} 引用了不存在的部件：{target}")
+
+        try:
+            prefix = _media_prefix(zin, prefix)
+        except Exception as e:
+            return problems + [str(e)]
+        for info in list_media(zin, prefix):
+            fmt, _ = read_image_header(zin, info)
+            if fmt is None:
+                problems.append(f"图片无法识别：{info.filename}")
+    return problems
+
+
+def _copy_member(zin, zout, info):
+    """原样流式复制一个成员（保留压缩方式和时间戳）"""
+    new_info = zipfile.ZipInfo(info.filename, date_time=info.date_time)
+    new_info.compress_type = info.compress_type
+    new_info.external_attr = info.external_attr
+    new_info.comment = info.comment
+    new_info.extra = info.extra
+    with zin.open(info) as src, zout.open(new_info, 'w', force_zip64=info.file_size > 0x7FFFFFFF) as dst:
+        shutil.copyfileobj(src, dst, 1024 * 1024)
+
+
+def _write_member(zout, name, data, date_time, compress_type):
+    """写入一个新成员"""
+    info = zipfile.ZipInfo(name, date_time=date_time)
+    info.compress_type = compress_type
+    zout.writestr(info, data)
+
+
+def scan_media(zin, prefix=None):
+    """
+    列出媒体文件，查找重复图片并读取显示尺寸（prefix 为空时按文件类型选择媒体目录）
+    返回 (全部媒体, 需要处理的媒体, 重复部件 -> 首次出现的部件, 显示尺寸)；
+    重复图片的显示尺寸合并到首次出现的部件上
+    """
+    prefix = _media_prefix(zin, prefix)
+    media = list_media(zin, prefix)
+    duplicates = find_duplicates(zin, media)
+    unique = [info for info in media if info.filename not in duplicates]
+
+    display_sizes = media_display_sizes(zin, prefix)
+    for dup_name, canonical in duplicates.items():
+        if dup_name in display_sizes and canonical in display_sizes:
+            display_sizes[canonical] = _max_size(display_sizes[canonical], display_sizes[dup_name])
+        else:
+            display_sizes[canonical] = None
+    return media, unique, duplicates, display_sizes
+
+
+def image_progress(name, bytes_in, result, seconds, cached=False):
+    """一张图片的进度信息，传给 progress 回调"""
+    return {'name': name, 'bytes_in': bytes_in, 'bytes_out': len(result[0]) if result else bytes_in,
+            'seconds': seconds, 'cached': cached}
+
+
+def write_media(zin, dst_path, unique, duplicates, outcomes, stats, log=None, cancel=None):
+    """
+    按处理结果写出新压缩包
+    outcomes 为 部件名 -> (transform 的结果, 异常)，更新 stats 中的 processed/bytes_after/renamed；
+    cancel（threading.Event）被设置后在复制下一个成员前抛出 CompressionCancelled
+    """
+    taken = set(zin.namelist())
+    replacements = {}
+    renames = {}
+    # 按原顺序确定哪些需要改名
+    for i, info in enumerate(unique, 1):
+        result, error = outcomes[info.filename]
+        if error is not None and log:
+            log(f"处理第 {i} 张图片时出错，保留原图：{str(error)}")
+        if result is None:
+            stats['bytes_after'] += info.file_size
+            continue
+
+        new_data, new_ext = result
+        old_ext = info.filename.rsplit('.', 1)[-1]
+        new_name = info.filename
+        if new_ext and new_ext.lower() != old_ext.lower() and \
+                CONTENT_TYPES.get(new_ext.lower()) != CONTENT_TYPES.get(old_ext.lower()):
+            taken.discard(info.filename)
+            new_name = _unique_name(info.filename[:-len(old_ext)] + new_ext, taken)
+            taken.add(new_name)
+            renames[info.filename] = new_name
+            stats['renamed'] += 1
+        replacements[info.filename] = (new_name, new_data)
+        stats['processed'] += 1
+        stats['bytes_after'] += len(new_data)
+
+    for dup_name, canonical in duplicates.items():
+        renames[dup_name] = renames.get(canonical, canonical)
+        if canonical in replacements:
+            stats['processed'] += 1
+
+    with zipfile.ZipFile(dst_path, 'w', zipfile.ZIP_DEFLATED, allowZip64=True) as zout:
+        for info in zin.infolist():
+            check_cancel(cancel)
+            name = info.filename
+            if name in duplicates:
+                continue
+            if name in replacements:
+                new_name, new_data = replacements[name]
+                # 图片本身已压缩，存储时不再 deflate
+                _write_member(zout, new_name, new_data, info.date_time, zipfile.ZIP_STORED)
+            elif renames and name == CONTENT_TYPES_NAME:
+                xml = zin.read(info).decode('utf-8')
+                _write_member(zout, name, patch_content_types(xml, renames, duplicates).encode('utf-8'),
+                              info.date_time, zipfile.ZIP_DEFLATED)
+            elif renames and name.endswith('.rels'):
+                xml = zin.read(info).decode('utf-8')
+                _write_member(zout, name, patch_rels(xml, name, renames).encode('utf-8'),
+                              info.date_time, zipfile.ZIP_DEFLATED)
+            else:
+                _copy_member(zin, zout, info)
+    return stats
+
+
+def rewrite_media(src_path, dst_path, transform, prefix=None, log=None,
+                  max_workers=1, progress=None, cache=None, cancel=None):
+    """
+    重写压缩包中的媒体文件
+
+    transform(name, data, display_size) 返回 (新数据, 新扩展名)，返回 None 表示保留原图；
+    display_size 为图片在工作表、文档或幻灯片上的显示尺寸（像素），未知时为 None；
+    prefix 为媒体目录，为空时按文件类型选择（xl/media/、word/media/ 或 ppt/media/）。
+    max_workers > 1 时在进程池中并行执行 transform（此时 transform 必须可以 pickle），
+    progress(已完成数, 总数, 图片信息) 在每张图片完成后调用，图片信息见 image_progress。
+    cancel（threading.Event）被设置后尽快抛出 image_codec.CompressionCancelled，不写出文件。
+    cache 提供 key(data, display_size) / lookup(key, 原图大小) / store(key, result)，
+    命中缓存的图片不再执行 transform（见 image_cache.MediaCache）。
+    返回统计信息：total/processed/bytes_before/bytes_after/renamed/duplicates/cached
+    """
+    stats = {'total': 0, 'processed': 0, 'bytes_before': 0, 'bytes_after': 0, 'renamed': 0, 'duplicates': 0, 'cached': 0}
+
+    with zipfile.ZipFile(src_path) as zin:
+        # 内容相同的图片只压缩一次，重复的部件删除，引用指向同一个媒体文件
+        media, unique, duplicates, display_sizes = scan_media(zin, prefix)
+        stats['total'] = len(media)
+        stats['bytes_before'] = sum(info.file_size for info in media)
+        stats['duplicates'] = len(duplicates)
+
+        # 每张图片只读取一次：先查缓存，未命中的图片并行处理（run_ordered 按需读取，不会一次读入所有图片）
+        outcomes = {}
+        cache_keys = {}
+        misses = []
+
+        def jobs():
+            for info in unique:
+                data = zin.read(info)
+                display_size = display_sizes.get(info.filename)
+                if cache is not None:
+                    key = cache.key(data, display_size)
+                    hit, result = cache.lookup(key, info.file_size)
+                    if hit:
+                        outcomes[info.filename] = (result, None)
+                        stats['cached'] += 1
+                        if progress:
+                            progress(len(outcomes), len(unique),
+                                     image_progress(info.filename, info.file_size, result, 0, cached=True))
+                        continue
+                    cache_keys[info.filename] = key
+                misses.append(info)
+                yield info.filename, data, display_size
+
+        results = run_ordered(functools.partial(timed_call, transform), jobs(), min(max_workers, len(unique)),
+                              cancel=cancel)
+        # 第 i 个结果对应第 i 个未命中的图片（产出结果前对应的任务已经提交）
+        for index, (timed, error) in enumerate(results):
+            info = misses[index]
+            result, seconds = timed if error is None else (None, 0)
+            outcomes[info.filename] = (result, error)
+            if error is None and cache is not None:
+                cache.store(cache_keys[info.filename], result)
+            if progress:
+                progress(len(outcomes), len(unique), image_progress(info.filename, info.file_size, result, seconds))
+
+        write_media(zin, dst_path, unique, duplicates, outcomes, stats, log, cancel)
+
+    return stats
@@ -0,0 +1,166 @@
+"""
+快速预估压缩效果（不载入 openpyxl，不写文件）
+直接从 zip 读取媒体目录（xl/media、word/media、ppt/media）中图片的大小和尺寸，只在少量图片的缩略图上试编码，
+按各压缩模式预测输出大小和耗时；已经小于目标大小且不需要缩小的图片直接跳过
+"""
+import os
+import math
+import time
+import zipfile
+
+import image_codec
+import ooxml_media
+
+# 试编码的图片数
+SAMPLE_IMAGES = 8
+# 试编码的时间上限（秒），PNG 等格式需要完整解码，超过后其余图片按已取样的结果估算
+SAMPLE_SECONDS = 0.3
+# 查找到的质量对应的大小与上限之比的经验值
+SEARCH_FILL = 0.92
+# 复制其余部件的速度（字节/秒）
+COPY_RATE = 200 * 1024 * 1024
+
+
+def _draft_pixels(source_size, output_size):
+    """JPEG 按 1/2、1/4、1/8 缩小解码时实际解码的像素数"""
+    width, height = source_size
+    scale = 1
+    while scale < 8 and width // (scale * 2) >= output_size[0] and height // (scale * 2) >= output_size[1]:
+        scale *= 2
+    return (width // scale) * (height // scale)
+
+
+def _search_encodes(start_quality, min_quality):
+    """质量查找大约需要的原图编码次数（首次编码 + 二分，最后的渐进式编码按两次计）"""
+    return 1 + math.ceil(math.log2(max(2, start_quality - min_quality))) + 2
+
+
+def _sample(candidates, count):
+    """按文件大小从大到小均匀取样（一定包含最大的图片，count 为 0 时不取样）"""
+    ordered = sorted(candidates, key=lambda image: image['bytes'], reverse=True)
+    if len(ordered) <= count:
+        return ordered
+    if count <= 1:
+        return ordered[:max(0, count)]
+    step = (len(ordered) - 1) / (count - 1)
+    return [ordered[round(i * step)] for i in range(count)]
+
+
+def estimate_workbook(file_path, mode_settings, display_scale=None, max_workers=1,
+                      sample_images=SAMPLE_IMAGES, prefix=None):
+    """
+    预估按各压缩模式压缩后的大小和耗时
+    mode_settings 为 压缩模式 -> {"min_quality": ..., "max_size_kb": ...}
+    返回 {'file', 'bytes_before', 'images_total', 'duplicates', 'sampled', 'seconds',
+          'images': [{'name', 'format', 'width', 'height', 'bytes'}],
+          'modes': {压缩模式: {'bytes_after', 'images_processed', 'images_skipped', 'seconds'}}}
+    """
+    start = time.perf_counter()
+    with zipfile.ZipFile(file_path) as zin:
+        media, unique, duplicates, display_sizes = ooxml_media.scan_media(zin, prefix)
+
+        images = []
+        for info in unique:
+            fmt, size = ooxml_media.read_image_header(zin, info)
+            image = {'name': info.filename, 'format': fmt, 'width': size[0] if size else None,
+                     'height': size[1] if size else None, 'bytes': info.file_size,
+                     'stored_bytes': info.compress_size}
+            if size:
+                target_size = image_codec.display_target(display_sizes.get(info.filename), display_scale)
+                image['output_size'] = image_codec.fit_output_size(size, target_size)
+                image['target_size'] = target_size
+            images.append(image)
+
+        # 任一模式下需要压缩的图片：比目标大，或者需要缩小尺寸
+        def needs_work(image, settings):
+            return 'output_size' in image and (image['bytes'] > settings['max_size_kb'] * 1024 or
+                                               image['output_size'] != (image['width'], image['height']))
+
+        candidates = [image for image in images if any(needs_work(image, s) for s in mode_settings.values())]
+        qualities = set()
+        for mode, settings in mode_settings.items():
+            qualities.update((image_codec.START_QUALITY[mode], settings['min_quality']))
+
+        # 在缩略图上试编码，同时测量本机的解码和编码速度
+        trials = {}
+        sample_start = time.perf_counter()
+        for image in _sample(candidates, sample_images):
+            if trials and time.perf_counter() - sample_start > SAMPLE_SECONDS:
+                break
+            try:
+                trials[image['name']] = image_codec.trial_encode(zin.read(image['name']), image['target_size'],
+                                                                 qualities)
+            except Exception:
+                continue
+
+    trial_list = list(trials.values())
+    decode_rate = (sum(t['decode_seconds'] for t in trial_list) /
+                   max(1, sum(t['decoded_pixels'] for t in trial_list)))
+    encode_rate = (sum(t['encode_seconds'] for t in trial_list) /
+                   max(1, sum(t['encoded_pixels'] for t in trial_list)))
+    # 未取样的图片按取样图片的平均每像素字节数估算
+    sampled_pixels = sum(t['size'][0] * t['size'][1] for t in trial_list)
+    bytes_per_pixel = {quality: sum(t['bytes'][quality] for t in trial_list) / max(1, sampled_pixels)
+                       for quality in qualities}
+
+    file_size = os.path.getsize(file_path)
+    removed = sum(info.compress_size for info in media if info.filename in duplicates)
+
+    modes = {}
+    for mode, settings in mode_settings.items():
+        max_bytes = settings['max_size_kb'] * 1024
+        start_quality = image_codec.START_QUALITY[mode]
+        min_quality = settings['min_quality']
+        bytes_after = file_size - removed
+        processed = 0
+        work_seconds = 0.0
+        work_images = 0
+        for image in images:
+            if not needs_work(image, settings):
+                continue
+            pixels = image['output_size'][0] * image['output_size'][1]
+            trial = trials.get(image['name'])
+            if trial is not None:
+                at_start, at_min, graphic = trial['bytes'][start_quality], trial['bytes'][min_quality], trial['graphic']
+            else:
+                at_start = bytes_per_pixel.get(start_quality, 0) * pixels
+                at_min = bytes_per_pixel.get(min_quality, 0) * pixels
+                graphic = False
+
+            if graphic:
+                predicted, encodes = at_start, 2
+            elif at_start <= max_bytes:
+                predicted, encodes = at_start, 3
+            elif at_min > max_bytes:
+                predicted, encodes = at_min, _search_encodes(start_quality, min_quality)
+            else:
+                predicted, encodes = max_bytes * SEARCH_FILL, _search_encodes(start_quality, min_quality)
+
+            source_pixels = image['width'] * image['height']
+            decoded = _draft_pixels((image['width'], image['height']), image['output_size']) \
+                if image['format'] == 'JPEG' else source_pixels
+            work_seconds += decode_rate * decoded + encode_rate * pixels * encodes
+            work_images += 1
+            # 压缩后不比原图小时保留原图
+            if predicted < image['bytes']:
+                bytes_after += predicted - image['stored_bytes']
+                processed += 1
+
+        workers = max(1, min(max_workers, work_images))
+        modes[mode] = {
+            'bytes_after': int(bytes_after),
+            'images_processed': processed,
+            'images_skipped': len(images) - work_images,
+            'seconds': round(work_seconds / workers + file_size / COPY_RATE, 2),
+        }
+
+    return {
+        'file': file_path,
+        'bytes_before': file_size,
+        'images_total': len(media),
+        'duplicates': len(duplicates),
+        'sampled': len(trials),
+        'images': [{key: image[key] for key in ('name', 'format', 'width', 'height', 'bytes')} for image in images],
+        'modes': modes,
+        'seconds': round(time.perf_counter() - start, 3),
+    }
@@ -0,0 +1,191 @@
+"""
+按整个工作簿的目标大小分配图片字节数
+先测量每张图片（缩略图试编码），按 显示面积 x 复杂度 把图片可用的字节数分给各图片，
+每张图片只朝自己的分配额压缩一次；总大小仍超出目标时只做一次修正
+"""
+import io
+import zipfile
+import functools
+
+from PIL import Image as PILImage
+
+import image_codec
+import ooxml_media
+from image_codec import run_ordered, timed_call
+
+# 测量复杂度时使用的参考质量
+REFERENCE_QUALITY = 75
+# 每个 zip 成员的本地文件头和中央目录开销（不含文件名）
+ZIP_ENTRY_OVERHEAD = 76
+# 修正时再多留出的余量
+CORRECTION_MARGIN = 0.97
+
+
+def measure_media(name, data, target_size, max_quality):
+    """
+    在缩略图上试编码，估算图片输出后的编码大小
+    返回 {'size': 输出尺寸, 'weight': 参考质量下的估算大小, 'cap': 最高质量下的估算大小}
+    """
+    trial = image_codec.trial_encode(data, target_size, {REFERENCE_QUALITY, max_quality})
+    return {'size': trial['size'], 'weight': trial['bytes'][REFERENCE_QUALITY], 'cap': trial['bytes'][max_quality]}
+
+
+def allocate(weights, caps, budget):
+    """
+    按权重比例分配 budget，单项不超过 cap；超过 cap 的部分再按比例分给其余各项
+    weights、caps 为 名称 -> 数值，返回 名称 -> 分配额
+    """
+    allocations = {}
+    remaining = {name: weight for name, weight in weights.items() if weight > 0}
+    left = budget
+    while remaining:
+        total = sum(remaining.values())
+        capped = [name for name, weight in remaining.items() if left * weight / total >= caps[name]]
+        if not capped:
+            break
+        for name in capped:
+            allocations[name] = caps[name]
+            left -= caps[name]
+            del remaining[name]
+    total = sum(remaining.values())
+    for name, weight in remaining.items():
+        allocations[name] = left * weight / total
+    for name in weights:
+        allocations.setdefault(name, 0)
+    return allocations
+
+
+def compress_to(name, data, target_size, max_bytes, compression_mode=None, min_quality=None):
+    """
+    把一张图片压缩到不超过 max_bytes（最低质量下仍超出时返回最低质量的结果）
+    返回值与 image_codec.compress_media 相同
+    """
+    settings = {"min_quality": min_quality, "max_size_kb": max_bytes / 1024}
+    compressed_data, ext = image_codec.compress_image(data, compression_mode, settings, target_size)
+    if len(compressed_data) >= len(data):
+        return None
+    return compressed_data, ext
+
+
+def fixed_bytes(zin, media, duplicates):
+    """不参与压缩的部分（其他部件、矢量图、zip 开销）写出后的大致大小"""
+    compressible = {info.filename for info in media}
+    total = 22  # 中央目录结束记录
+    for info in zin.infolist():
+        if info.filename in duplicates:
+            continue
+        total += ZIP_ENTRY_OVERHEAD + 2 * len(info.filename.encode('utf-8'))
+        if info.filename not in compressible:
+            total += info.compress_size
+    return total
+
+
+def _output_size(result, fallback):
+    """读取压缩结果的像素尺寸（只解析文件头）"""
+    if result is None:
+        return fallback
+    with PILImage.open(io.BytesIO(result[0])) as img:
+        return img.size
+
+
+def rewrite_media_to_budget(src_path, dst_path, budget_bytes, compression_mode, settings, display_scale=None,
+                            prefix=None, log=None, max_workers=1, progress=None, cancel=None):
+    """
+    把工作簿压缩到 budget_bytes 以内
+    1. 测量所有图片，按 显示面积 x 复杂度 分配图片可用的字节数（最高质量够用的图片不多分）
+    2. 每张图片朝分配额压缩一次
+    3. 总大小超出目标时按比例收紧分配额，只重新压缩一次；最低质量仍不够的图片同时缩小尺寸
+    progress、cancel 与 ooxml_media.rewrite_media 相同，修正时进度从头计算
+    返回与 ooxml_media.rewrite_media 相同的统计信息，另加 budget_bytes/estimated_bytes
+    """
+    log = log or (lambda message: None)
+    max_quality = image_codec.START_QUALITY[compression_mode]
+    stats = {'total': 0, 'processed': 0, 'bytes_before': 0, 'bytes_after': 0, 'renamed': 0, 'duplicates': 0,
+             'cached': 0, 'budget_bytes': budget_bytes}
+
+    with zipfile.ZipFile(src_path) as zin:
+        media, unique, duplicates, display_sizes = ooxml_media.scan_media(zin, prefix)
+        stats['total'] = len(media)
+        stats['bytes_before'] = sum(info.file_size for info in media)
+        stats['duplicates'] = len(duplicates)
+
+        fixed = fixed_bytes(zin, media, duplicates)
+        image_budget = budget_bytes - fixed
+        if image_budget <= 0:
+            raise Exception(f"目标大小 {budget_bytes/1024/1024:.2f}MB 小于工作簿中图片以外内容的大小 "
+                            f"{fixed/1024/1024:.2f}MB")
+
+        targets = {info.filename: image_codec.display_target(display_sizes.get(info.filename), display_scale)
+                   for info in unique}
+        workers = min(max_workers, len(unique))
+
+        # 1. 测量
+        jobs = ((info.filename, zin.read(info), targets[info.filename], max_quality) for info in unique)
+        measures = {}
+        for info, (measure, error) in zip(unique, run_ordered(measure_media, jobs, workers, cancel=cancel)):
+            if error is not None:
+                # 无法解码的图片保留原图，占用原大小
+                log(f"测量图片 {info.filename} 时出错，保留原图：{str(error)}")
+                image_budget -= info.file_size
+                continue
+            measures[info.filename] = measure
+        if image_budget <= 0:
+            raise Exception(f"目标大小 {budget_bytes/1024/1024:.2f}MB 小于无法压缩的内容的大小")
+
+        # 原图比最高质量的估算值还小时不必多分
+        sources = {info.filename: info.file_size for info in unique}
+        caps = {name: min(m['cap'], sources[name]) for name, m in measures.items()}
+        allocations = allocate({name: m['weight'] for name, m in measures.items()}, caps, image_budget)
+        log(f"图片可用 {image_budget/1024/1024:.2f}MB，按显示面积和复杂度分配给 {len(measures)} 张图片")
+
+        # 2. 朝分配额压缩一次
+        compress = functools.partial(timed_call, functools.partial(compress_to, compression_mode=compression_mode,
+                                                                   min_quality=settings['min_quality']))
+        outcomes = {info.filename: (None, None) for info in unique}
+        names = list(measures)
+        jobs = ((name, zin.read(name), targets[name], allocations[name]) for name in names)
+        for i, (name, (timed, error)) in enumerate(zip(names, run_ordered(compress, jobs, workers, cancel=cancel)), 1):
+            result, seconds = timed if error is None else (None, 0)
+            outcomes[name] = (result, error)
+            if progress:
+                progress(i, len(names), ooxml_media.image_progress(name, sources[name], result, seconds))
+
+        def output_bytes(name):
+            result, _ = outcomes[name]
+            return len(result[0]) if result is not None else sources[name]
+
+        total_images = sum(output_bytes(info.filename) for info in unique)
+        # 3. 超出目标时收紧分配额，只修正一次
+        if fixed + total_images > budget_bytes:
+            reducible = sum(output_bytes(name) for name in names)
+            factor = max(0.0, 1 - (fixed + total_images - budget_bytes) / reducible) * CORRECTION_MARGIN
+            log(f"估算总大小 {(fixed + total_images)/1024/1024:.2f}MB 超出目标，"
+                f"按 {factor:.0%} 收紧分配额重新压缩")
+            corrections = []
+            for name in names:
+                current = output_bytes(name)
+                target_size = targets[name]
+                if current > allocations[name]:
+                    # 最低质量也没能达到分配额，按面积比例缩小尺寸
+                    width, height = _output_size(outcomes[name][0], measures[name]['size'])
+                    ratio = factor ** 0.5
+                    target_size = (max(1, int(width * ratio)), max(1, int(height * ratio)))
+                corrections.append((name, target_size, current * factor))
+            jobs = ((name, zin.read(name), target_size, limit) for name, target_size, limit in corrections)
+            results = run_ordered(compress, jobs, workers, cancel=cancel)
+            for i, ((name, _, _), (timed, error)) in enumerate(zip(corrections, results), 1):
+                result, seconds = timed if error is None else (None, 0)
+                if error is None and result is not None and len(result[0]) < output_bytes(name):
+                    outcomes[name] = (result, None)
+                if progress:
+                    result = outcomes[name][0]
+                    progress(i, len(corrections), ooxml_media.image_progress(name, sources[name], result, seconds))
+            total_images = sum(output_bytes(info.filename) for info in unique)
+
+        stats['estimated_bytes'] = fixed + total_images
+        if stats['estimated_bytes'] > budget_bytes:
+            log(f"最低质量下仍无法达到目标大小，预计 {stats['estimated_bytes']/1024/1024:.2f}MB")
+
+        ooxml_media.write_media(zin, dst_path, unique, duplicates, outcomes, stats, log, cancel)
+
+    return stats
@@ -0,0 +1,124 @@
+"""
+测量图形界面的启动时间：从启动进程到窗口第一次绘制（first_paint）、到压缩核心载入完成（ready）
+在外部计时，打包后的单文件程序解压到临时目录的时间也计算在内；超过上限时返回非 0，用于发现启动变慢
+
+用法：
+    python3 startup_benchmark.py                                  # 测量 python3 zip-img.py
+    python3 startup_benchmark.py --exe dist/ExcelImageCompressor.exe --runs 5
+    python3 startup_benchmark.py --max-first-paint 1.0 --max-ready 3.0
+    python3 startup_benchmark.py --imports                       # 没有显示器时只测量模块导入
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# 窗口显示前不应导入的模块（由后台线程载入）
+HEAVY_MODULES = ('openpyxl', 'PIL', 'excel_compressor')
+
+
+def run_once(command, timeout):
+    """启动一次程序，返回 {'first_paint_seconds', 'ready_seconds', 'core_import_seconds', 'ok'}"""
+    fd, result_path = tempfile.mkstemp(suffix='.json')
+    os.close(fd)
+    try:
+        launched = time.time()
+        subprocess.run(command + ['--startup-benchmark', result_path], cwd=HERE, timeout=timeout, check=False)
+        with open(result_path, encoding='utf-8') as f:
+            text = f.read()
+        if not text:
+            raise Exception("程序没有写出启动计时")
+        result = json.loads(text)
+    finally:
+        os.remove(result_path)
+    # 用启动进程的时间作为起点，包含解释器启动和打包程序解压的时间
+    return {
+        'first_paint_seconds': round(result['first_paint'] - launched, 3),
+        'ready_seconds': round(result['ready'] - launched, 3),
+        'core_import_seconds': result['core_import_seconds'],
+        'ok': result['ok'],
+    }
+
+
+def measure_imports(runs):
+    """
+    在新的解释器中分别测量界面启动时导入的选项模块和后台载入的压缩核心的导入时间，
+    并检查选项模块没有带入 openpyxl/PIL
+    """
+    code = ("import sys, time; start = time.perf_counter(); import {module}; "
+            "print(time.perf_counter() - start); print(','.join(m for m in {heavy!r} if m in sys.modules))")
+    result = {}
+    for module in ('compress_options', 'excel_compressor'):
+        seconds = []
+        for _ in range(runs):
+            output = subprocess.run([sys.executable, '-c', code.format(module=module, heavy=HEAVY_MODULES)],
+                                    cwd=HERE, capture_output=True, text=True, check=True).stdout.split('\n')
+            seconds.append(float(output[0]))
+        loaded = [m for m in output[1].split(',') if m]
+        result[module] = {'median_seconds': round(statistics.median(seconds), 3), 'heavy_modules': loaded}
+    return result
+
+
+def summarize(values):
+    return {'median': round(statistics.median(values), 3), 'max': round(max(values), 3)}
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description='测量图形界面的启动时间')
+    parser.add_argument('--exe', help='打包后的程序（默认用当前解释器运行 zip-img.py）')
+    parser.add_argument('--runs', type=int, default=5, help='启动次数，取中位数')
+    parser.add_argument('--timeout', type=float, default=60, help='单次启动的超时时间（秒）')
+    parser.add_argument('--max-first-paint', type=float, default=None, help='首次绘制时间上限（秒，中位数）')
+    parser.add_argument('--max-ready', type=float, default=None, help='载入完成时间上限（秒，中位数）')
+    parser.add_argument('--imports', action='store_true', help='只测量模块导入时间（不需要显示器）')
+    parser.add_argument('--output', help='JSON 结果输出文件（默认输出到标准输出）')
+    args = parser.parse_args()
+
+    failures = []
+    if args.imports:
+        report = {'imports': measure_imports(args.runs)}
+        heavy = report['imports']['compress_options']['heavy_modules']
+        if heavy:
+            failures.append(f"界面启动时导入的 compress_options 带入了 {', '.join(heavy)}")
+    else:
+        command = [args.exe] if args.exe else [sys.executable, os.path.join(HERE, 'zip-img.py')]
+        runs = []
+        for i in range(args.runs):
+            run = run_once(command, args.timeout)
+            runs.append(run)
+            print(f"[{i + 1}/{args.runs}] 首次绘制 {run['first_paint_seconds']:.3f}s，"
+                  f"载入完成 {run['ready_seconds']:.3f}s", file=sys.stderr)
+            if not run['ok']:
+                failures.append("载入压缩模块失败")
+        report = {
+            'command': command,
+            'runs': runs,
+            'first_paint_seconds': summarize([run['first_paint_seconds'] for run in runs]),
+            'ready_seconds': summarize([run['ready_seconds'] for run in runs]),
+        }
+        if args.max_first_paint is not None and report['first_paint_seconds']['median'] > args.max_first_paint:
+            failures.append(f"首次绘制 {report['first_paint_seconds']['median']:.3f}s 超过上限 {args.max_first_paint}s")
+        if args.max_ready is not None and report['ready_seconds']['median'] > args.max_ready:
+            failures.append(f"载入完成 {report['ready_seconds']['median']:.3f}s 超过上限 {args.max_ready}s")
+
+    report['ok'] = not failures
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        print(text)
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    return 0 if not failures else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+batch_compress 的单元测试：不同目录中的同名工作簿并行处理时输出文件不能互相覆盖，
+处理失败时只删除本次创建的输出文件
+"""
+
+import os
+
+from openpyxl import Workbook
+from openpyxl.drawing.image import Image as SheetImage
+from PIL import Image
+
+from batch_compress import compress_files
+from excel_compressor import ExcelImageCompressor
+
+
+def make_workbook(path, seed):
+    """生成一个只有一张噪点图片的工作簿（seed 让两个文件内容不同）"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    image_path = path + '.png'
+    Image.effect_noise((400, 300), 40 + seed).convert('RGB').save(image_path)
+    wb = Workbook()
+    wb.active.add_image(SheetImage(image_path), 'A1')
+    wb.save(path)
+    os.remove(image_path)
+    return path
+
+
+def test_build_output_path_claims_unique_names(tmp_path):
+    compressor = ExcelImageCompressor(use_cache=False, verbose=False)
+    paths = [compressor.build_output_path(str(tmp_path / 'report.xlsx'), str(tmp_path / 'out')) for _ in range(5)]
+    assert len(set(paths)) == 5
+    assert all(os.path.exists(path) for path in paths)
+
+
+def test_same_named_workbooks_in_parallel(tmp_path):
+    paths = [make_workbook(str(tmp_path / d / 'report.xlsx'), i) for i, d in enumerate('ab')]
+    out = str(tmp_path / 'out')
+    summaries = compress_files(paths, output_dir=out, jobs=2, use_cache=False)
+    assert all(summary['ok'] for summary in summaries)
+    outputs = [summary['output'] for summary in summaries]
+    assert len(set(outputs)) == 2
+    assert sorted(os.listdir(out)) == sorted(os.path.basename(path) for path in outputs)
+    assert [os.path.getsize(path) for path in outputs] == [summary['bytes_after'] for summary in summaries]
+
+
+def test_existing_output_path_is_kept_on_failure(tmp_path):
+    existing = tmp_path / 'keep.xlsx'
+    existing.write_bytes(b'user data')
+    compressor = ExcelImageCompressor(use_cache=False, verbose=False)
+    summary = compressor.process_excel(str(tmp_path / 'missing.xlsx'), output_path=str(existing))
+    assert not summary['ok']
+    assert existing.read_bytes() == b'user data'
+
+
+def test_claimed_output_is_removed_on_failure(tmp_path):
+    out = tmp_path / 'out'
+    compressor = ExcelImageCompressor(use_cache=False, verbose=False)
+    summary = compressor.process_excel(str(tmp_path / 'missing.xlsx'), output_dir=str(out))
+    assert not summary['ok']
+    assert os.listdir(out) == []
+    summary = compressor.process_excel(str(tmp_path / 'missing.xlsx'), output_path=str(tmp_path / 'new.xlsx'))
+    assert not summary['ok']
+    assert not (tmp_path / 'new.xlsx').exists()
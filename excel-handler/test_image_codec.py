@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+image_codec 的单元测试：灰度照片不能因为颜色少于 256 种被当成图形编码为 PNG
+"""
+
+import io
+
+from PIL import Image, ImageChops, ImageDraw, ImageFilter
+
+import image_codec
+from compress_options import CompressionMode
+
+SETTINGS = {'min_quality': 30, 'max_size_kb': 300}
+
+
+def png_bytes(img):
+    output = io.BytesIO()
+    img.save(output, format='PNG')
+    return output.getvalue()
+
+
+def gray_photo():
+    """模拟灰度照片：平滑的明暗变化加上轻微噪点"""
+    size = (1200, 900)
+    base = Image.effect_noise(size, 80).filter(ImageFilter.GaussianBlur(6))
+    shade = Image.radial_gradient('L').resize(size)
+    return ImageChops.add(ImageChops.multiply(base, shade), Image.effect_noise(size, 8), scale=1.3)
+
+
+def test_gray_photo_is_jpeg():
+    img = gray_photo()
+    assert img.getcolors(256) is not None
+    assert not image_codec.is_graphic(img.convert('RGB'))
+    data, ext = image_codec.compress_image(png_bytes(img), CompressionMode.BALANCED, SETTINGS)
+    assert ext == 'jpeg'
+    assert len(data) < len(image_codec.encode_png(img.convert('RGB')))
+
+
+def test_chart_stays_png():
+    chart = Image.new('RGB', (1000, 700), 'white')
+    draw = ImageDraw.Draw(chart)
+    for i in range(10):
+        draw.rectangle((60 + i * 90, 650 - i * 50, 120 + i * 90, 650), fill=(30, 90 + i * 15, 200))
+    assert image_codec.is_graphic(chart)
+    assert image_codec.compress_image(png_bytes(chart), CompressionMode.BALANCED, SETTINGS)[1] == 'png'
+
+
+def test_gradient_keeps_smaller_png():
+    gradient = Image.linear_gradient('L').rotate(90).resize((1200, 300)).convert('RGB')
+    data, ext = image_codec.compress_image(png_bytes(gradient), CompressionMode.BALANCED, SETTINGS)
+    assert ext == 'png'
+    assert len(data) < len(image_codec.encode_jpeg(gradient, 85))
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+savings_estimate 的单元测试：取样数为 0 或 1 时也能预估
+"""
+
+from openpyxl import Workbook
+from openpyxl.drawing.image import Image as SheetImage
+from PIL import Image
+
+import savings_estimate
+from compress_options import CompressionMode
+from savings_estimate import _sample
+
+SETTINGS = {CompressionMode.BALANCED: {'min_quality': 30, 'max_size_kb': 10}}
+
+
+def make_workbook(path, count):
+    wb = Workbook()
+    for i in range(count):
+        image_path = f"{path}.{i}.png"
+        Image.effect_noise((300 + i * 50, 200), 40).convert('RGB').save(image_path)
+        wb.active.add_image(SheetImage(image_path), f'A{i * 20 + 1}')
+    wb.save(path)
+    return path
+
+
+def test_sample_counts():
+    images = [{'name': str(i), 'bytes': i} for i in range(5)]
+    assert _sample(images, 0) == []
+    assert _sample(images, 1) == [images[4]]
+    assert [image['bytes'] for image in _sample(images, 3)] == [4, 2, 0]
+    assert len(_sample(images, 10)) == 5
+
+
+def test_estimate_with_small_sample(tmp_path):
+    path = make_workbook(str(tmp_path / 'book.xlsx'), 3)
+    for count, sampled in ((0, 0), (1, 1), (2, 2)):
+        result = savings_estimate.estimate_workbook(path, SETTINGS, sample_images=count)
+        assert result['sampled'] == sampled
+        assert result['modes'][CompressionMode.BALANCED]['images_processed'] == 3
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+watch_folder 的单元测试：监视的不同子目录中同时出现同名文件时，两个压缩结果都要保留
+"""
+
+import os
+import json
+import threading
+
+from test_batch_compress import make_workbook
+from watch_folder import FolderWatcher
+
+
+def test_same_named_files_in_parallel(tmp_path):
+    watched = tmp_path / 'in'
+    out = str(tmp_path / 'out')
+    for i, d in enumerate('ab'):
+        make_workbook(str(watched / d / 'report.xlsx'), i)
+
+    results = []
+
+    def on_result(summary):
+        results.append(summary)
+        if len(results) == 2:
+            watcher.stop()
+
+    watcher = FolderWatcher([str(watched)], {'output_dir': out, 'use_cache': False}, str(tmp_path / 'watch.jsonl'),
+                            jobs=2, recursive=True, use_polling=True, include_existing=True,
+                            settle_seconds=0, poll_seconds=0.1, on_result=on_result)
+    # 超时后也停止，避免测试挂住
+    timer = threading.Timer(60, watcher.stop)
+    timer.start()
+    try:
+        assert watcher.run() == 2
+    finally:
+        timer.cancel()
+
+    assert len(results) == 2 and all(summary['ok'] for summary in results)
+    outputs = [summary['output'] for summary in results]
+    assert len(set(outputs)) == 2
+    assert sorted(name for name in os.listdir(out) if name.endswith('.xlsx')) == \
+        sorted(os.path.basename(path) for path in outputs)
+    assert sorted(os.path.getsize(path) for path in outputs) == sorted(summary['bytes_after'] for summary in results)
+    with open(tmp_path / 'watch.jsonl', encoding='utf-8') as f:
+        events = [json.loads(line)['event'] for line in f]
+    assert events == ['started', 'compressed', 'compressed', 'stopped']
@@ -0,0 +1,398 @@
+"""
+监视目录，自动压缩新放入的 Excel/Word/PowerPoint 文件（无界面，常驻运行）
+Linux 上使用 inotify（通过 ctypes 调用 libc，不需要额外依赖），其他系统或 inotify 不可用时定时扫描目录；
+文件大小和修改时间稳定一段时间、没有 Office 锁文件且 zip 结构完整后才处理，避免处理还在复制或保存中的文件。
+压缩结果写入输出目录（原文件保持不变），每个文件处理完后在 JSON Lines 日志中追加一行
+
+用法：
+    python3 watch_folder.py 共享目录/ --output-dir 压缩后/
+    python3 watch_folder.py 收件/ 报表/ -o 压缩后/ --recursive --jobs 2 --mode size --log watch.jsonl
+    python3 watch_folder.py 共享目录/ -o 压缩后/ --existing --poll   # 先处理已有文件；网络共享目录使用定时扫描
+"""
+import os
+import sys
+import json
+import time
+import errno
+import signal
+import select
+import struct
+import zipfile
+import argparse
+import threading
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+from batch_compress import MODES, ENGINES, is_candidate, expand_paths, compress_one
+
+# 主循环的间隔（秒）
+TICK_SECONDS = 0.5
+# 文件大小和修改时间保持不变多久后认为已写完（秒）
+SETTLE_SECONDS = 2.0
+# 定时扫描的间隔（秒）；使用 inotify 时也按 RESCAN_SECONDS 扫描一次，补上遗漏的事件
+POLL_SECONDS = 2.0
+RESCAN_SECONDS = 60.0
+# 稳定后仍不是完整 zip 的文件，等待这么久后照常处理（处理失败会记入日志）
+INCOMPLETE_SECONDS = 60.0
+# 默认同时处理的文件数
+DEFAULT_JOBS = 2
+
+# inotify 常量（见 <sys/inotify.h>）
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+EVENT_HEADER = struct.Struct('iIII')
+
+
+class InotifyWatcher:
+    """
+    用 inotify 监视目录（只支持 Linux）
+    wait(timeout) 返回 (有变化的文件路径列表, 是否丢失了事件)；无法初始化时构造函数抛出 OSError
+    注意：网络共享目录上其他机器写入的文件不会产生事件，需要依靠定时扫描
+    """
+    def __init__(self, directories, recursive=False):
+        import ctypes
+        import ctypes.util
+
+        self.recursive = recursive
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        if not hasattr(self.libc, 'inotify_init1'):
+            raise OSError(errno.ENOSYS, "系统不支持 inotify")
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 失败")
+        self.ctypes = ctypes
+        self.watches = {}
+        try:
+            for directory in directories:
+                self._add_tree(directory)
+        except OSError:
+            self.close()
+            raise
+
+    def _add(self, directory):
+        """监视一个目录，返回 watch descriptor"""
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            code = self.ctypes.get_errno()
+            raise OSError(code, f"无法监视目录 {directory}：{os.strerror(code)}")
+        self.watches[wd] = directory
+        return wd
+
+    def _add_tree(self, directory):
+        """监视目录（递归时包括子目录）"""
+        self._add(directory)
+        if self.recursive:
+            for root, dirs, _ in os.walk(directory):
+                for name in dirs:
+                    self._add(os.path.join(root, name))
+
+    def wait(self, timeout):
+        """等待事件，最多 timeout 秒"""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return [], False
+        try:
+            buffer = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return [], False
+
+        paths = []
+        overflow = False
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(buffer):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(buffer, offset)
+            name = buffer[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b'\0')
+            offset += EVENT_HEADER.size + length
+            if mask & IN_Q_OVERFLOW:
+                overflow = True
+                continue
+            if mask & IN_IGNORED:
+                self.watches.pop(wd, None)
+                continue
+            directory = self.watches.get(wd)
+            if directory is None or not name:
+                continue
+            path = os.path.join(directory, os.fsdecode(name))
+            if mask & IN_ISDIR:
+                # 新建或移入的子目录：开始监视，并处理其中已有的文件
+                if self.recursive and mask & (IN_CREATE | IN_MOVED_TO):
+                    try:
+                        self._add_tree(path)
+                    except OSError:
+                        overflow = True
+                    paths.extend(expand_paths([path], recursive=True))
+                continue
+            paths.append(path)
+        return paths, overflow
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+def make_watcher(directories, recursive=False, log=None):
+    """尽量使用 inotify，不可用时返回 None（改为定时扫描）"""
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        return InotifyWatcher(directories, recursive)
+    except (OSError, AttributeError) as e:
+        if log:
+            log(f"无法使用 inotify，改为定时扫描：{str(e)}")
+        return None
+
+
+def file_signature(path):
+    """文件的 (大小, 修改时间)，文件不存在时返回 None"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+def is_locked(path):
+    """文件是否正在 Office 中打开（同目录下有 ~$ 锁文件；文件名较长时 Word 会去掉前两个字符）"""
+    directory, name = os.path.split(path)
+    return any(os.path.exists(os.path.join(directory, '~$' + lock)) for lock in (name, name[2:]) if lock)
+
+
+def is_complete_zip(path):
+    """zip 结构完整（中央目录结束记录已写入），复制到一半的文件通常不满足"""
+    try:
+        return zipfile.is_zipfile(path)
+    except OSError:
+        return False
+
+
+class FolderWatcher:
+    """
+    监视目录并把稳定下来的新文件交给进程池压缩
+    options 与 batch_compress.compress_one 相同，output_dir 必须指定；
+    log_path 为 JSON Lines 日志，每个文件处理完后追加一行
+    """
+    def __init__(self, directories, options, log_path, jobs=DEFAULT_JOBS, recursive=False, use_polling=False,
+                 include_existing=False, settle_seconds=SETTLE_SECONDS, poll_seconds=POLL_SECONDS,
+                 on_result=None, log=None):
+        self.directories = [os.path.abspath(directory) for directory in directories]
+        self.options = options
+        self.log_path = log_path
+        self.jobs = max(1, jobs)
+        self.recursive = recursive
+        self.use_polling = use_polling
+        self.include_existing = include_existing
+        self.settle_seconds = settle_seconds
+        self.poll_seconds = poll_seconds
+        self.on_result = on_result
+        self.log = log or (lambda message: None)
+        self.stop_event = threading.Event()
+
+        # 上次扫描时各文件的 (大小, 修改时间)
+        self.seen = {}
+        # 等待写完的文件：路径 -> [签名, 签名开始保持不变的时间]
+        self.pending = {}
+        # 已提交处理的文件版本：路径 -> 签名
+        self.submitted = {}
+        # 正在处理：future -> (路径, 签名)
+        self.running = {}
+
+    def stop(self):
+        """请求停止（可在信号处理函数或其他线程中调用），正在处理的文件会处理完"""
+        self.stop_event.set()
+
+    def write_log(self, record):
+        """在 JSON Lines 日志中追加一行"""
+        record = dict(record, time=datetime.now().isoformat(timespec='seconds'))
+        with open(self.log_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def scan(self):
+        """扫描目录，把新增或有变化的文件加入等待列表"""
+        current = {}
+        for path in expand_paths(self.directories, self.recursive):
+            signature = file_signature(path)
+            if signature is not None:
+                current[os.path.abspath(path)] = signature
+        for path, signature in current.items():
+            if self.seen.get(path) != signature:
+                self.notice(path)
+        self.seen = current
+
+    def notice(self, path):
+        """文件有变化：重新开始计算稳定时间"""
+        path = os.path.abspath(path)
+        if is_candidate(path):
+            self.pending[path] = [None, None]
+
+    def check_pending(self, now):
+        """返回已经写完、可以处理的文件列表（按发现顺序），不再存在或已处理过的文件移出等待列表"""
+        ready = []
+        for path, state in list(self.pending.items()):
+            signature = file_signature(path)
+            if signature is None:
+                del self.pending[path]
+                continue
+            if signature != state[0]:
+                state[0], state[1] = signature, now
+                continue
+            if self.submitted.get(path) == signature:
+                # 与已处理的版本相同（扫描和 inotify 重复发现）
+                del self.pending[path]
+                continue
+            stable = now - state[1]
+            if stable < self.settle_seconds or is_locked(path):
+                continue
+            if not is_complete_zip(path) and stable < INCOMPLETE_SECONDS:
+                continue
+            ready.append((path, signature))
+        return ready
+
+    def collect(self):
+        """收集已完成的任务，写日志；处理期间文件又有变化时重新排队"""
+        for future in [future for future in self.running if future.done()]:
+            path, signature = self.running.pop(future)
+            try:
+                summary = future.result()
+            except Exception as e:
+                # 工作进程异常退出等情况
+                summary = {'file': path, 'output': None, 'ok': False, 'error': str(e)}
+            self.write_log(dict(summary, event='compressed' if summary.get('ok') else 'failed'))
+            if self.on_result:
+                self.on_result(summary)
+            if file_signature(path) != signature:
+                self.notice(path)
+
+    def run(self):
+        """运行到 stop() 被调用为止，返回处理过的文件数"""
+        os.makedirs(self.options['output_dir'], exist_ok=True)
+        watcher = None if self.use_polling else make_watcher(self.directories, self.recursive, self.log)
+        rescan_seconds = RESCAN_SECONDS if watcher else self.poll_seconds
+        self.write_log({'event': 'started', 'directories': self.directories,
+                        'watcher': 'inotify' if watcher else 'polling', 'jobs': self.jobs,
+                        'output_dir': self.options['output_dir']})
+        self.log(f"开始监视 {', '.join(self.directories)}（{'inotify' if watcher else '定时扫描'}，"
+                 f"同时处理 {self.jobs} 个文件）")
+
+        if self.include_existing:
+            self.scan()
+        else:
+            # 已有的文件不处理，只记录当前状态
+            self.seen = {os.path.abspath(path): file_signature(path)
+                         for path in expand_paths(self.directories, self.recursive)}
+        processed = 0
+        last_scan = time.monotonic()
+        executor = ProcessPoolExecutor(max_workers=self.jobs)
+        try:
+            while not self.stop_event.is_set():
+                if watcher:
+                    paths, overflow = watcher.wait(TICK_SECONDS)
+                    for path in paths:
+                        self.notice(path)
+                    if overflow:
+                        last_scan = 0
+                else:
+                    self.stop_event.wait(TICK_SECONDS)
+
+                now = time.monotonic()
+                if now - last_scan >= rescan_seconds:
+                    self.scan()
+                    last_scan = now
+
+                self.collect()
+                # 进程池之外只排队不提交，同时处理的文件数不超过 jobs；
+                # 不同目录中的同名文件可能同时处理，输出文件名由 build_output_path 独占创建，不会互相覆盖
+                for path, signature in self.check_pending(now):
+                    if len(self.running) >= self.jobs:
+                        break
+                    del self.pending[path]
+                    self.submitted[path] = signature
+                    self.running[executor.submit(compress_one, path, self.options)] = (path, signature)
+                    processed += 1
+                    self.log(f"开始处理：{path}")
+        finally:
+            if watcher:
+                watcher.close()
+            # 等待正在处理的文件完成，不再开始新的
+            executor.shutdown(wait=True)
+            self.collect()
+            self.write_log({'event': 'stopped', 'files': processed, 'pending': len(self.pending)})
+        return processed
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description='监视目录，自动压缩新放入的 Excel/Word/PowerPoint 文件')
+    parser.add_argument('directories', nargs='+', help='要监视的目录')
+    parser.add_argument('--output-dir', '-o', required=True, help='输出目录（原文件保持不变）')
+    parser.add_argument('--recursive', '-r', action='store_true', help='同时监视子目录')
+    parser.add_argument('--mode', choices=MODES, default='balanced', help='压缩模式')
+    parser.add_argument('--engine', choices=ENGINES, default='zip', help='处理引擎')
+    parser.add_argument('--display-scale', type=float, default=None,
+                        help='按显示尺寸缩小图片的清晰度倍率，如 2（默认不按显示尺寸缩小）')
+    parser.add_argument('--budget-mb', type=float, default=None,
+                        help='每个文件的目标大小（MB），按图片显示面积和复杂度分配字节数（只支持 zip 引擎）')
+    parser.add_argument('--jobs', '-j', type=int, default=DEFAULT_JOBS, help='同时处理的文件数')
+    parser.add_argument('--image-workers', type=int, default=1, help='每个文件内压缩图片的进程数')
+    parser.add_argument('--no-cache', action='store_true', help='不使用压缩结果缓存')
+    parser.add_argument('--cache-path', help='缓存文件路径')
+    parser.add_argument('--full-validation', action='store_true',
+                        help='结构校验后再用 openpyxl 完整载入输出文件（大文件很慢）')
+    parser.add_argument('--existing', action='store_true', help='启动时先处理目录中已有的文件')
+    parser.add_argument('--poll', action='store_true',
+                        help='不使用 inotify，定时扫描目录（网络共享目录上其他机器写入的文件需要用这种方式发现）')
+    parser.add_argument('--poll-interval', type=float, default=POLL_SECONDS, help='定时扫描的间隔（秒）')
+    parser.add_argument('--settle', type=float, default=SETTLE_SECONDS,
+                        help='文件大小和修改时间保持不变多久后开始处理（秒）')
+    parser.add_argument('--log', help='JSON Lines 日志文件（默认为输出目录下的 watch_log.jsonl）')
+    parser.add_argument('--verbose', '-v', action='store_true', help='输出每个文件的详细日志')
+    args = parser.parse_args()
+
+    for directory in args.directories:
+        if not os.path.isdir(directory):
+            print(f"目录不存在：{directory}", file=sys.stderr)
+            return 1
+
+    options = {
+        'compression_mode': MODES[args.mode], 'engine': ENGINES[args.engine], 'output_dir': args.output_dir,
+        'image_workers': args.image_workers, 'display_scale': args.display_scale,
+        'use_cache': not args.no_cache, 'cache_path': args.cache_path, 'verbose': args.verbose,
+        'budget_bytes': int(args.budget_mb * 1024 * 1024) if args.budget_mb else None,
+        'full_validation': args.full_validation,
+    }
+
+    def on_result(summary):
+        if summary.get('ok'):
+            print(f"{summary['file']}: {summary['bytes_before']/1024/1024:.2f}MB -> "
+                  f"{summary['bytes_after']/1024/1024:.2f}MB ({summary['images_processed']}/"
+                  f"{summary['images_total']} 张图片, {summary['seconds']:.1f}s)", file=sys.stderr)
+        else:
+            print(f"{summary['file']}: 失败 - {summary['error']}", file=sys.stderr)
+
+    watcher = FolderWatcher(
+        args.directories, options, args.log or os.path.join(args.output_dir, 'watch_log.jsonl'),
+        jobs=args.jobs, recursive=args.recursive, use_polling=args.poll, include_existing=args.existing,
+        settle_seconds=args.settle, poll_seconds=args.poll_interval, on_result=on_result,
+        log=lambda message: print(message, file=sys.stderr))
+
+    # Ctrl+C 或 SIGTERM 时处理完正在进行的文件再退出
+    signal.signal(signal.SIGINT, lambda signum, frame: watcher.stop())
+    if hasattr(signal, 'SIGTERM'):
+        signal.signal(signal.SIGTERM, lambda signum, frame: watcher.stop())
+    watcher.run()
+    return 0
+
+
+if __name__ == '__main__':
+    # 打包后的程序启动进程池时需要
+    multiprocessing.freeze_support()
+    sys.exit(main())
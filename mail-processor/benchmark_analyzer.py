@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+邮件分析器端到端基准测试
+生成合成的 .eml 语料，使用 MockBackend 离线运行 MailAnalyzer 的各个阶段，
+输出每个阶段的耗时和吞吐量，不消耗 Gemini 配额
+"""
+
+import os
+import sys
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import contextlib
+from datetime import datetime, timedelta, timezone
+from email.message import EmailMessage
+from email.utils import format_datetime
+
+from mail_analyzer import MailAnalyzer
+from model_backend import MockBackend
+
+PRODUCTS = ['不锈钢水杯', '蓝牙耳机', '儿童雨衣', 'LED台灯', '瑜伽垫', 'USB-C 数据线', '陶瓷餐盘']
+
+
+def generate_corpus(corpus_dir: str, mail_count: int, conversation_size: int,
+                    attachment_kb: int, seed: int) -> int:
+    """
+    生成合成邮件语料
+
+    @param {str} corpus_dir - 输出目录
+    @param {int} mail_count - 邮件数量
+    @param {int} conversation_size - 每个会话的平均邮件数
+    @param {int} attachment_kb - 每封邮件附件大小(KB)，0 表示无附件
+    @param {int} seed - 随机种子
+    @return {int} - 语料总字节数
+    """
+    rng = random.Random(seed)
+    inbox = os.path.join(corpus_dir, 'INBOX')
+    os.makedirs(inbox, exist_ok=True)
+    base_time = datetime(2024, 1, 1, tzinfo=timezone(timedelta(hours=8)))
+    total_bytes = 0
+
+    for i in range(mail_count):
+        order_no = i // conversation_size
+        product = PRODUCTS[order_no % len(PRODUCTS)]
+        msg = EmailMessage()
+        msg['Subject'] = f"{'Re: ' if i % conversation_size else ''}订单 #{order_no:05d} {product}"
+        msg['From'] = f"供应商{order_no % 17} <supplier{order_no % 17}@example.com>"
+        msg['To'] = 'buyer@example.com'
+        msg['Date'] = format_datetime(base_time + timedelta(minutes=i * 7))
+        quantity = rng.randint(10, 5000)
+        price = rng.randint(100, 10000) / 100
+        body = (f"您好，\n\n关于订单 {order_no:05d}，确认 {product} 数量 {quantity} 件，"
+                f"单价 {price} USD，预计 {rng.randint(1, 28)} 日内交货。\n\n\n谢谢！\n")
+        msg.set_content(body * rng.randint(1, 5))
+        if attachment_kb:
+            msg.add_attachment(rng.randbytes(attachment_kb * 1024), maintype='application',
+                               subtype='pdf', filename=f'PO-{order_no:05d}.pdf')
+        data = bytes(msg)
+        total_bytes += len(data)
+        with open(os.path.join(inbox, f'{i:06d}.eml'), 'wb') as f:
+            f.write(data)
+
+    return total_bytes
+
+
+class StageTimer:
+    """
+    记录各阶段耗时和处理量
+    """
+    def __init__(self):
+        self.rows = []
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        """
+        计时一个阶段，调用方在 yield 出的字典中填写 items/bytes
+
+        @param {str} name - 阶段名称
+        """
+        record = {'items': 0, 'bytes': 0}
+        start = time.perf_counter()
+        yield record
+        self.rows.append((name, time.perf_counter() - start, record['items'], record['bytes']))
+
+    def report(self):
+        """
+        打印阶段统计表
+        """
+        print(f"\n{'阶段':<12}{'耗时(s)':>10}{'数量':>10}{'条/秒':>12}{'MB/秒':>10}")
+        print('-' * 56)
+        for name, elapsed, items, nbytes in self.rows:
+            rate = items / elapsed if elapsed > 0 else 0
+            mb_rate = nbytes / 1024 / 1024 / elapsed if elapsed > 0 and nbytes else 0
+            print(f"{name:<12}{elapsed:>10.3f}{items:>10}{rate:>12.1f}{mb_rate:>10.2f}")
+
+
+def run_benchmark(args):
+    """
+    运行基准测试
+
+    @param args - 命令行参数
+    """
+    work_dir = tempfile.mkdtemp(prefix='mail_bench_')
+    corpus_dir = os.path.join(work_dir, 'raw_mails')
+    print(f"工作目录: {work_dir}")
+    print(f"生成语料: {args.mails} 封邮件，每会话约 {args.conversation_size} 封，附件 {args.attachment_kb}KB")
+    corpus_bytes = generate_corpus(corpus_dir, args.mails, args.conversation_size,
+                                   args.attachment_kb, args.seed)
+    print(f"语料大小: {corpus_bytes / 1024 / 1024:.2f}MB")
+
+    backend = MockBackend(latency=args.latency, jitter=args.latency / 2,
+                          failure_rate=args.failure_rate, markdown_rate=0.3,
+                          malformed_rate=0.1, seed=args.seed)
+    timer = StageTimer()
+
+    # 屏蔽分析器的逐条日志，只保留基准输出
+    devnull = open(os.devnull, 'w', encoding='utf-8')
+    try:
+        for run in ('冷启动', '热启动'):
+            with contextlib.redirect_stdout(devnull):
+                analyzer = MailAnalyzer(
+                    backend=backend,
+                    raw_mails_dir=corpus_dir,
+                    reports_dir=os.path.join(work_dir, 'reports'),
+                    cache_path=os.path.join(work_dir, 'parse_cache.sqlite3'),
+                    spool_dir=os.path.join(work_dir, 'spool'),
+                    structured_output=not args.free_text
+                )
+                analyzer.retry_delay = 0
+
+            with timer.stage(f'扫描[{run}]') as rec, contextlib.redirect_stdout(devnull):
+                eml_paths = list(analyzer.scan_eml_files())
+                rec['items'] = len(eml_paths)
+            analyzer.stats['total_files'] = len(eml_paths)
+
+            with timer.stage(f'解析[{run}]') as rec, contextlib.redirect_stdout(devnull):
+                mails = list(analyzer.iter_parsed_emails(eml_paths))
+                rec['items'] = len(mails)
+                rec['bytes'] = corpus_bytes
+
+            with timer.stage(f'分组[{run}]') as rec, contextlib.redirect_stdout(devnull):
+                spool = analyzer.group_conversations(mails)
+                rec['items'] = spool.conversation_count()
+            del mails
+            analyzer.cache.close()
+            if run == '冷启动':
+                spool.close()
+
+        with timer.stage('构建提示词') as rec, contextlib.redirect_stdout(devnull):
+            prompt_bytes = 0
+            for emails in spool.iter_conversations():
+                prompt_bytes += len(analyzer.build_conversation_prompt(emails).encode('utf-8'))
+                rec['items'] += 1
+            rec['bytes'] = prompt_bytes
+
+        with timer.stage('模型分析') as rec, contextlib.redirect_stdout(devnull):
+            results = list(analyzer.iter_analyses(spool))
+            rec['items'] = len(results)
+        spool.close()
+
+        with timer.stage('写入结果') as rec, contextlib.redirect_stdout(devnull):
+            analyzer.write_results(results)
+            rec['items'] = len(results)
+
+        with timer.stage('生成报告') as rec, contextlib.redirect_stdout(devnull):
+            analyzer.generate_excel_report()
+            rec['items'] = len(results)
+    finally:
+        devnull.close()
+        if not args.keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    timer.report()
+    print(f"\n模型调用: {backend.calls} 次，注入失败 {backend.failures} 次，"
+          f"分析失败会话 {analyzer.stats['failed_analyses']} 个，"
+          f"本地修复 JSON {analyzer.stats['repaired_responses']} 次")
+
+
+def main():
+    """
+    主函数
+    """
+    parser = argparse.ArgumentParser(description='邮件分析器离线基准测试')
+    parser.add_argument('--mails', type=int, default=2000, help='合成邮件数量')
+    parser.add_argument('--conversation-size', type=int, default=4, help='每个会话的邮件数')
+    parser.add_argument('--attachment-kb', type=int, default=64, help='每封邮件附件大小(KB)')
+    parser.add_argument('--latency', type=float, default=0.0, help='模拟模型调用延迟(秒)')
+    parser.add_argument('--failure-rate', type=float, default=0.05, help='模拟调用失败率')
+    parser.add_argument('--free-text', action='store_true', help='关闭结构化输出，测试本地 JSON 修复')
+    parser.add_argument('--seed', type=int, default=42, help='随机种子')
+    parser.add_argument('--keep', action='store_true', help='保留生成的语料和报告')
+    args = parser.parse_args()
+
+    print("=" * 50)
+    print("邮件分析器基准测试")
+    print("=" * 50)
+    print(f"Python版本: {sys.version.split()[0]}")
+    run_benchmark(args)
+
+
+if __name__ == "__main__":
+    main()
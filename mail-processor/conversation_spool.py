@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+会话暂存区：将按会话分组的邮件溢写到磁盘
+分组阶段不再把所有邮件正文保存在内存中，分析阶段每次只加载一个会话
+"""
+
+import os
+import json
+import sqlite3
+import tempfile
+from itertools import groupby
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+
+class ConversationSpool:
+    """
+    基于临时 SQLite 文件的会话分组暂存
+    """
+    def __init__(self, spool_dir: Optional[str] = None):
+        """
+        创建暂存区
+
+        @param {Optional[str]} spool_dir - 临时文件目录，默认使用系统临时目录
+        """
+        if spool_dir:
+            os.makedirs(spool_dir, exist_ok=True)
+        fd, self.db_path = tempfile.mkstemp(prefix='conversation_spool_', suffix='.sqlite3', dir=spool_dir)
+        os.close(fd)
+
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.execute('PRAGMA journal_mode=OFF')
+        self.conn.execute('PRAGMA synchronous=OFF')
+        self.conn.execute("""
+            CREATE TABLE mails (
+                conversation_id TEXT NOT NULL,
+                timestamp REAL NOT NULL,
+                date TEXT,
+                data TEXT NOT NULL
+            )
+        """)
+        self._pending = []
+        self.mail_count = 0
+
+    def add(self, mail_data: Dict):
+        """
+        添加一封已解析的邮件
+
+        @param {Dict} mail_data - parse_eml 的输出
+        """
+        self._pending.append((mail_data['conversation_id'], mail_data['timestamp'], mail_data.get('date'),
+                              json.dumps(mail_data, ensure_ascii=False)))
+        self.mail_count += 1
+        if len(self._pending) >= 500:
+            self.flush()
+
+    def flush(self):
+        """
+        将缓冲写入磁盘
+        """
+        if not self._pending:
+            return
+        self.conn.executemany('INSERT INTO mails VALUES (?, ?, ?, ?)', self._pending)
+        self.conn.commit()
+        self._pending = []
+
+    def conversation_count(self) -> int:
+        """
+        获取会话总数
+
+        @return {int} - 会话数量
+        """
+        self.flush()
+        self._ensure_index()
+        return self.conn.execute('SELECT COUNT(DISTINCT conversation_id) FROM mails').fetchone()[0]
+
+    def iter_conversations(self, only: Optional[Set[str]] = None) -> Iterator[List[Dict]]:
+        """
+        按会话逐个读取邮件（按时间排序），内存中只保留当前会话
+
+        @param {Optional[Set[str]]} only - 只读取这些会话，None 表示全部
+        @return {Iterator[List[Dict]]} - 每次产出一个会话的全部邮件
+        """
+        self.flush()
+        self._ensure_index()
+        rows = self.conn.execute('SELECT conversation_id, data FROM mails ORDER BY conversation_id, timestamp')
+        for conversation_id, group in groupby(rows, key=lambda row: row[0]):
+            if only is not None and conversation_id not in only:
+                continue
+            yield [json.loads(data) for _, data in group]
+
+    def conversation_keys(self) -> Iterator[Tuple[str, str, int]]:
+        """
+        逐个会话产出最后一封邮件的日期和邮件数（不加载邮件内容），与报告中的 last_mail_date/mail_count 对应
+
+        @return {Iterator[Tuple[str, str, int]]} - (会话ID, 最后一封邮件的日期, 邮件数)
+        """
+        self.flush()
+        self._ensure_index()
+        rows = self.conn.execute('SELECT conversation_id, date FROM mails ORDER BY conversation_id, timestamp')
+        for conversation_id, group in groupby(rows, key=lambda row: row[0]):
+            dates = [date for _, date in group]
+            yield conversation_id, dates[-1], len(dates)
+
+    def get_conversation(self, conversation_id: str) -> List[Dict]:
+        """
+        读取单个会话的全部邮件（按时间排序）
+
+        @param {str} conversation_id - 会话ID
+        @return {List[Dict]} - 会话中的邮件
+        """
+        self.flush()
+        self._ensure_index()
+        rows = self.conn.execute(
+            'SELECT data FROM mails WHERE conversation_id = ? ORDER BY timestamp',
+            (conversation_id,)
+        )
+        return [json.loads(data) for (data,) in rows]
+
+    def _ensure_index(self):
+        """
+        分组读取前创建索引（写入完成后再建索引更快）
+        """
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_conversation ON mails (conversation_id, timestamp)')
+
+    def close(self):
+        """
+        关闭并删除临时文件
+        """
+        self.conn.close()
+        try:
+            os.remove(self.db_path)
+        except OSError:
+            pass
@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+共享的 Gemini 客户端
+统一代理配置、API 初始化和 HTTP 连接池：generate_content 通过共享的 requests 会话调用 REST 接口，
+所有分析请求复用连接池中的长连接；genai 模型实例（测试脚本使用）按名称复用；
+提供预热和延迟/健康探测（记录每个模型的 p50/p95），用于选择最快的可用模型，选择结果缓存在磁盘上
+"""
+
+import os
+import json
+import math
+import time
+import threading
+from typing import Dict, Iterable, List, Optional
+
+# 设置 Clash 代理
+PROXY_HOST = '127.0.0.1'
+PROXY_PORT = '7888'
+PROXY_URL = f'http://{PROXY_HOST}:{PROXY_PORT}'
+
+# requests 代理设置
+PROXIES = {
+    'http': PROXY_URL,
+    'https': PROXY_URL
+}
+
+# 按优先级排列的候选模型，可通过 GEMINI_MODEL 环境变量指定
+CANDIDATE_MODELS = ['gemini-1.5-flash', 'gemini-1.5-pro', 'gemini-pro']
+
+API_BASE_URL = 'https://generativelanguage.googleapis.com/v1beta'
+
+# REST 调用的超时：连接、读取(秒)
+REQUEST_TIMEOUT = (10, 120)
+
+# 探测选出的模型缓存在磁盘上，有效期内启动的进程不再重新探测
+MODEL_CACHE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                "downloads", "gemini_model.json")
+MODEL_CACHE_TTL = 6 * 3600
+
+_lock = threading.Lock()
+_configured = False
+_session = None
+_api_key: Optional[str] = None
+_models: Dict[str, object] = {}
+# 本进程内已选出的模型：候选列表 -> 模型名称
+_picked: Dict[tuple, str] = {}
+
+# 每个模型的探测记录：延迟列表(秒)和失败次数
+LATENCY_STATS: Dict[str, Dict] = {}
+
+
+def setup_proxy():
+    """
+    设置代理环境变量（genai 和 requests 都会读取）
+    """
+    os.environ['http_proxy'] = PROXY_URL
+    os.environ['https_proxy'] = PROXY_URL
+    os.environ['HTTPS_PROXY'] = PROXY_URL
+    os.environ['HTTP_PROXY'] = PROXY_URL
+
+
+def get_api_key() -> Optional[str]:
+    """
+    从 .env / 环境变量读取 API 密钥
+
+    @return {Optional[str]} - API 密钥，未设置返回None
+    """
+    from dotenv import load_dotenv
+    load_dotenv()
+    return os.getenv('GEMINI_API_KEY')
+
+
+class GeminiAPIError(Exception):
+    """
+    REST 接口返回错误或没有返回内容
+    """
+
+
+def require_api_key() -> str:
+    """
+    读取并缓存 API 密钥
+
+    @return {str} - API 密钥
+    """
+    global _api_key
+    with _lock:
+        if _api_key is None:
+            _api_key = get_api_key()
+        if not _api_key:
+            raise ValueError("未找到 GEMINI_API_KEY 环境变量")
+        return _api_key
+
+
+def get_session():
+    """
+    获取共享的 requests 会话（经代理的长连接复用）
+
+    @return {requests.Session} - HTTP 会话
+    """
+    global _session
+    with _lock:
+        if _session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            session.proxies.update(PROXIES)
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=1)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            session.headers['Connection'] = 'keep-alive'
+            _session = session
+    return _session
+
+
+def configure(api_key: Optional[str] = None):
+    """
+    初始化 genai（进程内只执行一次）
+
+    使用 REST 传输，使调用经过 HTTP 代理并复用 genai 客户端内部的长连接
+
+    @param {Optional[str]} api_key - API 密钥，默认从环境变量读取
+    """
+    global _configured
+    with _lock:
+        if _configured:
+            return
+        setup_proxy()
+        api_key = api_key or get_api_key()
+        if not api_key:
+            raise ValueError("未找到 GEMINI_API_KEY 环境变量")
+
+        import google.generativeai as genai
+        genai.configure(api_key=api_key, transport='rest')
+        _configured = True
+
+
+def _rest_schema(schema):
+    """
+    转换 JSON Schema 为 REST 接口的格式（类型名使用大写枚举值）
+
+    @param schema - INVENTORY_SCHEMA 形式的结构
+    @return - REST 接口的 Schema
+    """
+    if isinstance(schema, list):
+        return [_rest_schema(item) for item in schema]
+    if not isinstance(schema, dict):
+        return schema
+    return {key: value.upper() if key == 'type' and isinstance(value, str) else _rest_schema(value)
+            for key, value in schema.items()}
+
+
+def _rest_generation_config(generation_config: Dict) -> Dict:
+    """
+    转换 genai 风格的 generation_config（下划线命名）为 REST 接口的 generationConfig
+
+    @param {Dict} generation_config - 如 {'response_mime_type': ..., 'response_schema': ...}
+    @return {Dict} - REST 接口的 generationConfig
+    """
+    config = {}
+    for key, value in generation_config.items():
+        head, *rest = key.split('_')
+        name = head + ''.join(word.capitalize() for word in rest)
+        config[name] = _rest_schema(value) if key == 'response_schema' else value
+    return config
+
+
+def generate_content(model_name: str, prompt: str, generation_config: Optional[Dict] = None) -> str:
+    """
+    通过共享会话调用 REST generateContent，复用连接池中的长连接
+
+    @param {str} model_name - 模型名称
+    @param {str} prompt - 提示词
+    @param {Optional[Dict]} generation_config - 生成参数（与 genai 相同的下划线命名）
+    @return {str} - 模型返回的文本
+    """
+    body = {'contents': [{'role': 'user', 'parts': [{'text': prompt}]}]}
+    if generation_config:
+        body['generationConfig'] = _rest_generation_config(generation_config)
+    response = get_session().post(
+        f'{API_BASE_URL}/models/{model_name}:generateContent',
+        headers={'x-goog-api-key': require_api_key()},
+        json=body,
+        timeout=REQUEST_TIMEOUT
+    )
+    if response.status_code != 200:
+        try:
+            message = response.json()['error']['message']
+        except (ValueError, KeyError, TypeError):
+            message = response.text[:500]
+        raise GeminiAPIError(f"HTTP {response.status_code}: {message}")
+
+    data = response.json()
+    candidates = data.get('candidates') or []
+    if not candidates:
+        raise GeminiAPIError(f"模型没有返回内容: {data.get('promptFeedback')}")
+    parts = candidates[0].get('content', {}).get('parts', [])
+    return ''.join(part.get('text', '') for part in parts)
+
+
+def get_model(model_name: str):
+    """
+    获取（并缓存）模型实例
+
+    @param {str} model_name - 模型名称
+    @return {genai.GenerativeModel} - 模型实例
+    """
+    configure()
+    with _lock:
+        model = _models.get(model_name)
+        if model is None:
+            import google.generativeai as genai
+            model = genai.GenerativeModel(model_name)
+            _models[model_name] = model
+    return model
+
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    """
+    计算百分位数（最近秩法）
+
+    @param {List[float]} values - 样本
+    @param {float} p - 百分位 (0-100)
+    @return {Optional[float]} - 百分位值，无样本返回None
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(p / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def record_latency(model_name: str, latency: Optional[float]):
+    """
+    记录一次调用结果
+
+    @param {str} model_name - 模型名称
+    @param {Optional[float]} latency - 延迟(秒)，None 表示失败
+    """
+    with _lock:
+        stats = LATENCY_STATS.setdefault(model_name, {'latencies': [], 'errors': 0})
+        if latency is None:
+            stats['errors'] += 1
+        else:
+            stats['latencies'].append(latency)
+
+
+def latency_summary(model_name: str) -> Dict:
+    """
+    汇总模型的延迟统计
+
+    @param {str} model_name - 模型名称
+    @return {Dict} - 包含 p50/p95/样本数/失败数/是否健康
+    """
+    stats = LATENCY_STATS.get(model_name, {'latencies': [], 'errors': 0})
+    latencies = stats['latencies']
+    return {
+        'model': model_name,
+        'p50': percentile(latencies, 50),
+        'p95': percentile(latencies, 95),
+        'samples': len(latencies),
+        'errors': stats['errors'],
+        'healthy': bool(latencies) and stats['errors'] <= len(latencies),
+    }
+
+
+def warm_up(model_name: str) -> Optional[float]:
+    """
+    预热：发一个极小的请求建立连接（与分析请求使用同一个连接池），返回延迟
+
+    @param {str} model_name - 模型名称
+    @return {Optional[float]} - 延迟(秒)，失败返回None
+    """
+    start = time.perf_counter()
+    try:
+        generate_content(model_name, 'ping', {'max_output_tokens': 1})
+    except Exception as e:
+        print(f"模型 {model_name} 预热失败: {str(e)}")
+        record_latency(model_name, None)
+        return None
+    latency = time.perf_counter() - start
+    record_latency(model_name, latency)
+    return latency
+
+
+def probe_models(model_names: Iterable[str] = CANDIDATE_MODELS, rounds: int = 3) -> List[Dict]:
+    """
+    探测各模型的延迟和健康状况（第一次调用同时完成预热）
+
+    @param {Iterable[str]} model_names - 模型名称
+    @param {int} rounds - 每个模型的探测次数
+    @return {List[Dict]} - 每个模型的延迟统计
+    """
+    summaries = []
+    for model_name in model_names:
+        for _ in range(rounds):
+            if warm_up(model_name) is None:
+                # 连续失败的模型不再浪费配额
+                break
+        summary = latency_summary(model_name)
+        summaries.append(summary)
+        if summary['healthy']:
+            print(f"模型 {model_name}: p50={summary['p50'] * 1000:.0f}ms "
+                  f"p95={summary['p95'] * 1000:.0f}ms ({summary['samples']} 次)")
+        else:
+            print(f"模型 {model_name}: 不可用 (失败 {summary['errors']} 次)")
+    return summaries
+
+
+def _load_picked_model(model_names: List[str], cache_path: str, ttl: float) -> Optional[str]:
+    """
+    读取磁盘上缓存的模型选择
+
+    @param {List[str]} model_names - 候选模型（与缓存时不同则缓存无效）
+    @param {str} cache_path - 缓存文件路径
+    @param {float} ttl - 有效期(秒)
+    @return {Optional[str]} - 模型名称，没有有效缓存返回None
+    """
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(cached, dict) or cached.get('candidates') != model_names:
+        return None
+    if time.time() - cached.get('picked_at', 0) > ttl or cached.get('model') not in model_names:
+        return None
+    return cached['model']
+
+
+def _save_picked_model(model_name: str, model_names: List[str], cache_path: str):
+    """
+    把模型选择写入磁盘缓存（写入失败不影响使用）
+
+    @param {str} model_name - 选中的模型
+    @param {List[str]} model_names - 候选模型
+    @param {str} cache_path - 缓存文件路径
+    """
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        temp_path = cache_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'model': model_name, 'candidates': model_names, 'picked_at': time.time()}, f)
+        os.replace(temp_path, cache_path)
+    except OSError as e:
+        print(f"警告：无法保存模型选择缓存: {str(e)}")
+
+
+def pick_fastest_model(model_names: Iterable[str] = CANDIDATE_MODELS, rounds: int = 2,
+                       cache_path: Optional[str] = MODEL_CACHE_PATH, ttl: float = MODEL_CACHE_TTL) -> str:
+    """
+    选择 p50 延迟最低的可用模型，GEMINI_MODEL 环境变量优先
+
+    探测需要多次真实调用，结果在进程内复用，并缓存到 cache_path（ttl 秒内有效）
+
+    @param {Iterable[str]} model_names - 候选模型
+    @param {int} rounds - 每个模型的探测次数
+    @param {Optional[str]} cache_path - 磁盘缓存路径，None 表示不使用磁盘缓存
+    @param {float} ttl - 磁盘缓存有效期(秒)
+    @return {str} - 模型名称
+    """
+    preferred = os.getenv('GEMINI_MODEL')
+    if preferred:
+        return preferred
+
+    model_names = list(model_names)
+    key = tuple(model_names)
+    with _lock:
+        picked = _picked.get(key)
+    if picked:
+        return picked
+
+    picked = _load_picked_model(model_names, cache_path, ttl) if cache_path else None
+    if picked:
+        print(f"使用缓存的模型选择: {picked}")
+    else:
+        healthy = [s for s in probe_models(model_names, rounds) if s['healthy']]
+        if not healthy:
+            # 不缓存，下次启动时重新探测
+            print(f"警告：没有探测到可用模型，使用默认模型 {model_names[-1]}")
+            return model_names[-1]
+        picked = min(healthy, key=lambda s: s['p50'])['model']
+        print(f"选择最快的模型: {picked}")
+        if cache_path:
+            _save_picked_model(picked, model_names, cache_path)
+
+    with _lock:
+        _picked[key] = picked
+    return picked
@@ -36,12 +36,15 @@ class ImapClient:
     IMAP邮件客户端类
     """
     
-    def __init__(self):
+    def __init__(self, on_mail_saved=None):
         """
         初始化邮件客户端
+        
+        @param on_mail_saved: 邮件原件保存后的回调，参数为.eml文件路径
         """
         self.server = None
         self.base_path = EMAIL_CONFIG['save_path']
+        self.on_mail_saved = on_mail_saved
         
         # 创建基础下载目录
         if not os.path.exists(self.base_path):
@@ -194,6 +197,7 @@ class ImapClient:
         @param imap_folder: IMAP文件夹名
         @param subject: 邮件主题
         @param date: 邮件日期
+        @return: 保存的文件路径
         """
         # 解码IMAP文件夹名
         imap_folder = decode_imap_utf7(imap_folder)
@@ -212,6 +216,11 @@ class ImapClient:
         with open(filepath, 'wb') as f:
             f.write(email_content)
         print(f"已保存邮件原件: {imap_folder}/{filename}")
+        
+        # 通知下游（如分析流水线）有新邮件
+        if self.on_mail_saved:
+            self.on_mail_saved(filepath)
+        return filepath
 
     def get_email_date(self, email_message):
         """
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+本地 JSON 修复：在不重新调用模型的情况下修正常见的格式问题
+包括 Markdown 代码块、前后说明文字、中文引号、单引号、Python 字面量、
+注释、多余的逗号、字符串中的换行以及被截断的括号
+"""
+
+import re
+import json
+from typing import Any, Optional
+
+CODE_FENCE_PATTERN = re.compile(r'```(?:json|JSON)?\s*([\s\S]*?)(?:```|$)')
+PY_LITERALS = {'None': 'null', 'True': 'true', 'False': 'false'}
+CLOSERS = {'{': '}', '[': ']'}
+# 字符串外出现时作为字符串起止符的引号 -> 对应的结束引号；字符串内的中文引号是内容，保持原样
+QUOTES = {'"': '"', "'": "'", '“': '”', '”': '”'}
+
+
+def _strip_wrapping(text: str) -> str:
+    """
+    去掉代码块标记和 JSON 前后的说明文字
+
+    @param {str} text - 原始文本
+    @return {str} - 从第一个 { 或 [ 开始的文本
+    """
+    text = text.strip().lstrip('﻿')
+    match = CODE_FENCE_PATTERN.search(text)
+    if match and match.group(1).strip():
+        text = match.group(1)
+    starts = [i for i in (text.find('{'), text.find('[')) if i != -1]
+    if starts:
+        text = text[min(starts):]
+    return text
+
+
+def _normalize(text: str) -> str:
+    """
+    逐字符扫描：统一引号、去注释、替换 Python 字面量、转义字符串中的换行、
+    删除多余逗号，并补齐被截断的字符串和括号
+
+    @param {str} text - 待修复文本
+    @return {str} - 修复后的文本
+    """
+    out = []
+    stack = []
+    quote = None  # 当前字符串的结束引号字符
+    i = 0
+    n = len(text)
+    while i < n:
+        ch = text[i]
+        if quote:
+            if ch == '\\' and i + 1 < n:
+                out.append(text[i:i + 2])
+                i += 2
+                continue
+            if ch == quote:
+                out.append('"')
+                quote = None
+            elif ch == '"':
+                # 单引号或中文引号字符串中的双引号需要转义
+                out.append('\\"')
+            elif ch == '\n':
+                out.append('\\n')
+            elif ch == '\r':
+                pass
+            elif ch == '\t':
+                out.append('\\t')
+            else:
+                out.append(ch)
+            i += 1
+            continue
+
+        if ch in QUOTES:
+            quote = QUOTES[ch]
+            out.append('"')
+        elif ch == '/' and text.startswith('//', i):
+            end = text.find('\n', i)
+            i = n if end == -1 else end
+            continue
+        elif ch == '/' and text.startswith('/*', i):
+            end = text.find('*/', i + 2)
+            i = n if end == -1 else end + 2
+            continue
+        elif ch in CLOSERS:
+            stack.append(CLOSERS[ch])
+            out.append(ch)
+        elif ch in ('}', ']'):
+            _drop_trailing_comma(out)
+            if stack and stack[-1] == ch:
+                stack.pop()
+                out.append(ch)
+                if not stack:
+                    # 顶层结构结束，忽略后面的说明文字
+                    break
+            # 不匹配的右括号直接丢弃
+        elif ch.isalpha():
+            end = i
+            while end < n and (text[end].isalnum() or text[end] == '_'):
+                end += 1
+            word = text[i:end]
+            rest = text[end:].lstrip()
+            if rest.startswith(':') and stack and stack[-1] == '}':
+                # 没有引号的键名
+                out.append(f'"{word}"')
+            else:
+                out.append(PY_LITERALS.get(word, word))
+            i = end
+            continue
+        else:
+            out.append(ch)
+        i += 1
+
+    # 输出被截断：补齐字符串和括号
+    if quote:
+        out.append('"')
+    _drop_trailing_comma(out)
+    if out and out[-1].rstrip().endswith(':'):
+        out.append('null')
+    while stack:
+        _drop_trailing_comma(out)
+        out.append(stack.pop())
+    return ''.join(out)
+
+
+def _drop_trailing_comma(out: list):
+    """
+    删除输出末尾（忽略空白）的逗号
+
+    @param {list} out - 已输出的片段
+    """
+    j = len(out) - 1
+    while j >= 0 and not out[j].strip():
+        j -= 1
+    if j >= 0 and out[j] == ',':
+        del out[j]
+
+
+def repair_json(text: str) -> Optional[Any]:
+    """
+    尝试修复并解析模型返回的 JSON
+
+    @param {str} text - 模型返回的文本
+    @return {Optional[Any]} - 解析结果，无法修复返回None
+    """
+    if not text:
+        return None
+    candidate = _strip_wrapping(text)
+    try:
+        return json.loads(candidate)
+    except json.JSONDecodeError:
+        pass
+
+    # 截断在键名或值中间时，退回到上一个逗号处再补齐
+    for _ in range(3):
+        try:
+            return json.loads(_normalize(candidate))
+        except json.JSONDecodeError:
+            cut = candidate.rfind(',')
+            if cut <= 0:
+                return None
+            candidate = candidate[:cut]
+    return None
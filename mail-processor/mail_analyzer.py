@@ -8,55 +8,96 @@
 
 import os
 import json
-import pandas as pd
 from email import policy
-from email.parser import BytesParser
+from email.parser import BytesParser, BytesHeaderParser
+from email.utils import parsedate_to_datetime
 from datetime import datetime
-import google.generativeai as genai
-from dotenv import load_dotenv
-from collections import defaultdict
 import re
 import time
-from typing import Dict, List, Optional
+import base64
+import quopri
+import argparse
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional, Set
+from mail_cache import ParsedMailCache
+from conversation_spool import ConversationSpool
+from model_backend import ModelBackend, GeminiBackend
+from report_writer import ReportWriter, DEFAULT_FORMATS, load_report_keys
+from json_repair import repair_json
 
 # 定义常量
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 RAW_MAILS_DIR = os.path.join(BASE_DIR, "downloads", "raw_mails")
 REPORTS_DIR = os.path.join(BASE_DIR, "reports")
+PARSE_CACHE_PATH = os.path.join(BASE_DIR, "downloads", "parse_cache.sqlite3")
+SPOOL_DIR = os.path.join(BASE_DIR, "downloads", "spool")
 
-# 设置 Clash 代理
-PROXY_HOST = '127.0.0.1'
-PROXY_PORT = '7888'
-PROXY_URL = f'http://{PROXY_HOST}:{PROXY_PORT}'
-
-# 设置环境变量
-os.environ['http_proxy'] = PROXY_URL
-os.environ['https_proxy'] = PROXY_URL
-os.environ['HTTPS_PROXY'] = PROXY_URL
-os.environ['HTTP_PROXY'] = PROXY_URL
+# 库存分析结果的响应结构（结构化输出模式下由模型保证）
+INVENTORY_ITEM_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'product_name': {'type': 'string', 'nullable': True},
+        'quantity': {'type': 'number', 'nullable': True},
+        'unit_price': {'type': 'number', 'nullable': True},
+        'total_price': {'type': 'number', 'nullable': True},
+        'delivery_date': {'type': 'string', 'nullable': True},
+        'special_requirements': {'type': 'string', 'nullable': True},
+        'status': {'type': 'string', 'enum': ['confirmed', 'pending', 'cancelled'], 'nullable': True},
+    },
+    'required': ['product_name', 'quantity', 'unit_price', 'total_price', 'status'],
+}
+INVENTORY_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'products': {'type': 'array', 'items': INVENTORY_ITEM_SCHEMA},
+    },
+    'required': ['products'],
+}
 
 class MailAnalyzer:
     """
     邮件分析器类，支持会话跟踪和递归处理
     """
-    def __init__(self):
+    def __init__(self, use_cache: bool = True, backend: Optional[ModelBackend] = None,
+                 raw_mails_dir: str = RAW_MAILS_DIR, reports_dir: str = REPORTS_DIR,
+                 cache_path: str = PARSE_CACHE_PATH, spool_dir: str = SPOOL_DIR,
+                 report_formats: Iterable[str] = DEFAULT_FORMATS, append_report: bool = False,
+                 structured_output: bool = True):
         """
         初始化邮��分析器
+        
+        @param {bool} use_cache - 是否启用解析结果磁盘缓存
+        @param {Optional[ModelBackend]} backend - 模型后端，默认在首次分析时创建 GeminiBackend
+        @param {str} raw_mails_dir - 邮件原件目录
+        @param {str} reports_dir - 报告输出目录
+        @param {str} cache_path - 解析缓存文件路径
+        @param {str} spool_dir - 会话暂存目录
+        @param {Iterable[str]} report_formats - 报告格式：xlsx / jsonl / parquet
+        @param {bool} append_report - 追加到滚动报告 inventory_rolling.* 而不是生成新报告（只分析新增或有新邮件的会话）
+        @param {bool} structured_output - 请求模型按 INVENTORY_SCHEMA 返回 JSON
         """
         print("初始化邮件分析器...")
-        load_dotenv()
-        
-        # 初始化 Gemini
-        api_key = os.getenv('GEMINI_API_KEY')
-        if not api_key:
-            raise ValueError("未找到 GEMINI_API_KEY 环境变量")
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel('gemini-pro')
-        print("Gemini API 初始化成功")
-        
-        # 初始化数据存储
-        self.conversation_threads: Dict[str, List[Dict]] = defaultdict(list)
-        self.inventory_data: List[Dict] = []
+        self._backend = backend
+        self.raw_mails_dir = raw_mails_dir
+        self.reports_dir = reports_dir
+        self.spool_dir = spool_dir
+        # 分析失败后重试前的等待时间(秒)
+        self.retry_delay = 1
+        self.structured_output = structured_output
+        
+        # 分析结果随处理进度流式写入报告，不在内存中累积
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        report_name = "inventory_rolling" if append_report else f"inventory_report_{timestamp}"
+        self.report_base = os.path.join(reports_dir, report_name)
+        self.results_path = self.report_base + '.jsonl'
+        self.report_formats = tuple(report_formats)
+        self.append_report = append_report
+        self.report_writer: Optional[ReportWriter] = None
+        # 追加模式下将被重新写入的会话（滚动报告中已有这些会话的旧行）
+        self.replace_ids: Set[str] = set()
+        
+        # 解析结果缓存
+        self.cache = ParsedMailCache(cache_path) if use_cache else None
         
         # 添加统计计数器
         self.stats = {
@@ -65,8 +106,35 @@ class MailAnalyzer:
             'failed_files': 0,
             'total_conversations': 0,
             'analyzed_conversations': 0,
-            'failed_analyses': 0
+            'failed_analyses': 0,
+            'cached_files': 0,
+            'written_results': 0,
+            'repaired_responses': 0,
+            'skipped_conversations': 0
         }
+        # 流水线在多个线程中并发分析会话，分析过程中的计数需要加锁
+        self._stats_lock = threading.Lock()
+    
+    @property
+    def backend(self) -> ModelBackend:
+        """
+        模型后端，只有真正需要分析时才初始化 Gemini
+        
+        @return {ModelBackend} - 模型后端
+        """
+        if self._backend is None:
+            self._backend = GeminiBackend()
+        return self._backend
+    
+    def count(self, key: str, amount: int = 1):
+        """
+        线程安全地增加统计计数
+        
+        @param {str} key - 统计项
+        @param {int} amount - 增加的数量
+        """
+        with self._stats_lock:
+            self.stats[key] += amount
     
     def extract_conversation_id(self, subject: str) -> str:
         """
@@ -91,48 +159,40 @@ class MailAnalyzer:
         print(f"\n正在解析邮件: {os.path.basename(eml_path)}")
         try:
             with open(eml_path, 'rb') as fp:
-                msg = BytesParser(policy=policy.default).parse(fp)
+                raw = fp.read()
+            
+            # 优先使用快速路径：只解析邮件头和文本部分，附件不解码
+            try:
+                msg, content_parts = self._parse_text_fast(raw)
+            except Exception as e:
+                print(f"警告：快速解析失败，改用完整解析: {str(e)}")
+                msg, content_parts = self._parse_text_full(raw)
             
-            subject = msg['subject'] or ''
+            subject = str(msg['subject'] or '')
             conversation_id = self.extract_conversation_id(subject)
             print(f"会话ID: {conversation_id}")
             
             # 提取发件人和收件人的邮箱地址
-            from_addr = re.findall(r'<(.+?)>', msg['from'])[0] if '<' in msg['from'] else msg['from']
-            to_addr = re.findall(r'<(.+?)>', msg['to'])[0] if '<' in msg['to'] else msg['to']
+            from_header = msg['from'] or ''
+            to_header = msg['to'] or ''
+            from_addr = re.findall(r'<(.+?)>', from_header)[0] if '<' in from_header else from_header
+            to_addr = re.findall(r'<(.+?)>', to_header)[0] if '<' in to_header else to_header
             
             mail_data = {
                 'file_path': eml_path,
                 'conversation_id': conversation_id,
                 'subject': subject,
-                'from': from_addr,
-                'to': to_addr,
-                'date': msg['date'],
+                'from': str(from_addr),
+                'to': str(to_addr),
+                'date': str(msg['date'] or ''),
                 'content': '',
-                'timestamp': datetime.strptime(msg['date'].split('(')[0].strip(), 
-                                             '%a, %d %b %Y %H:%M:%S %z').timestamp()
+                'timestamp': self.parse_date_timestamp(msg['date'], eml_path)
             }
             
-            content_parts = []
-            for part in msg.walk():
-                if part.get_content_type() == "text/plain":
-                    try:
-                        content = part.get_content()
-                        # 移除多余的空行和空格
-                        content = re.sub(r'\n\s*\n', '\n\n', content.strip())
-                        content_parts.append(content)
-                    except Exception as e:
-                        print(f"警告：解析内容部分失败: {str(e)}")
-                        try:
-                            payload = part.get_payload(decode=True)
-                            content = payload.decode('utf-8', errors='ignore')
-                            content = re.sub(r'\n\s*\n', '\n\n', content.strip())
-                            content_parts.append(content)
-                        except Exception as e:
-                            print(f"警告：备用解码也失败: {str(e)}")
-            
             mail_data['content'] = '\n\n'.join(content_parts)
             print(f"成功解析邮件，内容长度: {len(mail_data['content'])} 字符")
+            if self.cache:
+                self.cache.put(eml_path, mail_data)
             return mail_data
             
         except Exception as e:
@@ -140,6 +200,164 @@ class MailAnalyzer:
             print(f"错误详情: {str(e)}")
             return None
     
+    def parse_date_timestamp(self, date_header: Optional[str], eml_path: str) -> float:
+        """
+        解析 Date 邮件头为时间戳，兼容 RFC 2822 的各种写法
+        
+        @param {Optional[str]} date_header - Date 邮件头
+        @param {str} eml_path - .eml文件路径，日期无效时使用文件修改时间
+        @return {float} - 时间戳
+        """
+        if date_header:
+            try:
+                return parsedate_to_datetime(str(date_header)).timestamp()
+            except (TypeError, ValueError, IndexError) as e:
+                print(f"警告：无法解析邮件日期 {date_header}: {str(e)}")
+        return os.path.getmtime(eml_path)
+    
+    def _split_headers(self, raw: bytes, start: int = 0, end: Optional[int] = None):
+        """
+        定位邮件头与正文的分界
+        
+        @param {bytes} raw - 原始邮件字节
+        @param {int} start - 起始位置
+        @param {Optional[int]} end - 结束位置
+        @return {tuple} - (邮件头对象, 正文起始位置)
+        """
+        end = len(raw) if end is None else end
+        header_end = raw.find(b'\n\n', start, end)
+        crlf_end = raw.find(b'\r\n\r\n', start, end)
+        if crlf_end != -1 and (header_end == -1 or crlf_end < header_end):
+            body_start = crlf_end + 4
+        elif header_end != -1:
+            body_start = header_end + 2
+        else:
+            body_start = end
+        headers = BytesHeaderParser(policy=policy.default).parsebytes(raw[start:body_start])
+        return headers, body_start
+    
+    def _parse_text_fast(self, raw: bytes):
+        """
+        快速解析：用 BytesHeaderParser 解析邮件头，按边界定位 text/plain 部分，跳过二进制附件
+        
+        @param {bytes} raw - 原始邮件字节
+        @return {tuple} - (邮件头对象, 文本内容列表)
+        """
+        headers, body_start = self._split_headers(raw)
+        content_parts = []
+        self._collect_text_parts(raw, headers, body_start, len(raw), content_parts, depth=0)
+        return headers, content_parts
+    
+    def _collect_text_parts(self, raw: bytes, headers, start: int, end: int,
+                            content_parts: List[str], depth: int):
+        """
+        递归收集 text/plain 内容，非文本部分只扫描边界不解码
+        
+        @param {bytes} raw - 原始邮件字节
+        @param headers - 当前部分的邮件头对象
+        @param {int} start - 当前部分正文起始位置
+        @param {int} end - 当前部分正文结束位置
+        @param {List[str]} content_parts - 收集结果
+        @param {int} depth - 嵌套深度
+        """
+        if depth > 10:
+            return
+        
+        content_type = headers.get_content_type()
+        if content_type == 'text/plain':
+            content = self._decode_text_part(headers, raw[start:end])
+            # 移除多余的空行和空格
+            content = re.sub(r'\n\s*\n', '\n\n', content.strip())
+            content_parts.append(content)
+        elif content_type == 'message/rfc822':
+            inner_headers, inner_start = self._split_headers(raw, start, end)
+            self._collect_text_parts(raw, inner_headers, inner_start, end, content_parts, depth + 1)
+        elif headers.get_content_maintype() == 'multipart':
+            boundary = headers.get_boundary()
+            if not boundary:
+                return
+            for part_start, part_end in self._iter_multipart(raw, boundary.encode('ascii', 'ignore'), start, end):
+                part_headers, part_body_start = self._split_headers(raw, part_start, part_end)
+                self._collect_text_parts(raw, part_headers, part_body_start, part_end,
+                                         content_parts, depth + 1)
+    
+    def _iter_multipart(self, raw: bytes, boundary: bytes, start: int, end: int):
+        """
+        按 MIME 边界切分 multipart 正文，只返回位置不复制数据
+        
+        @param {bytes} raw - 原始邮件字节
+        @param {bytes} boundary - 边界字符串
+        @param {int} start - 正文起始位置
+        @param {int} end - 正文结束位置
+        @return {Iterator[tuple]} - 每个子部分的 (起始位置, 结束位置)
+        """
+        delimiter = b'--' + boundary
+        pos = raw.find(delimiter, start, end)
+        while pos != -1:
+            after = pos + len(delimiter)
+            # 结束边界
+            if raw[after:after + 2] == b'--':
+                return
+            line_end = raw.find(b'\n', after, end)
+            if line_end == -1:
+                return
+            part_start = line_end + 1
+            next_pos = raw.find(b'\n' + delimiter, part_start, end)
+            if next_pos == -1:
+                yield part_start, end
+                return
+            # 边界前的换行属于边界本身
+            part_end = next_pos - 1 if raw[next_pos - 1:next_pos] == b'\r' else next_pos
+            yield part_start, max(part_start, part_end)
+            pos = next_pos + 1
+    
+    def _decode_text_part(self, headers, payload: bytes) -> str:
+        """
+        按传输编码和字符集解码文本部分
+        
+        @param headers - 该部分的邮件头对象
+        @param {bytes} payload - 原始正文字节
+        @return {str} - 解码后的文本
+        """
+        encoding = str(headers.get('content-transfer-encoding', '')).strip().lower()
+        if encoding == 'base64':
+            payload = base64.b64decode(payload, validate=False)
+        elif encoding == 'quoted-printable':
+            payload = quopri.decodestring(payload)
+        
+        charset = headers.get_content_charset() or 'utf-8'
+        try:
+            return payload.decode(charset, errors='replace')
+        except LookupError:
+            return payload.decode('utf-8', errors='ignore')
+    
+    def _parse_text_full(self, raw: bytes):
+        """
+        完整解析：使用 BytesParser 解析整封邮件（快速路径失败时的备用方案）
+        
+        @param {bytes} raw - 原始邮件字节
+        @return {tuple} - (邮件对象, 文本内容列表)
+        """
+        msg = BytesParser(policy=policy.default).parsebytes(raw)
+        content_parts = []
+        for part in msg.walk():
+            if part.get_content_type() == "text/plain":
+                try:
+                    content = part.get_content()
+                    # 移除多余的空行和空格
+                    content = re.sub(r'\n\s*\n', '\n\n', content.strip())
+                    content_parts.append(content)
+                except Exception as e:
+                    print(f"警告：解析内容部分失败: {str(e)}")
+                    try:
+                        payload = part.get_payload(decode=True)
+                        content = payload.decode('utf-8', errors='ignore')
+                        content = re.sub(r'\n\s*\n', '\n\n', content.strip())
+                        content_parts.append(content)
+                    except Exception as e:
+                        print(f"警告：备用解码也失败: {str(e)}")
+        return msg, content_parts
+    
     def extract_json_from_response(self, response_text: str) -> Optional[Dict]:
         """
         从 Gemini 响应中提取 JSON 数据
@@ -173,6 +391,13 @@ class MailAnalyzer:
                 except json.JSONDecodeError:
                     pass
             
+            # 4. 本地修复常见格式错误（多余逗号、单引号、截断等），不再重新调用模型
+            repaired = repair_json(response_text)
+            if isinstance(repaired, (dict, list)):
+                print("已在本地修复响应中的 JSON 格式错误")
+                self.count('repaired_responses')
+                return repaired
+            
             print("无法从响应中提取有效的 JSON 数据")
             print("原始响应:")
             print(response_text)
@@ -182,23 +407,13 @@ class MailAnalyzer:
             print(f"提取 JSON 时发生错误: {str(e)}")
             return None
     
-    def analyze_conversation(self, conversation_emails: List[Dict]) -> Optional[Dict]:
+    def build_conversation_prompt(self, sorted_emails: List[Dict]) -> str:
         """
-        分析整个邮件会话
+        构建会话分析提示词
         
-        @param {List[Dict]} conversation_emails - 会话中的所有邮件
-        @return {Optional[Dict]} - 分析结果，失败返回None
+        @param {List[Dict]} sorted_emails - 按时间排序的会话邮件
+        @return {str} - 完整提示词
         """
-        conversation_id = conversation_emails[0]['conversation_id']
-        print(f"\n开始分析会话: {conversation_id}")
-        print(f"会话包含 {len(conversation_emails)} 封邮件")
-        
-        # 按时间排序邮件
-        sorted_emails = sorted(conversation_emails, key=lambda x: x['timestamp'])
-        print(f"时间跨度: {sorted_emails[0]['date']} 至 {sorted_emails[-1]['date']}")
-        
-        # 构建会话上下文
-        print("构建会话上下文...")
         conversation_context = "以下是一组相关邮件的往来记录，请分析最终确认的商品和库存信息：\n\n"
         for idx, email in enumerate(sorted_emails, 1):
             conversation_context += f"""
@@ -221,7 +436,7 @@ class MailAnalyzer:
         3. 如果没有明确提到的信息，对应字段返回null
         4. 价格统一使用美元单位
         
-        请以JSON格式返回，包含以下字段：
+        请以JSON格式返回，products 数组中的每个商品包含以下字段：
         1. product_name: 商品名称
         2. quantity: 确认的数量
         3. unit_price: 最终单价(USD)
@@ -230,15 +445,36 @@ class MailAnalyzer:
         6. special_requirements: 特殊要求或备注
         7. status: 订单状态(confirmed/pending/cancelled)
         """
+        return prompt + conversation_context
+    
+    def analyze_conversation(self, conversation_emails: List[Dict]) -> Optional[Dict]:
+        """
+        分析整个邮件会话
+        
+        @param {List[Dict]} conversation_emails - 会话中的所有邮件
+        @return {Optional[Dict]} - 分析结果，失败返回None
+        """
+        conversation_id = conversation_emails[0]['conversation_id']
+        print(f"\n开始分析会话: {conversation_id}")
+        print(f"会话包含 {len(conversation_emails)} 封邮件")
+        
+        # 按时间排序邮件
+        sorted_emails = sorted(conversation_emails, key=lambda x: x['timestamp'])
+        print(f"时间跨度: {sorted_emails[0]['date']} 至 {sorted_emails[-1]['date']}")
+        
+        # 构建会话上下文
+        print("构建会话上下文...")
+        full_prompt = self.build_conversation_prompt(sorted_emails)
         
         max_retries = 3
         for attempt in range(max_retries):
             try:
-                print(f"正在调用 Gemini API 进行分析... (尝试 {attempt + 1}/{max_retries})")
-                response = self.model.generate_content(prompt + conversation_context)
+                print(f"正在调用 {self.backend.name} 模型进行分析... (尝试 {attempt + 1}/{max_retries})")
+                response_schema = INVENTORY_SCHEMA if self.structured_output else None
+                response_text = self.backend.generate(full_prompt, response_schema=response_schema)
                 
                 # 从响应中提取 JSON
-                analysis_result = self.extract_json_from_response(response.text)
+                analysis_result = self.extract_json_from_response(response_text)
                 if analysis_result:
                     print("分析完成，成功解析JSON响应")
                     
@@ -252,123 +488,240 @@ class MailAnalyzer:
                     
                     return result
                 else:
-                    print(f"警告：无法提取有效的JSON (尝试 {attempt + 1}/{max_retries})")
-                    if attempt == max_retries - 1:
-                        raise json.JSONDecodeError("无法从响应中提取有效的JSON", response.text, 0)
-                    time.sleep(1)
-                    continue
+                    # 本地修复也失败时重新调用通常得到同样的结果，不再浪费配额重试
+                    print("警告：无法提取有效的JSON，放弃该会话")
+                    self.count('failed_analyses')
+                    return None
                     
             except Exception as e:
+                # 只有 API 调用本身出错才重试
                 print(f"分析失败 (尝试 {attempt + 1}/{max_retries}): {str(e)}")
                 if attempt == max_retries - 1:
-                    self.stats['failed_analyses'] += 1
+                    self.count('failed_analyses')
                     return None
-                time.sleep(1)
+                time.sleep(self.retry_delay)
     
-    def process_all_emails(self):
-        """
-        处理所有邮件并按会话分组
+    def parse_cached(self, eml_path: str) -> Optional[Dict]:
         """
-        print(f"\n开始扫描目录: {RAW_MAILS_DIR}")
-        
-        # 统计总文件数
-        for root, _, files in os.walk(RAW_MAILS_DIR):
-            self.stats['total_files'] += sum(1 for f in files if f.endswith('.eml'))
+        解析单个文件，未变化的文件直接从缓存加载（逐个到达的文件使用，如下载流水线）
         
-        print(f"找到 {self.stats['total_files']} 个.eml文件")
+        @param {str} eml_path - .eml文件路径
+        @return {Optional[Dict]} - 解析后的邮件数据，失败返回None
+        """
+        if self.cache:
+            mail_data = self.cache.get(eml_path)
+            if mail_data is not None:
+                self.stats['cached_files'] += 1
+                return mail_data
+        return self.parse_eml(eml_path)
+    
+    def scan_eml_files(self) -> Iterator[str]:
+        """
+        扫描阶段：逐个产出 .eml 文件路径
         
-        # 处理所有文件
-        for root, _, files in os.walk(RAW_MAILS_DIR):
+        @return {Iterator[str]} - .eml文件路径
+        """
+        for root, _, files in os.walk(self.raw_mails_dir):
             for file in files:
                 if file.endswith('.eml'):
-                    eml_path = os.path.join(root, file)
-                    try:
-                        mail_data = self.parse_eml(eml_path)
-                        if mail_data:
-                            self.conversation_threads[mail_data['conversation_id']].append(mail_data)
-                            self.stats['processed_files'] += 1
-                        else:
-                            self.stats['failed_files'] += 1
-                        print(f"进度: {self.stats['processed_files']}/{self.stats['total_files']}")
-                    except Exception as e:
-                        self.stats['failed_files'] += 1
-                        print(f"处理失败 {eml_path}: {e}")
+                    yield os.path.join(root, file)
+    
+    def iter_parsed_emails(self, eml_paths: Iterable[str], batch_size: int = 500) -> Iterator[Dict]:
+        """
+        解析阶段：分批查询缓存，未命中的文件重新解析
+        
+        @param {Iterable[str]} eml_paths - .eml文件路径
+        @param {int} batch_size - 每批查询缓存的文件数
+        @return {Iterator[Dict]} - 解析后的邮件数据
+        """
+        batch = []
+        for eml_path in eml_paths:
+            batch.append(eml_path)
+            if len(batch) >= batch_size:
+                yield from self._parse_batch(batch)
+                batch = []
+        if batch:
+            yield from self._parse_batch(batch)
+        
+        if self.cache:
+            self.cache.flush()
+    
+    def _parse_batch(self, eml_paths: List[str]) -> Iterator[Dict]:
+        """
+        解析一批文件，未变化的文件直接从缓存加载
         
-        self.stats['total_conversations'] = len(self.conversation_threads)
-        print(f"\n文件处理完成. 共发现 {self.stats['total_conversations']} 个会话")
+        @param {List[str]} eml_paths - .eml文件路径
+        @return {Iterator[Dict]} - 解析后的邮件数据
+        """
+        cached = self.cache.get_many(eml_paths) if self.cache else {}
+        self.stats['cached_files'] += len(cached)
+        
+        for eml_path in eml_paths:
+            mail_data = cached.get(eml_path)
+            if mail_data is None:
+                try:
+                    mail_data = self.parse_eml(eml_path)
+                except Exception as e:
+                    print(f"处理失败 {eml_path}: {e}")
+                    mail_data = None
+                if mail_data is None:
+                    self.stats['failed_files'] += 1
+                    continue
+            self.stats['processed_files'] += 1
+            print(f"进度: {self.stats['processed_files']}/{self.stats['total_files']}")
+            yield mail_data
+    
+    def group_conversations(self, mails: Iterable[Dict]) -> ConversationSpool:
+        """
+        分组阶段：将邮件按会话溢写到磁盘暂存区
         
-        # 分析会话
-        print("\n开始分析会话...")
-        for conversation_id, emails in self.conversation_threads.items():
+        @param {Iterable[Dict]} mails - 解析后的邮件数据
+        @return {ConversationSpool} - 会话暂存区
+        """
+        spool = ConversationSpool(self.spool_dir)
+        for mail_data in mails:
+            spool.add(mail_data)
+        spool.flush()
+        return spool
+    
+    def select_changed(self, spool: ConversationSpool) -> Set[str]:
+        """
+        追加模式：找出滚动报告中还没有、或收到了新邮件的会话，未变化的会话不再调用模型
+        
+        @param {ConversationSpool} spool - 会话暂存区
+        @return {Set[str]} - 需要分析的会话ID
+        """
+        reported = load_report_keys(self.report_base, self.report_formats)
+        changed = set()
+        for conversation_id, last_mail_date, mail_count in spool.conversation_keys():
+            if reported.get(conversation_id) == (last_mail_date, mail_count):
+                self.stats['skipped_conversations'] += 1
+            else:
+                changed.add(conversation_id)
+        self.replace_ids = {conversation_id for conversation_id in changed if conversation_id in reported}
+        return changed
+    
+    def iter_analyses(self, spool: ConversationSpool, only: Optional[Set[str]] = None) -> Iterator[Dict]:
+        """
+        分析阶段：逐个会话调用模型分析
+        
+        @param {ConversationSpool} spool - 会话暂存区
+        @param {Optional[Set[str]]} only - 只分析这些会话，None 表示全部
+        @return {Iterator[Dict]} - 分析结果
+        """
+        for emails in spool.iter_conversations(only):
             analysis_result = self.analyze_conversation(emails)
             if analysis_result:
-                self.inventory_data.append(analysis_result)
                 self.stats['analyzed_conversations'] += 1
+                yield analysis_result
+    
+    def write_results(self, results: Iterable[Dict]):
+        """
+        写入阶段：每得到一个分析结果就立即写入报告
+        
+        @param {Iterable[Dict]} results - 分析结果
+        """
+        for result in results:
+            self.write_result(result)
+    
+    def write_result(self, result: Dict):
+        """
+        写入单个分析结果（首次写入时打开报告）
+        
+        @param {Dict} result - 分析结果
+        """
+        if self.report_writer is None:
+            self.report_writer = ReportWriter(self.report_base, formats=self.report_formats,
+                                              append=self.append_report, replace=self.replace_ids)
+        self.report_writer.write(result)
+        self.stats['written_results'] += 1
+    
+    def process_all_emails(self):
+        """
+        处理所有邮件并按会话分组
+        
+        流水线：扫描 -> 解析 -> 分组(溢写磁盘) -> 分析 -> 增量写入，内存占用与归档大小无关
+        """
+        print(f"\n开始扫描目录: {self.raw_mails_dir}")
+        
+        # 统计总文件数（只计数，不保存路径列表）
+        self.stats['total_files'] = sum(1 for _ in self.scan_eml_files())
+        print(f"找到 {self.stats['total_files']} 个.eml文件")
+        
+        spool = self.group_conversations(self.iter_parsed_emails(self.scan_eml_files()))
+        try:
+            self.stats['total_conversations'] = spool.conversation_count()
+            print(f"\n文件处理完成. 共发现 {self.stats['total_conversations']} 个会话")
+            print(f"缓存命中: {self.stats['cached_files']} 个文件")
+            
+            only = None
+            if self.append_report:
+                only = self.select_changed(spool)
+                print(f"滚动报告中未变化的会话: {self.stats['skipped_conversations']} 个，"
+                      f"需要分析: {len(only)} 个（其中替换旧结果 {len(self.replace_ids)} 个）")
+            
+            # 分析会话并增量写入结果
+            print("\n开始分析会话...")
+            print(f"分析结果实时写入: {self.report_base}.*")
+            self.write_results(self.iter_analyses(spool, only))
+        finally:
+            spool.close()
         
         # 打印统计信息
         print("\n处理统计:")
         print(f"总文件数: {self.stats['total_files']}")
-        print(f"成功处理: {self.stats['processed_files']}")
+        print(f"成功处理: {self.stats['processed_files']} (其中缓存命中 {self.stats['cached_files']})")
         print(f"处理失败: {self.stats['failed_files']}")
         print(f"总会话数: {self.stats['total_conversations']}")
+        if self.append_report:
+            print(f"未变化跳过: {self.stats['skipped_conversations']}")
         print(f"成功分析: {self.stats['analyzed_conversations']}")
         print(f"分析失败: {self.stats['failed_analyses']}")
     
+    def iter_results(self) -> Iterator[Dict]:
+        """
+        从 JSON Lines 文件逐条读取分析结果
+        
+        @return {Iterator[Dict]} - 分析结果
+        """
+        if not os.path.exists(self.results_path):
+            return
+        with open(self.results_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+    
     def generate_excel_report(self):
         """
-        生成Excel报告
+        完成报告：行已在分析过程中流式写入，这里只需关闭输出文件
         """
         print("\n开始生成报告...")
         
-        if not self.inventory_data:
-            print("警告：没有可用的分析数据")
+        if self.report_writer is None:
+            if self.append_report and self.stats['skipped_conversations']:
+                print("没有新增或变化的会话，滚动报告保持不变")
+            else:
+                print("警告：没有可用的分析数据")
             return
         
-        # 确保报告目录存在
-        os.makedirs(REPORTS_DIR, exist_ok=True)
-        
-        # 生成报告文件名
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        output_path = os.path.join(REPORTS_DIR, f"inventory_report_{timestamp}.xlsx")
-        
-        # 转换数据为DataFrame
-        print("正在处理数据...")
-        
-        # 展平嵌套的JSON数据
-        flattened_data = []
-        for item in self.inventory_data:
-            flat_item = {
-                'conversation_id': item['conversation_id'],
-                'first_mail_date': item['first_mail_date'],
-                'last_mail_date': item['last_mail_date'],
-                'mail_count': item['mail_count']
-            }
-            # 添加分析结果
-            if isinstance(item['analysis_result'], dict):
-                for key, value in item['analysis_result'].items():
-                    flat_item[key] = value
-            flattened_data.append(flat_item)
-        
-        df = pd.DataFrame(flattened_data)
-        
-        # 保存到Excel
-        print(f"保存Excel报告: {output_path}")
-        df.to_excel(output_path, index=False)
-        
-        # 生成JSON备份
-        json_path = output_path.replace('.xlsx', '.json')
-        print(f"保存JSON备份: {json_path}")
-        with open(json_path, 'w', encoding='utf-8') as f:
-            json.dump(self.inventory_data, f, ensure_ascii=False, indent=2)
+        paths = self.report_writer.close()
+        self.report_writer = None
         
         print("\n报告生成完成!")
-        print(f"Excel报告: {output_path}")
-        print(f"JSON备份: {json_path}")
+        print(f"共写入 {self.stats['written_results']} 个会话的分析结果")
+        labels = {'xlsx': 'Excel报告', 'jsonl': 'JSON Lines备份', 'parquet': 'Parquet数据'}
+        for fmt, path in paths.items():
+            print(f"{labels.get(fmt, fmt)}: {path}")
 
 def main():
     """
     主函数
     """
+    parser = argparse.ArgumentParser(description='邮件分析器')
+    parser.add_argument('--append', action='store_true', help='追加到滚动报告 inventory_rolling.*')
+    args = parser.parse_args()
+    
     print("=" * 50)
     print("邮件分析器启动")
     print("=" * 50)
@@ -379,7 +732,7 @@ def main():
     
     try:
         # 创建分析器实例
-        analyzer = MailAnalyzer()
+        analyzer = MailAnalyzer(backend=GeminiBackend(), append_report=args.append)
         
         # 处理所有邮件
         analyzer.process_all_emails()
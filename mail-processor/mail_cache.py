@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+邮件解析缓存：将 parse_eml 的结果持久化到 SQLite
+以 (文件路径, 文件大小, 修改时间) 为键，邮件归档只增不改，未变化的文件直接从缓存批量加载
+"""
+
+import os
+import json
+import sqlite3
+from typing import Dict, Iterable, Optional, Tuple
+
+# 缓存格式版本，parse_eml 输出结构变化时递增，旧缓存自动失效
+CACHE_VERSION = 1
+
+
+class ParsedMailCache:
+    """
+    已解析邮件的磁盘缓存
+    """
+    def __init__(self, db_path: str):
+        """
+        初始化缓存
+
+        @param {str} db_path - SQLite 数据库文件路径
+        """
+        self.db_path = db_path
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS parsed_mails (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                version INTEGER NOT NULL,
+                data TEXT NOT NULL
+            )
+        """)
+        self.conn.commit()
+
+        # 批量加载的索引：path -> (size, mtime_ns)
+        self._index: Dict[str, Tuple[int, int]] = {}
+        self._index_loaded = False
+        self._pending = []
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def file_key(eml_path: str) -> Tuple[int, int]:
+        """
+        获取文件的缓存键
+
+        @param {str} eml_path - .eml文件路径
+        @return {Tuple[int, int]} - (文件大小, 修改时间纳秒)
+        """
+        st = os.stat(eml_path)
+        return st.st_size, st.st_mtime_ns
+
+    def load_index(self):
+        """
+        一次性读取所有缓存条目的键，避免逐个文件查询
+        """
+        rows = self.conn.execute(
+            'SELECT path, size, mtime_ns FROM parsed_mails WHERE version = ?',
+            (CACHE_VERSION,)
+        )
+        self._index = {path: (size, mtime_ns) for path, size, mtime_ns in rows}
+        self._index_loaded = True
+        print(f"解析缓存已加载: {len(self._index)} 条记录")
+
+    def get_many(self, eml_paths: Iterable[str]) -> Dict[str, Dict]:
+        """
+        批量读取未变化文件的缓存结果
+
+        @param {Iterable[str]} eml_paths - .eml文件路径列表
+        @return {Dict[str, Dict]} - 命中的 path -> 解析结果
+        """
+        if not self._index_loaded:
+            self.load_index()
+
+        valid = []
+        for path in eml_paths:
+            cached_key = self._index.get(path)
+            try:
+                if cached_key is not None and cached_key == self.file_key(path):
+                    valid.append(path)
+            except OSError:
+                continue
+
+        results = {}
+        # SQLite 对参数数量有限制，分批查询
+        batch_size = 500
+        for i in range(0, len(valid), batch_size):
+            batch = valid[i:i + batch_size]
+            placeholders = ','.join('?' * len(batch))
+            rows = self.conn.execute(
+                f'SELECT path, data FROM parsed_mails WHERE path IN ({placeholders})',
+                batch
+            )
+            for path, data in rows:
+                results[path] = json.loads(data)
+
+        self.hits += len(results)
+        return results
+
+    def get(self, eml_path: str) -> Optional[Dict]:
+        """
+        读取单个文件的缓存结果
+
+        @param {str} eml_path - .eml文件路径
+        @return {Optional[Dict]} - 解析结果，未命中返回None
+        """
+        try:
+            size, mtime_ns = self.file_key(eml_path)
+        except OSError:
+            return None
+        row = self.conn.execute(
+            'SELECT data FROM parsed_mails WHERE path = ? AND size = ? AND mtime_ns = ? AND version = ?',
+            (eml_path, size, mtime_ns, CACHE_VERSION)
+        ).fetchone()
+        if row is None:
+            return None
+        self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, eml_path: str, mail_data: Dict):
+        """
+        写入解析结果（先缓冲，flush 时批量提交）
+
+        @param {str} eml_path - .eml文件路径
+        @param {Dict} mail_data - parse_eml 的输出
+        """
+        try:
+            size, mtime_ns = self.file_key(eml_path)
+        except OSError:
+            return
+        self.misses += 1
+        self._index[eml_path] = (size, mtime_ns)
+        self._pending.append((eml_path, size, mtime_ns, CACHE_VERSION,
+                              json.dumps(mail_data, ensure_ascii=False)))
+        if len(self._pending) >= 500:
+            self.flush()
+
+    def flush(self):
+        """
+        提交缓冲中的写入
+        """
+        if not self._pending:
+            return
+        self.conn.executemany(
+            'INSERT OR REPLACE INTO parsed_mails (path, size, mtime_ns, version, data) VALUES (?, ?, ?, ?, ?)',
+            self._pending
+        )
+        self.conn.commit()
+        self._pending = []
+
+    def close(self):
+        """
+        提交剩余写入并关闭数据库
+        """
+        self.flush()
+        self.conn.close()
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+邮件全文索引：基于 parse_eml 输出的倒排索引
+覆盖主题、发件人/收件人和正文，中文按单字和二元组(bigram)切分，英文和数字按单词切分。
+索引增量维护，只有新增或变化的 .eml 文件会被重新解析
+
+用法：
+    python3 mail-processor/mail_index.py update
+    python3 mail-processor/mail_index.py search 订单 蓝牙耳机
+"""
+
+import os
+import re
+import sys
+import time
+import sqlite3
+import argparse
+import contextlib
+from typing import Dict, List, Optional, Set
+
+from mail_analyzer import MailAnalyzer, BASE_DIR, RAW_MAILS_DIR
+
+INDEX_PATH = os.path.join(BASE_DIR, "downloads", "mail_index.sqlite3")
+# 切分规则改变时递增，旧版本的索引会被清空重建
+INDEX_VERSION = 2
+
+# 中日韩字符连续片段 / 英文数字单词 / 邮箱地址
+CJK_RUN_PATTERN = re.compile(r'[㐀-䶿一-鿿豈-﫿぀-ヿ가-힯]+')
+WORD_PATTERN = re.compile(r'[0-9a-z]+')
+EMAIL_PATTERN = re.compile(r'[\w.+-]+@[\w-]+(?:\.[\w-]+)+')
+
+
+def tokenize(text: str, query: bool = False) -> Set[str]:
+    """
+    切分文本为索引词
+    中文索引时同时记录单字和二元组，单字查询也能命中；查询时两个字以上的片段只用二元组（更精确）
+
+    @param {str} text - 原始文本
+    @param {bool} query - 是否为查询文本
+    @return {Set[str]} - 索引词集合
+    """
+    if not text:
+        return set()
+    text = text.lower()
+    tokens = set(EMAIL_PATTERN.findall(text))
+    tokens.update(WORD_PATTERN.findall(text))
+    for run in CJK_RUN_PATTERN.findall(text):
+        if len(run) == 1 or not query:
+            tokens.update(run)
+        tokens.update(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+class MailIndex:
+    """
+    基于 SQLite 的邮件倒排索引
+    """
+    def __init__(self, db_path: str = INDEX_PATH, analyzer: Optional[MailAnalyzer] = None):
+        """
+        打开（或创建）索引
+
+        @param {str} db_path - 索引文件路径
+        @param {Optional[MailAnalyzer]} analyzer - 用于解析邮件的分析器，默认新建（带解析缓存，重建索引时不必重新解析）
+        """
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self.db_path = db_path
+        self._analyzer = analyzer
+
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        if self.conn.execute('PRAGMA user_version').fetchone()[0] != INDEX_VERSION:
+            # 旧版本的索引词与当前切分规则不一致，清空后由 update 重建
+            self.conn.executescript("""
+                DROP TABLE IF EXISTS postings;
+                DROP TABLE IF EXISTS docs;
+            """)
+            self.conn.execute(f'PRAGMA user_version = {INDEX_VERSION}')
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS docs (
+                doc_id INTEGER PRIMARY KEY,
+                path TEXT UNIQUE NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                subject TEXT,
+                timestamp REAL
+            );
+            CREATE TABLE IF NOT EXISTS postings (
+                token TEXT NOT NULL,
+                doc_id INTEGER NOT NULL,
+                PRIMARY KEY (token, doc_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_postings_doc ON postings (doc_id);
+        """)
+        self.conn.commit()
+
+    @property
+    def analyzer(self) -> MailAnalyzer:
+        """
+        邮件解析器（只有需要重新索引时才创建）
+
+        @return {MailAnalyzer} - 邮件分析器
+        """
+        if self._analyzer is None:
+            self._analyzer = MailAnalyzer()
+        return self._analyzer
+
+    def index_mail(self, mail_data: Dict, size: int, mtime_ns: int):
+        """
+        将一封已解析的邮件写入索引（已存在则替换）
+
+        @param {Dict} mail_data - parse_eml 的输出
+        @param {int} size - 文件大小
+        @param {int} mtime_ns - 文件修改时间(纳秒)
+        """
+        path = mail_data['file_path']
+        self.remove(path)
+        cursor = self.conn.execute(
+            'INSERT INTO docs (path, size, mtime_ns, subject, timestamp) VALUES (?, ?, ?, ?, ?)',
+            (path, size, mtime_ns, mail_data.get('subject', ''), mail_data.get('timestamp', 0))
+        )
+        doc_id = cursor.lastrowid
+        tokens = set()
+        for field in ('subject', 'from', 'to', 'content'):
+            tokens |= tokenize(mail_data.get(field) or '')
+        self.conn.executemany('INSERT OR IGNORE INTO postings (token, doc_id) VALUES (?, ?)',
+                              ((token, doc_id) for token in tokens))
+
+    def remove(self, path: str):
+        """
+        从索引中删除一封邮件
+
+        @param {str} path - .eml文件路径
+        """
+        row = self.conn.execute('SELECT doc_id FROM docs WHERE path = ?', (path,)).fetchone()
+        if row is None:
+            return
+        self.conn.execute('DELETE FROM postings WHERE doc_id = ?', (row[0],))
+        self.conn.execute('DELETE FROM docs WHERE doc_id = ?', (row[0],))
+
+    def update(self, raw_mails_dir: str = RAW_MAILS_DIR, quiet: bool = True) -> Dict[str, int]:
+        """
+        增量更新索引：只解析新增或变化的文件，删除已不存在的文件
+
+        @param {str} raw_mails_dir - 邮件原件目录
+        @param {bool} quiet - 是否屏蔽解析过程的日志
+        @return {Dict[str, int]} - 统计信息
+        """
+        stats = {'scanned': 0, 'indexed': 0, 'removed': 0, 'failed': 0}
+        known = {path: (size, mtime_ns) for path, size, mtime_ns
+                 in self.conn.execute('SELECT path, size, mtime_ns FROM docs')}
+
+        seen = set()
+        devnull = open(os.devnull, 'w', encoding='utf-8')
+        try:
+            self._update_files(raw_mails_dir, known, seen, stats, devnull if quiet else None)
+        finally:
+            devnull.close()
+
+        for path in known.keys() - seen:
+            self.remove(path)
+            stats['removed'] += 1
+
+        self.conn.commit()
+        if self._analyzer is not None and self._analyzer.cache:
+            self._analyzer.cache.flush()
+        return stats
+
+    def _update_files(self, raw_mails_dir: str, known: Dict, seen: Set[str], stats: Dict[str, int], log_sink):
+        """
+        扫描目录并索引新增或变化的文件
+
+        @param {str} raw_mails_dir - 邮件原件目录
+        @param {Dict} known - 已索引文件的 path -> (size, mtime_ns)
+        @param {Set[str]} seen - 收集本次扫描到的文件路径
+        @param {Dict[str, int]} stats - 统计信息
+        @param log_sink - 解析日志的输出目标，None 表示正常输出
+        """
+        for root, _, files in os.walk(raw_mails_dir):
+            for file in files:
+                if not file.endswith('.eml'):
+                    continue
+                eml_path = os.path.join(root, file)
+                stats['scanned'] += 1
+                seen.add(eml_path)
+                try:
+                    st = os.stat(eml_path)
+                except OSError:
+                    continue
+                if known.get(eml_path) == (st.st_size, st.st_mtime_ns):
+                    continue
+
+                with contextlib.redirect_stdout(log_sink) if log_sink else contextlib.nullcontext():
+                    mail_data = self.analyzer.parse_cached(eml_path)
+                if not mail_data:
+                    stats['failed'] += 1
+                    continue
+                self.index_mail(mail_data, st.st_size, st.st_mtime_ns)
+                stats['indexed'] += 1
+                if stats['indexed'] % 500 == 0:
+                    self.conn.commit()
+
+    def search(self, query: str, limit: int = 100) -> List[str]:
+        """
+        查询同时包含所有关键词的邮件
+
+        @param {str} query - 查询文本，多个关键词用空格分隔
+        @param {int} limit - 最多返回的结果数
+        @return {List[str]} - 匹配的 .eml 文件路径（按邮件日期倒序）
+        """
+        tokens = sorted(tokenize(query, query=True))
+        if not tokens:
+            return []
+        placeholders = ','.join('?' * len(tokens))
+        rows = self.conn.execute(f"""
+            SELECT d.path FROM docs d
+            JOIN (
+                SELECT doc_id FROM postings
+                WHERE token IN ({placeholders})
+                GROUP BY doc_id
+                HAVING COUNT(*) = ?
+            ) m ON m.doc_id = d.doc_id
+            ORDER BY d.timestamp DESC
+            LIMIT ?
+        """, (*tokens, len(tokens), limit))
+        return [path for (path,) in rows]
+
+    def close(self):
+        """
+        关闭索引
+        """
+        self.conn.close()
+
+
+def main():
+    """
+    命令行入口
+    """
+    parser = argparse.ArgumentParser(description='邮件全文索引')
+    parser.add_argument('--index', default=INDEX_PATH, help='索引文件路径')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    update_parser = subparsers.add_parser('update', help='增量更新索引')
+    update_parser.add_argument('--dir', default=RAW_MAILS_DIR, help='邮件原件目录')
+
+    search_parser = subparsers.add_parser('search', help='查询邮件')
+    search_parser.add_argument('query', nargs='+', help='关键词')
+    search_parser.add_argument('--limit', type=int, default=50, help='最多返回的结果数')
+    search_parser.add_argument('--no-update', action='store_true', help='查询前不更新索引')
+    search_parser.add_argument('--dir', default=RAW_MAILS_DIR, help='邮件原件目录')
+
+    args = parser.parse_args()
+    index = MailIndex(args.index)
+    try:
+        if args.command == 'update' or not args.no_update:
+            start = time.perf_counter()
+            stats = index.update(args.dir)
+            print(f"索引更新完成: 扫描 {stats['scanned']}，新增/更新 {stats['indexed']}，"
+                  f"删除 {stats['removed']}，失败 {stats['failed']}，"
+                  f"耗时 {(time.perf_counter() - start) * 1000:.0f}ms", file=sys.stderr)
+
+        if args.command == 'search':
+            start = time.perf_counter()
+            paths = index.search(' '.join(args.query), limit=args.limit)
+            elapsed = (time.perf_counter() - start) * 1000
+            for path in paths:
+                print(path)
+            print(f"找到 {len(paths)} 封邮件，查询耗时 {elapsed:.1f}ms", file=sys.stderr)
+    finally:
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
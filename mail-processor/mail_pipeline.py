@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+下载-分析流水线：边下载邮件边解析分析
+ImapClient 每保存一封邮件就通过队列交给 MailAnalyzer 解析和会话分组，
+一段时间内没有新邮件的会话视为完整，在下载继续的同时提交分析
+"""
+
+import os
+import time
+import queue
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Optional, Set
+
+from imap_client import ImapClient
+from mail_analyzer import MailAnalyzer
+from model_backend import GeminiBackend
+from conversation_spool import ConversationSpool
+
+# 下载结束标记
+_DOWNLOAD_DONE = object()
+
+
+class MailPipeline:
+    """
+    邮件下载与分析重叠执行的流水线
+    """
+    def __init__(self, analyzer: MailAnalyzer, limit: int = 200, settle_seconds: float = 5.0,
+                 analysis_workers: int = 2, include_existing: bool = True):
+        """
+        初始化流水线
+
+        @param {MailAnalyzer} analyzer - 邮件分析器
+        @param {int} limit - 每个文件夹下载的邮件数量限制
+        @param {float} settle_seconds - 会话多长时间没有新邮件视为完整
+        @param {int} analysis_workers - 并发分析的线程数
+        @param {bool} include_existing - 是否同时分析归档中已有的邮件
+        """
+        self.analyzer = analyzer
+        self.limit = limit
+        self.settle_seconds = settle_seconds
+        self.analysis_workers = analysis_workers
+        self.include_existing = include_existing
+
+        self.mail_queue: queue.Queue = queue.Queue()
+        self.spool: Optional[ConversationSpool] = None
+
+        # 会话状态：最后一封邮件到达时间、待分析、分析中
+        self.last_update: Dict[str, float] = {}
+        self.dirty: Set[str] = set()
+        self.running: Dict[object, str] = {}
+        self.seen_paths: Set[str] = set()
+
+        self.download_ok = False
+        self.stats = {
+            'downloaded': 0,
+            'queued_mails': 0,
+            'submitted_analyses': 0,
+            'reanalyzed_conversations': 0,
+        }
+
+    def on_mail_saved(self, eml_path: str):
+        """
+        ImapClient 保存邮件后的回调（在下载线程中执行）
+
+        @param {str} eml_path - 新保存的.eml文件路径
+        """
+        self.stats['downloaded'] += 1
+        self.mail_queue.put(eml_path)
+
+    def _download(self):
+        """
+        下载线程：连接服务器并抓取所有文件夹
+        """
+        try:
+            client = ImapClient(on_mail_saved=self.on_mail_saved)
+            if client.connect():
+                print("成功连接到邮件服务器")
+                client.fetch_all_folders(limit=self.limit)
+                client.close()
+                self.download_ok = True
+            else:
+                print("连接邮件服务器失败")
+        except Exception as e:
+            print(f"下载线程出错: {str(e)}")
+        finally:
+            self.mail_queue.put(_DOWNLOAD_DONE)
+
+    def _ingest(self, eml_path: str):
+        """
+        解析一封邮件并加入会话暂存区
+
+        @param {str} eml_path - .eml文件路径
+        """
+        eml_path = os.path.abspath(eml_path)
+        # 同一封邮件被重复下载时会覆盖同名文件，不重复计入会话
+        if eml_path in self.seen_paths:
+            return
+        self.seen_paths.add(eml_path)
+
+        # 重启后归档中已解析过的邮件直接从缓存加载
+        mail_data = self.analyzer.parse_cached(eml_path)
+        if not mail_data:
+            self.analyzer.stats['failed_files'] += 1
+            return
+        self.analyzer.stats['processed_files'] += 1
+        self.stats['queued_mails'] += 1
+
+        conversation_id = mail_data['conversation_id']
+        self.spool.add(mail_data)
+        if conversation_id in self.last_update and conversation_id not in self.dirty:
+            self.stats['reanalyzed_conversations'] += 1
+        self.last_update[conversation_id] = time.monotonic()
+        self.dirty.add(conversation_id)
+
+    def _submit_settled(self, executor: ThreadPoolExecutor, force: bool = False):
+        """
+        提交已稳定的会话进行分析
+
+        @param {ThreadPoolExecutor} executor - 分析线程池
+        @param {bool} force - 下载已结束，忽略稳定时间
+        """
+        now = time.monotonic()
+        in_flight = set(self.running.values())
+        for conversation_id in list(self.dirty):
+            # 分析中的会话等本次分析结束后再重新提交
+            if conversation_id in in_flight:
+                continue
+            if not force and now - self.last_update[conversation_id] < self.settle_seconds:
+                continue
+            emails = self.spool.get_conversation(conversation_id)
+            self.dirty.discard(conversation_id)
+            future = executor.submit(self.analyzer.analyze_conversation, emails)
+            self.running[future] = conversation_id
+            self.stats['submitted_analyses'] += 1
+
+    def _collect_finished(self):
+        """
+        收集已完成的分析结果并增量写入
+        """
+        for future in [f for f in self.running if f.done()]:
+            self.running.pop(future)
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"分析线程出错: {str(e)}")
+                result = None
+            if result:
+                self.analyzer.stats['analyzed_conversations'] += 1
+                self.analyzer.write_result(result)
+
+    def run(self):
+        """
+        运行流水线直到下载和分析都完成
+        """
+        self.spool = ConversationSpool(self.analyzer.spool_dir)
+        try:
+            if self.include_existing:
+                print("\n加入归档中已有的邮件...")
+                for eml_path in self.analyzer.scan_eml_files():
+                    self.mail_queue.put(eml_path)
+
+            downloader = threading.Thread(target=self._download, daemon=True)
+            downloader.start()
+
+            download_done = False
+            with ThreadPoolExecutor(max_workers=self.analysis_workers) as executor:
+                while True:
+                    try:
+                        item = self.mail_queue.get(timeout=0.5)
+                    except queue.Empty:
+                        item = None
+
+                    if item is _DOWNLOAD_DONE:
+                        download_done = True
+                        print("\n下载完成，分析剩余会话...")
+                    elif item is not None:
+                        self._ingest(item)
+
+                    self._collect_finished()
+                    # 队列积压时优先消化队列，空闲时再检查稳定的会话
+                    if item is None or download_done or self.mail_queue.empty():
+                        self._submit_settled(executor, force=download_done)
+
+                    if download_done and self.mail_queue.empty() and not self.dirty and not self.running:
+                        break
+
+            if self.analyzer.cache:
+                self.analyzer.cache.flush()
+            self.analyzer.stats['total_conversations'] = len(self.last_update)
+        finally:
+            self.spool.close()
+
+        print("\n流水线统计:")
+        print(f"新下载邮件: {self.stats['downloaded']}")
+        print(f"解析邮件: {self.stats['queued_mails']}")
+        print(f"缓存命中: {self.analyzer.stats['cached_files']}")
+        print(f"会话数: {len(self.last_update)}")
+        print(f"提交分析: {self.stats['submitted_analyses']} (因新邮件重新分析 {self.stats['reanalyzed_conversations']})")
+        print(f"成功分析: {self.analyzer.stats['analyzed_conversations']}")
+        print(f"分析失败: {self.analyzer.stats['failed_analyses']}")
+
+
+def main():
+    """
+    主函数
+    """
+    parser = argparse.ArgumentParser(description='边下载边分析邮件')
+    parser.add_argument('--limit', type=int, default=200, help='每个文件夹下载的邮件数量')
+    parser.add_argument('--settle', type=float, default=5.0, help='会话稳定时间(秒)')
+    parser.add_argument('--workers', type=int, default=2, help='并发分析线程数')
+    parser.add_argument('--new-only', action='store_true', help='只分析本次新下载的邮件')
+    args = parser.parse_args()
+
+    print("=" * 50)
+    print("邮件下载-分析流水线启动")
+    print("=" * 50)
+    print(f"时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print("=" * 50)
+
+    start_time = time.time()
+    analyzer = MailAnalyzer(backend=GeminiBackend())
+    pipeline = MailPipeline(
+        analyzer,
+        limit=args.limit,
+        settle_seconds=args.settle,
+        analysis_workers=args.workers,
+        include_existing=not args.new_only
+    )
+    pipeline.run()
+    analyzer.generate_excel_report()
+
+    print(f"\n处理完成! 总耗时 {time.time() - start_time:.1f} 秒")
+
+
+if __name__ == "__main__":
+    main()
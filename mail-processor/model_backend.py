@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+模型后端：MailAnalyzer 通过统一接口调用大模型
+GeminiBackend 调用真实的 Gemini API，MockBackend 在本地生成确定性的结果，
+用于离线测试和性能基准（可注入延迟和失败）
+"""
+
+import json
+import time
+import random
+import hashlib
+import threading
+from typing import Dict, Optional
+
+
+class ModelBackend:
+    """
+    模型后端接口
+    """
+    name = 'base'
+
+    def generate(self, prompt: str, response_schema: Optional[Dict] = None) -> str:
+        """
+        根据提示词生成文本
+
+        @param {str} prompt - 提示词
+        @param {Optional[Dict]} response_schema - 要求返回的 JSON 结构，None 表示自由文本
+        @return {str} - 模型返回的文本
+        """
+        raise NotImplementedError
+
+
+class GeminiBackend(ModelBackend):
+    """
+    Gemini API 后端（通过 gemini_client 的共享连接池调用 REST 接口）
+    """
+    name = 'gemini'
+
+    def __init__(self, model_name: Optional[str] = None):
+        """
+        初始化 Gemini，需要 GEMINI_API_KEY 环境变量
+
+        @param {Optional[str]} model_name - 模型名称，默认探测并选择最快的可用模型
+        """
+        # 只有使用真实后端时才需要这些依赖
+        import gemini_client
+
+        gemini_client.require_api_key()
+        self.client = gemini_client
+        self.model_name = model_name or gemini_client.pick_fastest_model()
+        # 旧模型（如 gemini-pro）不支持 JSON 模式，首次报错后自动关闭
+        self.structured_supported = True
+        print(f"Gemini API 初始化成功 (模型: {self.model_name})")
+
+    def generate(self, prompt: str, response_schema: Optional[Dict] = None) -> str:
+        """
+        调用 Gemini 生成内容
+
+        @param {str} prompt - 提示词
+        @param {Optional[Dict]} response_schema - 要求返回的 JSON 结构
+        @return {str} - 模型返回的文本
+        """
+        if response_schema is not None and self.structured_supported:
+            generation_config = {
+                'response_mime_type': 'application/json',
+                'response_schema': response_schema,
+            }
+            try:
+                return self.client.generate_content(self.model_name, prompt, generation_config)
+            except self.client.GeminiAPIError as e:
+                message = str(e)
+                if not any(name in message for name in ('response_mime_type', 'response_schema', 'responseMimeType',
+                                                        'responseSchema', 'JSON mode')):
+                    raise
+                print(f"模型 {self.model_name} 不支持结构化输出，改用普通模式: {message}")
+                self.structured_supported = False
+
+        return self.client.generate_content(self.model_name, prompt)
+
+
+class MockBackend(ModelBackend):
+    """
+    本地模拟后端，相同的种子和提示词总是得到相同的结果
+    """
+    name = 'mock'
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, failure_rate: float = 0.0,
+                 markdown_rate: float = 0.0, malformed_rate: float = 0.0, seed: int = 0):
+        """
+        初始化模拟后端
+
+        @param {float} latency - 每次调用的基础延迟(秒)
+        @param {float} jitter - 延迟的随机波动范围(秒)
+        @param {float} failure_rate - 调用抛出异常的概率
+        @param {float} markdown_rate - 返回 Markdown 代码块包裹的 JSON 的概率（仅普通模式）
+        @param {float} malformed_rate - 返回格式错误（多余逗号/被截断）的 JSON 的概率（仅普通模式）
+        @param {int} seed - 随机种子
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.markdown_rate = markdown_rate
+        self.malformed_rate = malformed_rate
+        self.seed = seed
+        self.calls = 0
+        self.failures = 0
+        self._prompt_calls = {}
+        self._lock = threading.Lock()
+
+    def _rng(self, prompt: str, call_index: int) -> random.Random:
+        """
+        由种子、提示词和调用序号确定的随机数生成器（与线程调度无关）
+
+        @param {str} prompt - 提示词
+        @param {int} call_index - 该提示词的调用序号
+        @return {random.Random} - 随机数生成器
+        """
+        digest = hashlib.sha1(f"{self.seed}:{call_index}:{prompt}".encode('utf-8')).hexdigest()
+        return random.Random(int(digest[:16], 16))
+
+    def generate(self, prompt: str, response_schema: Optional[Dict] = None) -> str:
+        """
+        生成模拟的库存分析结果
+
+        @param {str} prompt - 提示词
+        @param {Optional[Dict]} response_schema - 给出时模拟结构化输出，总是返回合法 JSON
+        @return {str} - JSON 文本
+        """
+        prompt_hash = hashlib.md5(prompt.encode('utf-8')).hexdigest()
+        with self._lock:
+            self.calls += 1
+            call_index = self._prompt_calls.get(prompt_hash, 0) + 1
+            self._prompt_calls[prompt_hash] = call_index
+        rng = self._rng(prompt, call_index)
+
+        delay = self.latency + rng.uniform(-self.jitter, self.jitter) if self.jitter else self.latency
+        if delay > 0:
+            time.sleep(delay)
+
+        if rng.random() < self.failure_rate:
+            with self._lock:
+                self.failures += 1
+            raise RuntimeError("MockBackend: 模拟的 API 调用失败")
+
+        quantity = int(prompt_hash[:4], 16) % 1000 + 1
+        unit_price = round(int(prompt_hash[4:8], 16) % 10000 / 100, 2)
+        result = {
+            'product_name': f"商品-{prompt_hash[:8]}",
+            'quantity': quantity,
+            'unit_price': unit_price,
+            'total_price': round(quantity * unit_price, 2),
+            'delivery_date': None,
+            'special_requirements': None,
+            'status': ['confirmed', 'pending', 'cancelled'][int(prompt_hash[8], 16) % 3],
+        }
+        if response_schema is not None:
+            return json.dumps({'products': [result]}, ensure_ascii=False)
+
+        text = json.dumps(result, ensure_ascii=False)
+        if rng.random() < self.malformed_rate:
+            text = text[:-1] + ',' if rng.random() < 0.5 else text[:len(text) * 2 // 3]
+        if rng.random() < self.markdown_rate:
+            text = f"以下是分析结果：\n```json\n{text}\n```"
+        return text
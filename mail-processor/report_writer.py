@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+流式报告写入器：分析结果每完成一条就写出一条
+Excel 使用 openpyxl 只写模式，同时输出 JSON Lines 和 Parquet，
+支持追加到已有的滚动报告而不是每次重新生成：重新分析的会话替换旧行，未变化的会话不再写入
+"""
+
+import os
+import json
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# 报告固定列：会话信息 + 库存字段，其余字段放入 extra 列
+BASE_COLUMNS = ['conversation_id', 'first_mail_date', 'last_mail_date', 'mail_count']
+FIELD_COLUMNS = ['product_name', 'quantity', 'unit_price', 'total_price',
+                 'delivery_date', 'special_requirements', 'status']
+REPORT_COLUMNS = BASE_COLUMNS + FIELD_COLUMNS + ['extra', 'analyzed_at']
+
+DEFAULT_FORMATS = ('xlsx', 'jsonl', 'parquet')
+
+
+def flatten_result(result: Dict, analyzed_at: str) -> List[Dict]:
+    """
+    将一条会话分析结果展平为报告行（多个商品时每个商品一行）
+
+    @param {Dict} result - analyze_conversation 的输出
+    @param {str} analyzed_at - 写入时间
+    @return {List[Dict]} - 报告行
+    """
+    base = {key: result.get(key) for key in BASE_COLUMNS}
+    analysis = result.get('analysis_result')
+    if isinstance(analysis, dict) and isinstance(analysis.get('products'), list):
+        items = analysis['products']
+    elif isinstance(analysis, list):
+        items = analysis
+    else:
+        items = [analysis]
+
+    rows = []
+    for item in items:
+        row = dict(base)
+        extra = {}
+        if isinstance(item, dict):
+            for key, value in item.items():
+                if key in FIELD_COLUMNS:
+                    row[key] = value
+                elif key != 'products':
+                    extra[key] = value
+        for key in FIELD_COLUMNS:
+            value = row.get(key)
+            # Excel/Parquet 单元格只接受标量
+            if isinstance(value, (dict, list)):
+                row[key] = json.dumps(value, ensure_ascii=False)
+            else:
+                row.setdefault(key, None)
+        row['extra'] = json.dumps(extra, ensure_ascii=False) if extra else None
+        row['analyzed_at'] = analyzed_at
+        rows.append(row)
+    return rows
+
+
+def report_key(result: Dict) -> Tuple[Optional[str], Optional[int]]:
+    """
+    会话在报告中的版本：最后一封邮件的日期和邮件数，会话收到新邮件后改变
+
+    @param {Dict} result - analyze_conversation 的输出或报告行
+    @return {Tuple[Optional[str], Optional[int]]} - (last_mail_date, mail_count)
+    """
+    mail_count = result.get('mail_count')
+    return result.get('last_mail_date'), int(mail_count) if mail_count is not None else None
+
+
+def load_report_keys(base_path: str, formats: Iterable[str] = DEFAULT_FORMATS) -> Dict[str, Tuple]:
+    """
+    读取滚动报告中已有会话的版本（优先读 JSON Lines，没有时读 Excel；Parquet 不读取）
+    同一会话有多行时以最后一行为准
+
+    @param {str} base_path - 报告路径（不含扩展名）
+    @param {Iterable[str]} formats - 报告格式
+    @return {Dict[str, Tuple]} - 会话ID -> report_key
+    """
+    formats = set(formats)
+    keys = {}
+    jsonl_path = base_path + '.jsonl'
+    xlsx_path = base_path + '.xlsx'
+    if 'jsonl' in formats and os.path.exists(jsonl_path):
+        with open(jsonl_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    result = json.loads(line)
+                    keys[result.get('conversation_id')] = report_key(result)
+    elif 'xlsx' in formats and os.path.exists(xlsx_path):
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            return keys
+        workbook = load_workbook(xlsx_path, read_only=True)
+        try:
+            rows = workbook.worksheets[0].iter_rows(values_only=True)
+            header = list(next(rows, None) or [])
+            if all(col in header for col in BASE_COLUMNS):
+                positions = {col: header.index(col) for col in BASE_COLUMNS}
+                for values in rows:
+                    row = {col: values[i] if i < len(values) else None for col, i in positions.items()}
+                    keys[row['conversation_id']] = report_key(row)
+        finally:
+            workbook.close()
+    return keys
+
+
+class ReportWriter:
+    """
+    流式写入 Excel / JSON Lines / Parquet 报告
+    """
+    def __init__(self, base_path: str, formats: Iterable[str] = DEFAULT_FORMATS,
+                 append: bool = False, parquet_batch_size: int = 1000, replace: Iterable[str] = ()):
+        """
+        打开报告输出
+
+        @param {str} base_path - 报告路径（不含扩展名）
+        @param {Iterable[str]} formats - 输出格式：xlsx / jsonl / parquet
+        @param {bool} append - 追加到已有报告而不是覆盖
+        @param {int} parquet_batch_size - Parquet 每个行组的行数
+        @param {Iterable[str]} replace - 追加时将要重新写入的会话ID：写入后删除其旧行，本次没有写入的保留旧行
+        """
+        self.base_path = base_path
+        self.formats = set(formats)
+        self.append = append
+        self.parquet_batch_size = parquet_batch_size
+        self.replace: Set[str] = set(replace) if append else set()
+        self.row_count = 0
+        self.result_count = 0
+        self.paths: Dict[str, str] = {}
+        # 本次写入的会话ID
+        self.written_ids: Set[str] = set()
+        # 旧报告中 replace 会话的行，关闭时只保留本次没有重新写入的会话
+        self._held_lines: List[str] = []
+        self._held_rows: List[List] = []
+
+        report_dir = os.path.dirname(base_path)
+        if report_dir:
+            os.makedirs(report_dir, exist_ok=True)
+
+        self._jsonl = None
+        self._workbook = None
+        self._sheet = None
+        self._parquet_writer = None
+        self._parquet_rows: List[Dict] = []
+
+        if 'jsonl' in self.formats:
+            self._open_jsonl()
+        if 'xlsx' in self.formats:
+            self._open_xlsx()
+        if 'parquet' in self.formats:
+            self._open_parquet()
+
+    def _open_jsonl(self):
+        """
+        打开 JSON Lines 输出（追加模式直接在文件末尾续写；有要替换的会话时先复制其余行到临时文件，关闭时替换）
+        """
+        path = self.base_path + '.jsonl'
+        self.paths['jsonl'] = path
+        if not (self.replace and os.path.exists(path)):
+            self._jsonl = open(path, 'a' if self.append else 'w', encoding='utf-8')
+            return
+
+        self._jsonl = open(path + '.tmp', 'w', encoding='utf-8')
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                if json.loads(line).get('conversation_id') in self.replace:
+                    self._held_lines.append(line)
+                else:
+                    self._jsonl.write(line)
+        self._jsonl.flush()
+
+    def _open_xlsx(self):
+        """
+        打开只写模式的 Excel 工作簿，追加时先流式复制已有报告的行
+        """
+        try:
+            from openpyxl import Workbook, load_workbook
+        except ImportError:
+            print("请安装openpyxl: pip3 install openpyxl，跳过Excel输出")
+            return
+
+        path = self.base_path + '.xlsx'
+        self._workbook = Workbook(write_only=True)
+        self._sheet = self._workbook.create_sheet('inventory')
+        self._sheet.append(REPORT_COLUMNS)
+
+        if self.append and os.path.exists(path):
+            # 只读模式逐行读取旧报告，内存占用与报告大小无关
+            old_workbook = load_workbook(path, read_only=True)
+            try:
+                old_sheet = old_workbook.worksheets[0]
+                rows = old_sheet.iter_rows(values_only=True)
+                header = next(rows, None)
+                copied = 0
+                if header:
+                    positions = [list(header).index(col) if col in header else None
+                                 for col in REPORT_COLUMNS]
+                    id_position = REPORT_COLUMNS.index('conversation_id')
+                    for values in rows:
+                        row = [values[i] if i is not None and i < len(values) else None for i in positions]
+                        if row[id_position] in self.replace:
+                            self._held_rows.append(row)
+                            continue
+                        self._sheet.append(row)
+                        copied += 1
+            finally:
+                old_workbook.close()
+            print(f"已载入滚动报告 {path} 中的 {copied} 行")
+
+        self.paths['xlsx'] = path
+
+    def _open_parquet(self):
+        """
+        准备 Parquet 输出：滚动报告是一个目录，每次运行追加一个分片文件
+        """
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            print("请安装pyarrow: pip3 install pyarrow，跳过Parquet输出")
+            return
+
+        if self.append:
+            dataset_dir = self.base_path + '.parquet'
+            os.makedirs(dataset_dir, exist_ok=True)
+            part_name = f"part-{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.parquet"
+            self.paths['parquet'] = os.path.join(dataset_dir, part_name)
+        else:
+            self.paths['parquet'] = self.base_path + '.parquet'
+
+    def write(self, result: Dict):
+        """
+        写入一条分析结果
+
+        @param {Dict} result - analyze_conversation 的输出
+        """
+        analyzed_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        self.result_count += 1
+        self.written_ids.add(result.get('conversation_id'))
+
+        if self._jsonl:
+            self._jsonl.write(json.dumps(result, ensure_ascii=False) + '\n')
+            self._jsonl.flush()
+
+        rows = flatten_result(result, analyzed_at)
+        self.row_count += len(rows)
+        if self._sheet is not None:
+            for row in rows:
+                self._sheet.append([row.get(col) for col in REPORT_COLUMNS])
+        if 'parquet' in self.paths:
+            self._parquet_rows.extend(rows)
+            if len(self._parquet_rows) >= self.parquet_batch_size:
+                self._flush_parquet()
+
+    def _flush_parquet(self):
+        """
+        将缓冲的行写为一个 Parquet 行组
+        """
+        if not self._parquet_rows:
+            return
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        # 所有列统一为字符串类型，保证滚动报告各分片的 schema 一致
+        columns = {col: [str(row[col]) if row.get(col) is not None else None for row in self._parquet_rows]
+                   for col in REPORT_COLUMNS}
+        table = pa.table(columns, schema=pa.schema([(col, pa.string()) for col in REPORT_COLUMNS]))
+        if self._parquet_writer is None:
+            self._parquet_writer = pq.ParquetWriter(self.paths['parquet'], table.schema)
+        self._parquet_writer.write_table(table)
+        self._parquet_rows = []
+
+    def close(self) -> Dict[str, str]:
+        """
+        完成写入并关闭所有输出
+
+        @return {Dict[str, str]} - 各格式的输出路径
+        """
+        id_position = REPORT_COLUMNS.index('conversation_id')
+        if self._jsonl:
+            # 重新分析失败的会话保留旧结果
+            for line in self._held_lines:
+                if json.loads(line).get('conversation_id') not in self.written_ids:
+                    self._jsonl.write(line)
+            self._jsonl.close()
+            self._jsonl = None
+            if os.path.exists(self.paths['jsonl'] + '.tmp'):
+                os.replace(self.paths['jsonl'] + '.tmp', self.paths['jsonl'])
+
+        if self._workbook is not None:
+            for row in self._held_rows:
+                if row[id_position] not in self.written_ids:
+                    self._sheet.append(row)
+            # 先写临时文件再替换，避免中途失败损坏旧的滚动报告
+            tmp_path = self.paths['xlsx'] + '.tmp'
+            self._workbook.save(tmp_path)
+            os.replace(tmp_path, self.paths['xlsx'])
+            self._workbook = None
+
+        if 'parquet' in self.paths:
+            self._flush_parquet()
+            if self._parquet_writer is not None:
+                self._parquet_writer.close()
+                self._parquet_writer = None
+                if self.append and self.replace & self.written_ids:
+                    self._drop_replaced_parquet(self.replace & self.written_ids)
+            else:
+                # 没有任何行时不生成空文件
+                self.paths.pop('parquet')
+
+        return dict(self.paths)
+
+    def _drop_replaced_parquet(self, conversation_ids: Set[str]):
+        """
+        从滚动报告的旧分片中删除已重新写入的会话（新分片写完后再改旧分片）
+
+        @param {Set[str]} conversation_ids - 已重新写入的会话ID
+        """
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+
+        value_set = pa.array(sorted(conversation_ids), type=pa.string())
+        dataset_dir = os.path.dirname(self.paths['parquet'])
+        for name in sorted(os.listdir(dataset_dir)):
+            path = os.path.join(dataset_dir, name)
+            if not name.endswith('.parquet') or path == self.paths['parquet']:
+                continue
+            table = pq.read_table(path)
+            kept = table.filter(pc.invert(pc.is_in(table['conversation_id'], value_set=value_set)))
+            if kept.num_rows == table.num_rows:
+                continue
+            if kept.num_rows:
+                pq.write_table(kept, path + '.tmp')
+                os.replace(path + '.tmp', path)
+            else:
+                os.remove(path)
@@ -6,30 +6,16 @@ Gemini API 测试脚本
 用于测试 Gemini API 的连接和基本功能
 """
 
-import os
 import json
 import time
 import requests
-from dotenv import load_dotenv
 import google.generativeai as genai
 from google.api_core import retry
 
-# 设置 Clash 代理
-PROXY_HOST = '127.0.0.1'
-PROXY_PORT = '7888'
-PROXY_URL = f'http://{PROXY_HOST}:{PROXY_PORT}'
+import gemini_client
+from gemini_client import PROXY_URL, API_BASE_URL
 
-# 设置环境变量
-os.environ['http_proxy'] = PROXY_URL
-os.environ['https_proxy'] = PROXY_URL
-os.environ['HTTPS_PROXY'] = PROXY_URL
-os.environ['HTTP_PROXY'] = PROXY_URL
-
-# requests 代理设置
-PROXIES = {
-    'http': PROXY_URL,
-    'https': PROXY_URL
-}
+gemini_client.setup_proxy()
 
 def check_ip():
     """
@@ -37,7 +23,7 @@ def check_ip():
     """
     print("\n检查当前IP信息...")
     try:
-        response = requests.get('https://ipapi.co/json/', proxies=PROXIES, timeout=5)
+        response = gemini_client.get_session().get('https://ipapi.co/json/', timeout=5)
         if response.status_code == 200:
             data = response.json()
             print(f"当前IP: {data.get('ip')}")
@@ -55,8 +41,7 @@ def test_api_key():
     print("\n1. 测试 API 密钥...")
     
     # 加载环境变量
-    load_dotenv()
-    api_key = os.getenv('GEMINI_API_KEY')
+    api_key = gemini_client.get_api_key()
     
     if not api_key:
         print("错误: 未找到 GEMINI_API_KEY 环境变量")
@@ -76,13 +61,13 @@ def test_network_connection():
     """
     print("\n2. 测试网络连接...")
     
+    # 所有探测复用同一个经代理的长连接会话
+    session = gemini_client.get_session()
+    
     # 首先测试代理是否工作
     try:
         print("测试代理连接...")
-        response = requests.get('https://www.google.com', 
-                              proxies=PROXIES, 
-                              timeout=5,
-                              verify=True)
+        response = session.get('https://www.google.com', timeout=5, verify=True)
         print(f"Google 连接测试成功: {response.status_code}")
     except Exception as e:
         print(f"代理测试失败: {str(e)}")
@@ -90,12 +75,7 @@ def test_network_connection():
         return False
     
     try:
-        response = requests.get(
-            'https://generativelanguage.googleapis.com/v1beta/models',
-            proxies=PROXIES,
-            timeout=5,
-            verify=True
-        )
+        response = session.get(f'{API_BASE_URL}/models', timeout=5, verify=True)
         print(f"API 端点响应状态码: {response.status_code}")
         return True
     except requests.exceptions.RequestException as e:
@@ -115,8 +95,7 @@ def test_gemini_connection():
     
     try:
         # 配置 API
-        api_key = os.getenv('GEMINI_API_KEY')
-        genai.configure(api_key=api_key)
+        gemini_client.configure()
         print("API 配置成功")
         
         # 设置超时时间
@@ -153,7 +132,7 @@ def test_simple_generation():
     print("\n4. 测试简单内容生成...")
     
     try:
-        model = genai.GenerativeModel('gemini-pro')
+        model = gemini_client.get_model('gemini-pro')
         response = model.generate_content("Hello, what's 1+1?")
         print("\n测试响应:")
         print(response.text)
@@ -169,8 +148,8 @@ def test_gemini_generation():
     print("\n5. 测试 JSON 内容生成...")
     
     try:
-        # 创建模型实例
-        model = genai.GenerativeModel('gemini-pro')
+        # 复用模型实例
+        model = gemini_client.get_model('gemini-pro')
         
         # 测试简单问题
         prompt = "请用JSON格式返回以下信息：商品名称='测试商品'，数量=100，单价=99.9"
@@ -197,6 +176,22 @@ def test_gemini_generation():
         print(f"生成测试失败: {str(e)}")
         return False
 
+def test_model_latency():
+    """
+    探测候选模型的延迟和健康状况
+    """
+    print("\n6. 测试模型延迟...")
+    
+    summaries = gemini_client.probe_models(rounds=5)
+    healthy = [s for s in summaries if s['healthy']]
+    if not healthy:
+        print("没有可用的模型")
+        return False
+    
+    fastest = min(healthy, key=lambda s: s['p50'])
+    print(f"最快的可用模型: {fastest['model']} (p50={fastest['p50'] * 1000:.0f}ms)")
+    return True
+
 def main():
     """
     主函数
@@ -226,6 +221,10 @@ def main():
         print("\nJSON 生成测试失败 ✗")
         return
     
+    if not test_model_latency():
+        print("\n模型延迟测试失败 ✗")
+        return
+    
     print("\n所有测试完成! ✓")
 
 if __name__ == "__main__":
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+json_repair 的单元测试（不需要网络）
+"""
+
+from json_repair import repair_json
+
+
+def test_curly_quotes_inside_value_are_kept():
+    text = '{"special_requirements": "包装上印“易碎”字样", "quantity": 3,}'
+    assert repair_json(text) == {'special_requirements': '包装上印“易碎”字样', 'quantity': 3}
+
+
+def test_curly_quotes_inside_truncated_value_are_kept():
+    text = '{"product_name": "玻璃杯", "special_requirements": "包装上印“易碎”字样'
+    assert repair_json(text) == {'product_name': '玻璃杯', 'special_requirements': '包装上印“易碎”字样'}
+
+
+def test_curly_quotes_as_delimiters():
+    text = '{“product_name”: “玻璃杯”, “quantity”: 3}'
+    assert repair_json(text) == {'product_name': '玻璃杯', 'quantity': 3}
+
+
+def test_common_repairs():
+    text = "以下是结果：\n```json\n{'status': 'pending', 'unit_price': None, // 单价未知\n 'quantity': 2,]\n```"
+    assert repair_json(text) == {'status': 'pending', 'unit_price': None, 'quantity': 2}
+
+
+def test_unrepairable_returns_none():
+    assert repair_json('没有 JSON') is None
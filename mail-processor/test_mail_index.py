@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+mail_index 的单元测试：中文单字和多字查询、重建索引时复用解析缓存
+"""
+
+from mail_analyzer import MailAnalyzer
+from mail_index import MailIndex, tokenize
+
+
+def write_mail(raw_dir, name, subject, body):
+    (raw_dir / name).write_text(f"From: a <a@example.com>\nTo: b@example.com\nSubject: {subject}\n"
+                                f"Date: Mon, 1 Jan 2024 10:00:00 +0000\n"
+                                f"Content-Type: text/plain; charset=utf-8\n\n{body}\n", encoding='utf-8')
+
+
+def make_index(tmp_path, db_name='index.sqlite3'):
+    analyzer = MailAnalyzer(cache_path=str(tmp_path / 'parse_cache.sqlite3'), raw_mails_dir=str(tmp_path / 'raw'))
+    index = MailIndex(str(tmp_path / db_name), analyzer=analyzer)
+    index.update(str(tmp_path / 'raw'))
+    return index, analyzer
+
+
+def test_tokenize_query_uses_bigrams():
+    assert tokenize('订单') == {'订', '单', '订单'}
+    assert tokenize('蓝牙耳机', query=True) == {'蓝牙', '牙耳', '耳机'}
+    assert tokenize('单', query=True) == {'单'}
+
+
+def test_single_and_multi_character_queries(tmp_path):
+    raw = tmp_path / 'raw'
+    raw.mkdir()
+    write_mail(raw, 'm1.eml', '新订单', '需要蓝牙耳机 20 个')
+    write_mail(raw, 'm2.eml', '报价', '单价请确认')
+    write_mail(raw, 'm3.eml', 'hello', 'no chinese here')
+    index, _ = make_index(tmp_path)
+    try:
+        names = lambda query: sorted(path.rsplit('/', 1)[-1] for path in index.search(query))
+        assert names('单') == ['m1.eml', 'm2.eml']
+        assert names('订单') == ['m1.eml']
+        assert names('蓝牙耳机') == ['m1.eml']
+        assert names('单价') == ['m2.eml']
+        assert names('单 报价') == ['m2.eml']
+        assert names('耳机价') == []
+    finally:
+        index.close()
+
+
+def test_rebuild_uses_parse_cache(tmp_path):
+    raw = tmp_path / 'raw'
+    raw.mkdir()
+    write_mail(raw, 'm1.eml', '新订单', '需要蓝牙耳机 20 个')
+    index, analyzer = make_index(tmp_path)
+    index.close()
+    assert analyzer.stats['cached_files'] == 0
+
+    # 新建的索引需要索引全部文件，解析结果来自缓存
+    index, analyzer = make_index(tmp_path, 'rebuilt.sqlite3')
+    index.close()
+    assert analyzer.stats['cached_files'] == 1
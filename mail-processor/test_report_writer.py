@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+滚动报告（--append）的单元测试：未变化的会话不再分析，重新分析的会话替换旧行（使用 MockBackend，不需要网络）
+"""
+
+import json
+import os
+
+from openpyxl import load_workbook
+
+from mail_analyzer import MailAnalyzer
+from model_backend import MockBackend
+
+
+def write_mail(raw_dir, name, subject, date, body):
+    with open(os.path.join(raw_dir, name), 'w', encoding='utf-8') as f:
+        f.write(f"From: a <a@example.com>\nTo: b@example.com\nSubject: {subject}\nDate: {date}\n"
+                f"Content-Type: text/plain; charset=utf-8\n\n{body}\n")
+
+
+def run_append(tmp_path, backend):
+    analyzer = MailAnalyzer(use_cache=False, backend=backend, raw_mails_dir=str(tmp_path / 'raw'),
+                            reports_dir=str(tmp_path / 'reports'), spool_dir=str(tmp_path / 'spool'),
+                            report_formats=('xlsx', 'jsonl'), append_report=True)
+    analyzer.retry_delay = 0
+    analyzer.process_all_emails()
+    analyzer.generate_excel_report()
+    return analyzer
+
+
+def report_state(tmp_path):
+    """返回 (JSON Lines 中各会话的邮件数, Excel 中各会话的 (邮件数, analyzed_at) 集合)"""
+    base = tmp_path / 'reports' / 'inventory_rolling'
+    with open(str(base) + '.jsonl', encoding='utf-8') as f:
+        results = [json.loads(line) for line in f if line.strip()]
+    assert len({result['conversation_id'] for result in results}) == len(results)
+    workbook = load_workbook(str(base) + '.xlsx', read_only=True)
+    rows = list(workbook.worksheets[0].iter_rows(values_only=True))
+    workbook.close()
+    header = list(rows[0])
+    sheet = {}
+    for values in rows[1:]:
+        row = dict(zip(header, values))
+        sheet.setdefault(row['conversation_id'], set()).add((row['mail_count'], row['analyzed_at']))
+    return {result['conversation_id']: result['mail_count'] for result in results}, sheet
+
+
+def test_append_skips_unchanged_and_replaces_changed(tmp_path):
+    raw = tmp_path / 'raw'
+    raw.mkdir()
+    write_mail(raw, 'm1.eml', 'order 1', 'Mon, 1 Jan 2024 10:00:00 +0000', 'need 10 cups')
+    write_mail(raw, 'm2.eml', 'order 2', 'Mon, 1 Jan 2024 11:00:00 +0000', 'need 5 plates')
+
+    backend = MockBackend()
+    run_append(tmp_path, backend)
+    assert backend.calls == 2
+    jsonl, sheet = report_state(tmp_path)
+    assert jsonl == {'order 1': 1, 'order 2': 1}
+
+    # 没有新邮件：不调用模型，报告不变
+    backend = MockBackend()
+    analyzer = run_append(tmp_path, backend)
+    assert backend.calls == 0
+    assert analyzer.stats['skipped_conversations'] == 2
+    assert report_state(tmp_path) == (jsonl, sheet)
+
+    # 会话 1 收到新邮件：只重新分析会话 1，并替换旧行
+    write_mail(raw, 'm3.eml', 'Re: order 1', 'Tue, 2 Jan 2024 09:00:00 +0000', 'make it 12 cups')
+    backend = MockBackend()
+    run_append(tmp_path, backend)
+    assert backend.calls == 1
+    jsonl, new_sheet = report_state(tmp_path)
+    assert jsonl == {'order 1': 2, 'order 2': 1}
+    assert {count for count, _ in new_sheet['order 1']} == {2}
+    assert len({analyzed_at for _, analyzed_at in new_sheet['order 1']}) == 1
+    assert new_sheet['order 2'] == sheet['order 2']
+
+
+class FailingBackend(MockBackend):
+    """提示词包含 marker 时调用失败"""
+    def __init__(self, marker):
+        super().__init__()
+        self.marker = marker
+
+    def generate(self, prompt, response_schema=None):
+        if self.marker in prompt:
+            raise RuntimeError('模拟调用失败')
+        return super().generate(prompt, response_schema)
+
+
+def test_append_keeps_old_rows_when_reanalysis_fails(tmp_path):
+    raw = tmp_path / 'raw'
+    raw.mkdir()
+    write_mail(raw, 'm1.eml', 'order 1', 'Mon, 1 Jan 2024 10:00:00 +0000', 'need 10 cups')
+    write_mail(raw, 'm2.eml', 'order 2', 'Mon, 1 Jan 2024 11:00:00 +0000', 'need 5 plates')
+    run_append(tmp_path, MockBackend())
+    _, before = report_state(tmp_path)
+
+    # 两个会话都有新邮件，会话 2 重新分析失败：会话 1 替换，会话 2 保留旧行
+    write_mail(raw, 'm3.eml', 'Re: order 1', 'Tue, 2 Jan 2024 09:00:00 +0000', 'make it 12 cups')
+    write_mail(raw, 'm4.eml', 'Re: order 2', 'Tue, 2 Jan 2024 10:00:00 +0000', 'make it 6 plates')
+    analyzer = run_append(tmp_path, FailingBackend('plates'))
+    assert analyzer.stats['failed_analyses'] == 1
+    jsonl, sheet = report_state(tmp_path)
+    assert jsonl == {'order 1': 2, 'order 2': 1}
+    assert {count for count, _ in sheet['order 1']} == {2}
+    assert sheet['order 2'] == before['order 2']